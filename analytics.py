@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Vectorized analytics for long-range reports
+
+Loads a date range from the daily rollup into NumPy column arrays and
+computes rolling averages, streaks, sleep debt, water-goal hit rates and
+week-over-week deltas without per-row Python loops.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+from health_tracker import HealthTracker
+
+
+def rolling_mean(values: np.ndarray, window: int, weights: np.ndarray = None) -> np.ndarray:
+    """Trailing mean over `window` days; early days average what is available.
+
+    With `weights` (e.g. 1 for nights that were logged, 0 otherwise) the mean
+    is taken over weighted days only, and windows with no weight give 0.
+    """
+    if weights is None:
+        weights = np.ones_like(values, dtype=float)
+
+    value_sums = np.cumsum(np.concatenate(([0.0], values * weights)))
+    weight_sums = np.cumsum(np.concatenate(([0.0], weights)))
+
+    ends = np.arange(1, values.size + 1)
+    starts = np.maximum(ends - window, 0)
+    totals = value_sums[ends] - value_sums[starts]
+    counts = weight_sums[ends] - weight_sums[starts]
+
+    means = np.zeros(values.size, dtype=float)
+    np.divide(totals, counts, out=means, where=counts > 0)
+    return means
+
+
+def streaks(mask: np.ndarray) -> Tuple[int, int]:
+    """Return (current, longest) runs of True days.
+
+    The current streak ends on the last day, or on the day before when the
+    last day has not met the goal yet (so today's partial data does not
+    reset it).
+    """
+    if mask.size == 0:
+        return 0, 0
+
+    breaks = np.flatnonzero(~mask)
+    bounds = np.concatenate(([-1], breaks, [mask.size]))
+    runs = np.diff(bounds) - 1
+
+    current = runs[-1]
+    if not mask[-1] and runs.size > 1:
+        current = runs[-2]
+    return int(current), int(runs.max())
+
+
+class RangeAnalytics:
+    """Columnar view of a date range with vectorized report metrics"""
+
+    def __init__(self, columns: Dict[str, tuple], water_goal_ml: float, target_sleep_hours: float):
+        self.dates = np.array(columns['date'], dtype='datetime64[D]')
+        self.water_ml = np.array(columns['water_ml'], dtype=float)
+        self.sleep_logged = np.array(columns['has_sleep'], dtype=bool)
+        self.sleep_hours = np.array(columns['sleep_hours'], dtype=float)
+        self.gym_attended = np.array(columns['gym_attended'], dtype=float)
+        self.gym_missed = np.array(columns['gym_missed'], dtype=float)
+        self.water_goal_ml = water_goal_ml
+        self.target_sleep_hours = target_sleep_hours
+
+    @classmethod
+    def load(cls, tracker: HealthTracker, start_date: str, end_date: str) -> 'RangeAnalytics':
+        """Load a date range from the tracker's daily rollup"""
+        return cls(tracker.get_daily_columns(start_date, end_date),
+                   tracker.get_setting_float('daily_water_goal_ml', 2500),
+                   tracker.get_setting_float('target_sleep_hours', 8))
+
+    def rolling_sleep(self, window: int) -> np.ndarray:
+        """Trailing average sleep over logged nights"""
+        return rolling_mean(self.sleep_hours, window, self.sleep_logged.astype(float))
+
+    def rolling_water(self, window: int) -> np.ndarray:
+        """Trailing average daily water intake, counting unlogged days as zero"""
+        return rolling_mean(self.water_ml, window)
+
+    def sleep_debt(self) -> np.ndarray:
+        """Per-night shortfall against the sleep target (0 for unlogged nights)"""
+        shortfall = np.maximum(self.target_sleep_hours - self.sleep_hours, 0)
+        return np.where(self.sleep_logged, shortfall, 0.0)
+
+    def water_goal_met(self) -> np.ndarray:
+        """Days whose water total reached the daily goal"""
+        return self.water_ml >= self.water_goal_ml
+
+    def sleep_target_met(self) -> np.ndarray:
+        """Logged nights that reached the sleep target"""
+        return self.sleep_logged & (self.sleep_hours >= self.target_sleep_hours)
+
+    def weekly_totals(self) -> Dict[str, np.ndarray]:
+        """Sum each metric per Monday-based week of the range"""
+        if self.dates.size == 0:
+            empty = np.zeros(0)
+            return {'sleep_hours': empty, 'sleep_nights': empty, 'water_ml': empty,
+                    'days': empty, 'gym_attended': empty}
+
+        # 1970-01-01 was a Thursday, so shift by 3 to start weeks on Monday
+        week_index = (self.dates.astype(np.int64) + 3) // 7
+        starts = np.flatnonzero(np.concatenate(([True], np.diff(week_index) != 0)))
+        return {
+            'sleep_hours': np.add.reduceat(self.sleep_hours * self.sleep_logged, starts),
+            'sleep_nights': np.add.reduceat(self.sleep_logged.astype(float), starts),
+            'water_ml': np.add.reduceat(self.water_ml, starts),
+            'days': np.diff(np.concatenate((starts, [self.dates.size]))).astype(float),
+            'gym_attended': np.add.reduceat(self.gym_attended, starts),
+        }
+
+    def week_over_week(self) -> Dict[str, float]:
+        """Change between the last two weeks of the range"""
+        weeks = self.weekly_totals()
+        if weeks['days'].size < 2:
+            return {'sleep_hours': 0.0, 'water_ml': 0.0, 'gym_sessions': 0.0}
+
+        avg_sleep = np.divide(weeks['sleep_hours'], weeks['sleep_nights'],
+                              out=np.zeros_like(weeks['sleep_hours']), where=weeks['sleep_nights'] > 0)
+        avg_water = weeks['water_ml'] / weeks['days']
+        return {
+            'sleep_hours': round(float(avg_sleep[-1] - avg_sleep[-2]), 2),
+            'water_ml': round(float(avg_water[-1] - avg_water[-2]), 0),
+            'gym_sessions': float(weeks['gym_attended'][-1] - weeks['gym_attended'][-2]),
+        }
+
+    def report(self) -> Dict:
+        """All report metrics as plain Python values for templates and JSON"""
+        days = self.dates.size
+        nights = int(self.sleep_logged.sum())
+        water_streak, water_longest = streaks(self.water_goal_met())
+        sleep_streak, sleep_longest = streaks(self.sleep_target_met())
+        gym_entries = float(self.gym_attended.sum() + self.gym_missed.sum())
+
+        def last(series):
+            return round(float(series[-1]), 2) if series.size else 0.0
+
+        return {
+            'days': days,
+            'sleep_nights_logged': nights,
+            'rolling_sleep_7d': last(self.rolling_sleep(7)),
+            'rolling_sleep_30d': last(self.rolling_sleep(30)),
+            'rolling_water_7d': round(last(self.rolling_water(7)), 0),
+            'rolling_water_30d': round(last(self.rolling_water(30)), 0),
+            'sleep_debt_hours': round(float(self.sleep_debt().sum()), 1),
+            'avg_sleep_debt_hours': round(float(self.sleep_debt().sum()) / nights, 2) if nights else 0.0,
+            'water_goal_hit_rate': round(float(self.water_goal_met().mean()) * 100, 1) if days else 0.0,
+            'water_streak_current': water_streak,
+            'water_streak_longest': water_longest,
+            'sleep_streak_current': sleep_streak,
+            'sleep_streak_longest': sleep_longest,
+            'gym_attendance_rate': round(float(self.gym_attended.sum()) / gym_entries * 100, 1) if gym_entries else 0.0,
+            'week_over_week': self.week_over_week(),
+        }
+
+
+def range_report(tracker: HealthTracker, start_date: str, end_date: str) -> Dict:
+    """Load a range and compute its report metrics"""
+    return RangeAnalytics.load(tracker, start_date, end_date).report()
+
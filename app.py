@@ -6,35 +6,248 @@ A Flask web application for tracking sleep, gym attendance, water intake,
 and calculating opportunity loss from missed gym sessions.
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import (Flask, Response, render_template, request, jsonify, redirect, url_for, flash,
+                   g, make_response, session, stream_template, stream_with_context)
+from werkzeug.local import LocalProxy
 import datetime
+import gzip
+import io
 import json
-from health_tracker import HealthTracker
+import os
+import uuid
+import zlib
+from urllib.parse import urlsplit
+from health_tracker import HealthTracker, EXPORT_COLUMNS, IMPORT_FORMATS
+from series import build_series
+from batch_reports import batch_report, parse_ranges, period_ranges, report_csv
+from hydration import build_heatmap, build_timeline, minute_of_day, water_pace
+import sync
+from response_cache import ResultCache
+from scheduler import SummaryScheduler, load_summary, report_bounds, week_bounds
 
 app = Flask(__name__)
-app.secret_key = 'health_tracker_secret_key_2025'
 
-# Initialize the health tracker
-tracker = HealthTracker()
+# Multi-user mode gives every account its own database shard; otherwise the
+# app serves a single person from health_tracker.db as before
+MULTI_USER = os.environ.get('HEALTH_TRACKER_MULTI_USER') == '1'
+
+# Optional instrumentation, exported at /metrics; off by default. Optional
+# features import their modules only when enabled, to keep boot fast
+if os.environ.get('HEALTH_TRACKER_METRICS') == '1':
+    from instrumentation import Metrics
+    metrics = Metrics(slow_query_ms=float(os.environ.get('HEALTH_TRACKER_SLOW_QUERY_MS', '50')))
+    metrics.instrument_app(app)
+    tracker_factory = metrics.create_tracker
+else:
+    metrics = None
+    tracker_factory = HealthTracker
+
+# Background recomputation of stored summaries; HEALTH_TRACKER_SCHEDULER=0
+# turns it off and pages compute them on request instead. The worker starts
+# with the first request, so importing the app (CLI tools, tests, workers
+# that never serve) starts no thread and computes nothing
+if os.environ.get('HEALTH_TRACKER_SCHEDULER', '1') == '1':
+    scheduler = SummaryScheduler(poll_seconds=float(os.environ.get('HEALTH_TRACKER_SCHEDULER_POLL', '30')),
+                                 archive_months=int(os.environ.get('HEALTH_TRACKER_ARCHIVE_MONTHS', '0')) or None)
+    
+    def open_tracker(db_path):
+        return scheduler.watch(tracker_factory(db_path))
+else:
+    scheduler = None
+    open_tracker = tracker_factory
+
+if MULTI_USER:
+    from tenants import TenantRegistry, load_secret_key
+    ACCOUNTS_DB = os.environ.get('HEALTH_TRACKER_ACCOUNTS_DB', 'accounts.db')
+    # The signed session cookie decides which shard a request reads, so the
+    # key must not be guessable: HEALTH_TRACKER_SECRET_KEY, or a random key
+    # kept next to the accounts database
+    app.secret_key = os.environ.get('HEALTH_TRACKER_SECRET_KEY') or load_secret_key(ACCOUNTS_DB + '.key')
+    tenants = TenantRegistry(
+        accounts_db=ACCOUNTS_DB,
+        shard_dir=os.environ.get('HEALTH_TRACKER_SHARD_DIR', 'tenants'),
+        max_open_trackers=int(os.environ.get('HEALTH_TRACKER_MAX_OPEN_TENANTS', '64')),
+        tracker_factory=open_tracker)
+    default_tracker = None
+else:
+    # Only signs flash messages here; there is no login to forge
+    app.secret_key = os.environ.get('HEALTH_TRACKER_SECRET_KEY', 'health_tracker_secret_key_2025')
+    tenants = None
+    default_tracker = open_tracker('health_tracker.db')
+
+# Optional append-only event log (single-user mode): sleep, gym and water
+# logs are appended to segment files in this directory and applied to the
+# database in the background
+EVENT_LOG_DIR = os.environ.get('HEALTH_TRACKER_EVENT_LOG')
+if EVENT_LOG_DIR and default_tracker is not None:
+    from event_log import EventStore
+    event_store = EventStore(default_tracker, EVENT_LOG_DIR,
+                             fsync=os.environ.get('HEALTH_TRACKER_EVENT_LOG_FSYNC', '1') == '1')
+else:
+    event_store = None
+
+def current_tracker():
+    """HealthTracker for the signed-in tenant (or the single default one)"""
+    if tenants is None:
+        return default_tracker
+    if 'tracker' not in g:
+        g.tracker = tenants.tracker_for(session['user_id'])
+    return g.tracker
+
+# Routes use `tracker` as before; it resolves per request
+tracker = LocalProxy(current_tracker)
+# Log actions go through the event log when it is enabled
+writer = LocalProxy(lambda: event_store or current_tracker())
+
+PUBLIC_ENDPOINTS = {'login', 'register', 'static', 'metrics'}
+
+@app.before_request
+def start_scheduler():
+    if scheduler is not None and not scheduler.running:
+        scheduler.start()
+
+@app.before_request
+def require_login():
+    """In multi-user mode, send anonymous visitors to the login page"""
+    if tenants is None or request.endpoint in PUBLIC_ENDPOINTS or 'user_id' in session:
+        return None
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Authentication required'}), 401
+    return redirect(url_for('login', next=request.full_path if request.query_string else request.path))
+
+@app.context_processor
+def inject_user():
+    return {'multi_user': MULTI_USER, 'username': session.get('username')}
+
+# Computed page data, keyed by route, parameters and the tracker's data
+# generation so every write invalidates it, including writes from other
+# processes (see HealthTracker.current_generation)
+result_cache = ResultCache(max_entries=256)
+
+def cache_key(route, *params):
+    """Cache key for a route's result at the current data generation"""
+    return (route, params, tracker.instance_id, tracker.current_generation())
+
+def conditional_page(etag, render):
+    """Serve render() tagged with etag, or a 304 if the client already has it"""
+    # Pending flash messages get rendered into the page, so send it untagged
+    if session.get('_flashes'):
+        return render()
+    
+    if etag in request.if_none_match:
+        result_cache.record_not_modified()
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def request_idempotency_key():
+    """Idempotency key of a write request: the Idempotency-Key header, or an
+    idempotency_key form or JSON field (the log forms embed one per render)"""
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    if not key and request.is_json:
+        key = (request.get_json(silent=True) or {}).get('idempotency_key')
+    return str(key) if key else None
 
 @app.route('/')
 def dashboard():
     """Main dashboard showing weekly summary"""
     today = datetime.date.today().strftime("%Y-%m-%d")
-    try:
-        weekly_summary = tracker.get_weekly_summary(today)
-        
-        # Get daily water goal for progress calculation
-        water_goal = int(tracker.get_setting('daily_water_goal_ml') or 2500)
+    key = cache_key('dashboard', today)
+    
+    def render():
+        # Weekly summary (usually precomputed in the background), the daily
+        # water goal for progress calculation and the stored goal streaks
+        weekly_summary, water_goal, goal_streaks = result_cache.get_or_compute(key, lambda: (
+            load_summary(tracker, 'weekly', *week_bounds(today)),
+            tracker.get_setting_int('daily_water_goal_ml', 2500),
+            tracker.get_goal_streaks(today)
+        ))
         
         return render_template('dashboard.html', 
                              summary=weekly_summary, 
                              water_goal=water_goal,
+                             goal_streaks=goal_streaks,
                              today=today)
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
     except Exception as e:
         flash(f"Error loading dashboard: {e}", 'error')
         return render_template('dashboard.html', summary=None, water_goal=2500, today=today)
 
+def is_local_url(url):
+    """Whether url is a path on this site, so safe to follow after login.
+    
+    Browsers read a backslash as a slash and drop tabs and newlines, so
+    either could otherwise smuggle a second host into the path.
+    """
+    if not url.startswith('/') or '\\' in url or any(ord(char) < 32 for char in url):
+        return False
+    parts = urlsplit(url)
+    return not parts.scheme and not parts.netloc
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Sign in to a tenant account (multi-user mode only)"""
+    if tenants is None:
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username', '')
+        user_id = tenants.authenticate(username, request.form.get('password', ''))
+        if user_id is None:
+            flash('Invalid username or password.', 'error')
+            return redirect(url_for('login'))
+        
+        session.clear()
+        session['user_id'] = user_id
+        session['username'] = username.strip()
+        next_url = request.args.get('next', '')
+        if not is_local_url(next_url):
+            next_url = url_for('dashboard')
+        return redirect(next_url)
+    
+    return render_template('login.html')
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    """Create a tenant account with its own database shard"""
+    if tenants is None:
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username', '')
+        password = request.form.get('password', '')
+        if password != request.form.get('confirm_password', ''):
+            flash('Passwords do not match.', 'error')
+            return redirect(url_for('register'))
+        
+        try:
+            user_id = tenants.create_user(username, password)
+        except ValueError as e:
+            flash(f'Error: {e}', 'error')
+            return redirect(url_for('register'))
+        if user_id is None:
+            flash('That username is already taken.', 'error')
+            return redirect(url_for('register'))
+        
+        session.clear()
+        session['user_id'] = user_id
+        session['username'] = username.strip()
+        flash('Account created!', 'success')
+        return redirect(url_for('dashboard'))
+    
+    return render_template('register.html')
+
+@app.route('/logout')
+def logout():
+    """Sign out of the current tenant account"""
+    session.clear()
+    return redirect(url_for('login') if tenants is not None else url_for('dashboard'))
+
 @app.route('/log-sleep', methods=['GET', 'POST'])
 def log_sleep():
     """Log sleep data"""
@@ -46,7 +259,8 @@ def log_sleep():
             sleep_quality = int(request.form['sleep_quality']) if request.form.get('sleep_quality') else None
             notes = request.form['notes']
             
-            success = tracker.log_sleep(date, bedtime, wake_time, sleep_quality, notes)
+            success = writer.log_sleep(date, bedtime, wake_time, sleep_quality, notes,
+                                       idempotency_key=request_idempotency_key())
             
             if success:
                 flash('Sleep data logged successfully!', 'success')
@@ -60,7 +274,7 @@ def log_sleep():
     
     # GET request - show form with today's date
     today = datetime.date.today().strftime("%Y-%m-%d")
-    return render_template('log_sleep.html', today=today)
+    return render_template('log_sleep.html', today=today, idempotency_key=uuid.uuid4().hex)
 
 @app.route('/log-gym', methods=['GET', 'POST'])
 def log_gym():
@@ -74,7 +288,8 @@ def log_gym():
             calories = int(request.form['calories']) if request.form.get('calories') else None
             notes = request.form['notes']
             
-            success = tracker.log_gym_attendance(date, attended, workout_type, duration, calories, notes)
+            success = writer.log_gym_attendance(date, attended, workout_type, duration, calories, notes,
+                                                idempotency_key=request_idempotency_key())
             
             if success:
                 flash('Gym attendance logged successfully!', 'success')
@@ -87,7 +302,7 @@ def log_gym():
         return redirect(url_for('log_gym'))
     
     today = datetime.date.today().strftime("%Y-%m-%d")
-    return render_template('log_gym.html', today=today)
+    return render_template('log_gym.html', today=today, idempotency_key=uuid.uuid4().hex)
 
 @app.route('/log-water', methods=['GET', 'POST'])
 def log_water():
@@ -99,7 +314,8 @@ def log_water():
             time_logged = request.form.get('time') or None
             notes = request.form['notes']
             
-            success = tracker.log_water_intake(amount, date, time_logged, notes)
+            success = writer.log_water_intake(amount, date, time_logged, notes,
+                                              idempotency_key=request_idempotency_key())
             
             if success:
                 flash(f'Water intake logged: {amount}ml', 'success')
@@ -116,62 +332,105 @@ def log_water():
     
     # Get today's water total for display
     today_total = tracker.get_daily_water_total(today)
-    water_goal = int(tracker.get_setting('daily_water_goal_ml') or 2500)
+    water_goal = tracker.get_setting_int('daily_water_goal_ml', 2500)
+    pace = water_pace(tracker, today, minute_of_day(now), water_goal)
     
     return render_template('log_water.html', 
                          today=today, 
                          now=now, 
                          today_total=today_total,
-                         water_goal=water_goal)
+                         water_goal=water_goal,
+                         pace=pace,
+                         idempotency_key=uuid.uuid4().hex)
+
+# Records shown per table before "Load more" fetches the next page
+REPORT_PAGE_SIZE = 100
 
 @app.route('/reports')
 def reports():
     """Show detailed reports and analytics"""
     # Get date range from query params or default to last 30 days
-    end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
-    start_date = request.args.get('start_date', 
-                                (datetime.date.today() - datetime.timedelta(days=30)).strftime("%Y-%m-%d"))
+    default_start, default_end = report_bounds(datetime.date.today())
+    end_date = request.args.get('end_date', default_end)
+    start_date = request.args.get('start_date', default_start)
     
-    try:
-        # Get data for the date range
-        sleep_data = tracker.get_sleep_data(start_date, end_date)
-        gym_data = tracker.get_gym_attendance_data(start_date, end_date)
-        opportunity_loss = tracker.calculate_opportunity_loss(start_date, end_date)
-        
-        # Calculate some statistics
-        total_sleep_hours = sum(s['sleep_duration_hours'] for s in sleep_data if s['sleep_duration_hours'])
-        avg_sleep = total_sleep_hours / len(sleep_data) if sleep_data else 0
-        
-        gym_sessions_attended = sum(1 for g in gym_data if g['attended'])
-        total_gym_entries = len(gym_data)
-        gym_attendance_rate = (gym_sessions_attended / total_gym_entries * 100) if total_gym_entries > 0 else 0
+    key = cache_key('reports', start_date, end_date)
+    
+    def render():
+        # Aggregates from the rollup and ledger plus rolling averages, streaks,
+        # sleep debt and trends from analytics; the default range is usually
+        # precomputed in the background
+        report = result_cache.get_or_compute(key, lambda: load_summary(tracker, 'report', start_date, end_date))
+        summary, insights = report['summary'], report['insights']
         
         stats = {
-            'avg_sleep_hours': round(avg_sleep, 2),
-            'total_sleep_hours': round(total_sleep_hours, 1),
-            'gym_attendance_rate': round(gym_attendance_rate, 1),
-            'gym_sessions_attended': gym_sessions_attended,
-            'total_gym_entries': total_gym_entries
+            'avg_sleep_hours': summary['average_sleep_hours'],
+            'total_sleep_hours': summary['total_sleep_hours'],
+            'gym_attendance_rate': summary['gym_attendance_rate'],
+            'gym_sessions_attended': summary['gym_sessions_attended'],
+            'total_gym_entries': summary['total_gym_entries']
         }
         
-        return render_template('reports.html',
-                             sleep_data=sleep_data,
-                             gym_data=gym_data,
-                             opportunity_loss=opportunity_loss,
-                             stats=stats,
-                             start_date=start_date,
-                             end_date=end_date)
-                             
+        # The page is streamed, but the record pages (REPORT_PAGE_SIZE rows
+        # each) are read first: an error raised once the response has
+        # started would truncate a 200 instead of reaching the handler below
+        return Response(stream_with_context(stream_template(
+            'reports.html',
+            sleep_data=tracker.get_sleep_page(start_date, end_date, REPORT_PAGE_SIZE).prefetch(),
+            gym_data=tracker.get_gym_attendance_page(start_date, end_date, REPORT_PAGE_SIZE).prefetch(),
+            page_size=REPORT_PAGE_SIZE,
+            opportunity_loss=summary['opportunity_loss'],
+            stats=stats,
+            insights=insights,
+            start_date=start_date,
+            end_date=end_date)))
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
     except Exception as e:
         flash(f"Error generating reports: {e}", 'error')
         return render_template('reports.html', 
                              sleep_data=[], 
                              gym_data=[], 
+                             page_size=REPORT_PAGE_SIZE,
                              opportunity_loss={},
                              stats={},
+                             insights={},
                              start_date=start_date,
                              end_date=end_date)
 
+@app.route('/api/reports/batch', methods=['GET', 'POST'])
+def api_reports_batch():
+    """API endpoint returning per-range report stats for many ranges as one table.
+    
+    GET splits start_date..end_date into ?period=month (default), week or day
+    ranges; POST takes {"ranges": [[start, end], ...]}. ?format=csv returns CSV.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'csv'):
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    
+    def respond(table):
+        if fmt == 'csv':
+            return Response(report_csv(table), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=report.csv'})
+        return jsonify(table)
+    
+    try:
+        if request.method == 'POST':
+            return respond(batch_report(tracker, parse_ranges((request.get_json(silent=True) or {}).get('ranges'))))
+        
+        end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
+        start_date = request.args.get('start_date') or (
+            datetime.date.fromisoformat(end_date) - datetime.timedelta(days=364)).strftime("%Y-%m-%d")
+        period = request.args.get('period', 'month')
+        ranges = period_ranges(start_date, end_date, period)
+        key = cache_key('reports-batch', start_date, end_date, period)
+        return conditional_page(ResultCache.etag(key + (fmt,)),
+                                lambda: respond(result_cache.get_or_compute(key, lambda: batch_report(tracker, ranges))))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     """Manage application settings"""
@@ -188,7 +447,7 @@ def settings():
             
             for setting in settings_to_update:
                 if setting in request.form:
-                    tracker.update_setting(setting, request.form[setting])
+                    writer.update_setting(setting, request.form[setting])
             
             flash('Settings updated successfully!', 'success')
             
@@ -198,17 +457,7 @@ def settings():
         return redirect(url_for('settings'))
     
     # GET request - load current settings
-    current_settings = {}
-    setting_names = [
-        'daily_water_goal_ml',
-        'weekly_gym_goal',
-        'target_sleep_hours',
-        'gym_membership_cost_monthly',
-        'missed_workout_opportunity_cost'
-    ]
-    
-    for setting in setting_names:
-        current_settings[setting] = tracker.get_setting(setting)
+    current_settings = tracker.get_settings()
     
     return render_template('settings.html', settings=current_settings)
 
@@ -228,9 +477,12 @@ def api_quick_water():
         data = request.get_json()
         amount = data.get('amount', 250)  # Default 250ml
         
-        success = tracker.log_water_intake(amount)
+        success = writer.log_water_intake(amount, idempotency_key=request_idempotency_key())
         
         if success:
+            if event_store is not None:
+                # The new total is read back from the database
+                event_store.wait_applied()
             today = datetime.date.today().strftime("%Y-%m-%d")
             new_total = tracker.get_daily_water_total(today)
             return jsonify({'success': True, 'new_total': new_total, 'amount_added': amount})
@@ -240,5 +492,253 @@ def api_quick_water():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/records/<record_type>')
+def api_records(record_type):
+    """API endpoint listing sleep or gym records one keyset page at a time"""
+    end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
+    start_date = request.args.get('start_date', '0000-01-01')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    
+    pages = {'sleep': tracker.get_sleep_page, 'gym': tracker.get_gym_attendance_page}
+    if record_type not in pages:
+        return jsonify({'error': f'Unsupported record type: {record_type}'}), 400
+    try:
+        return jsonify(pages[record_type](start_date, end_date, limit, cursor).to_dict())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/flagged-records')
+def api_flagged_records():
+    """API endpoint listing records flagged as outliers or duplicates"""
+    record_type = request.args.get('record_type')
+    if record_type is not None and record_type not in EXPORT_COLUMNS:
+        return jsonify({'error': f'Unknown record type: {record_type}'}), 400
+    flagged = tracker.get_flagged_records(request.args.get('start_date'), request.args.get('end_date'),
+                                          record_type)
+    return jsonify({'flagged': flagged, 'count': len(flagged)})
+
+@app.route('/api/series/<metric>')
+def api_series(metric):
+    """API endpoint returning a bucketed chart series for one metric"""
+    end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
+    start_date = request.args.get('start_date',
+                                (datetime.date.today() - datetime.timedelta(days=30)).strftime("%Y-%m-%d"))
+    bucket = request.args.get('bucket', 'auto')
+    max_points = request.args.get('points', type=int)
+    key = cache_key('series', metric, start_date, end_date, bucket, max_points)
+    
+    def render():
+        return jsonify(result_cache.get_or_compute(key, lambda: build_series(
+            tracker, metric, start_date, end_date, bucket, max_points)))
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/water/timeline')
+def api_water_timeline():
+    """API endpoint returning cumulative intake curves per day and the average by hour"""
+    end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
+    try:
+        start_date = request.args.get('start_date') or (
+            datetime.date.fromisoformat(end_date) - datetime.timedelta(days=6)).strftime("%Y-%m-%d")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    key = cache_key('water-timeline', start_date, end_date)
+    
+    def render():
+        return jsonify(result_cache.get_or_compute(key, lambda: build_timeline(tracker, start_date, end_date)))
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/water/heatmap')
+def api_water_heatmap():
+    """API endpoint returning average intake per hour of day for each weekday"""
+    end_date = request.args.get('end_date', datetime.date.today().strftime("%Y-%m-%d"))
+    try:
+        start_date = request.args.get('start_date') or (
+            datetime.date.fromisoformat(end_date) - datetime.timedelta(days=89)).strftime("%Y-%m-%d")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    key = cache_key('water-heatmap', start_date, end_date)
+    
+    def render():
+        return jsonify(result_cache.get_or_compute(key, lambda: build_heatmap(tracker, start_date, end_date)))
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/water/pace')
+def api_water_pace():
+    """API endpoint comparing intake so far with the goal pace (?date=&time=HH:MM)"""
+    now = datetime.datetime.now()
+    date = request.args.get('date', now.strftime("%Y-%m-%d"))
+    try:
+        datetime.date.fromisoformat(date)
+        minute = minute_of_day(request.args.get('time', now.strftime("%H:%M")))
+        if not 0 <= minute < 24 * 60:
+            raise ValueError("time must be between 00:00 and 23:59")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(water_pace(tracker, date, minute))
+
+@app.route('/api/goals')
+def api_goals():
+    """API endpoint returning goal streaks and the evaluated periods of a date range"""
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    end_date = request.args.get('end_date', today)
+    try:
+        start_date = request.args.get('start_date') or (
+            datetime.date.fromisoformat(end_date) - datetime.timedelta(days=29)).strftime("%Y-%m-%d")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    goal = request.args.get('goal')
+    key = cache_key('goals', today, start_date, end_date, goal)
+    
+    def render():
+        return jsonify(result_cache.get_or_compute(key, lambda: {
+            'streaks': tracker.get_goal_streaks(today),
+            'periods': tracker.get_goal_status(start_date, end_date, goal),
+        }))
+    
+    try:
+        return conditional_page(ResultCache.etag(key), render)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Sync payloads are gzip-compressed when the client accepts it, and pushes
+# may be sent gzip-compressed (Content-Encoding: gzip)
+MAX_SYNC_BODY_BYTES = 16 * 1024 * 1024
+SYNC_COMPRESS_MIN_BYTES = 512
+
+def read_sync_json():
+    """JSON body of a sync request, decompressing it if needed"""
+    body = request.get_data(cache=False)
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_SYNC_BODY_BYTES + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip body: {e}")
+    if len(body) > MAX_SYNC_BODY_BYTES:
+        raise ValueError("Request body too large")
+    data = json.loads(body or b'{}')
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    return data
+
+def sync_response(payload, status=200):
+    """Compact JSON response, gzip-compressed when the client accepts it"""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    response = make_response(body, status)
+    response.mimetype = 'application/json'
+    response.vary.add('Accept-Encoding')
+    if len(body) >= SYNC_COMPRESS_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/sync/push', methods=['POST'])
+def api_sync_push():
+    """API endpoint storing a client's queued log entries in one batch.
+    
+    Body: {"client_id", "entries": [{"id", "type", "record"}], "token"?}.
+    With a token, the changes since it are returned too, so one round trip
+    both uploads and downloads.
+    """
+    try:
+        data = read_sync_json()
+        results = sync.push(writer, data.get('client_id'), data.get('entries', []))
+        payload = {'results': results}
+        if 'token' in data:
+            payload.update(sync.pull(tracker, data['token'], data.get('limit')))
+    except ValueError as e:
+        return sync_response({'error': str(e)}, 400)
+    return sync_response(payload)
+
+@app.route('/api/sync/pull')
+def api_sync_pull():
+    """API endpoint returning records changed since a change token (?token=&limit=)"""
+    try:
+        return sync_response(sync.pull(tracker, request.args.get('token'),
+                                       request.args.get('limit', type=int)))
+    except ValueError as e:
+        return sync_response({'error': str(e)}, 400)
+
+@app.route('/api/import/<record_type>', methods=['POST'])
+def api_import(record_type):
+    """API endpoint for bulk importing an uploaded CSV or JSON-lines file"""
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+    
+    fmt = request.form.get('format') or ('csv' if upload.filename.lower().endswith('.csv') else 'jsonl')
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+        # Through the event log when it is enabled, so replay sees imports too
+        result = writer.bulk_import(record_type, stream, fmt)
+        return jsonify({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/export/<record_type>')
+def api_export(record_type):
+    """API endpoint streaming every record of a type as CSV or JSON lines"""
+    fmt = request.args.get('format', 'jsonl')
+    if record_type not in EXPORT_COLUMNS or fmt not in IMPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export: {record_type} as {fmt}'}), 400
+    
+    lines = tracker.export(record_type, fmt,
+                           request.args.get('start_date'), request.args.get('end_date'))
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(lines), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={record_type}.{fmt}'})
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    """API endpoint reporting result cache size and hit rate"""
+    stats = {**result_cache.stats(), 'data_generation': tracker.current_generation()}
+    if tenants is not None:
+        stats['tenants'] = tenants.stats()
+    return jsonify(stats)
+
+@app.route('/api/jobs')
+def api_jobs():
+    """API endpoint reporting background summary jobs, queue depth and lag"""
+    if scheduler is None:
+        return jsonify({'error': 'The scheduler is disabled'}), 404
+    return jsonify(scheduler.status())
+
+@app.route('/api/event-log')
+def api_event_log():
+    """API endpoint reporting event log size, group commits and materializer lag"""
+    if event_store is None:
+        return jsonify({'error': 'The event log is disabled; set HEALTH_TRACKER_EVENT_LOG'}), 404
+    return jsonify(event_store.status())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics (only when HEALTH_TRACKER_METRICS=1)"""
+    if metrics is None:
+        return Response('Metrics are disabled; set HEALTH_TRACKER_METRICS=1\n', status=404,
+                        mimetype='text/plain')
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/slow-queries')
+def api_slow_queries():
+    """API endpoint listing recent statements over the slow-query threshold"""
+    if metrics is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return jsonify({'threshold_ms': metrics.slow_query_seconds * 1000,
+                    'total': metrics.slow_query_count,
+                    'queries': metrics.slow_query_log()})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Columnar archive for cold water and gym history
+
+Months older than a cutoff are moved out of the water_intake and
+gym_attendance tables into an archive directory next to the database
+(HealthTracker.archive_cold_data). Every column is a file of fixed-width
+little-endian values, appended one block per archived month and read through
+mmap, so a range read maps straight onto the rows it needs:
+
+    <db>.archive/index.json              blocks per type: [month, offset, count, pending]
+    <db>.archive/water/id.col            int64
+    <db>.archive/water/date.col          int32 day ordinal
+    <db>.archive/water/minute.col        int16 minute of day (time_logged)
+    <db>.archive/water/notes.off/.len    int64/int32 into notes.heap (len -1: NULL)
+
+Rows inside a block are sorted by (date, id), so a date range is found by
+bisecting the date column of the blocks whose month overlaps it. Integers
+that may be NULL use NULL_INT. Only rows the format stores exactly are
+archived (canonical YYYY-MM-DD dates, HH:MM times, integer values); anything
+else stays in the hot table.
+
+The index is replaced atomically after the column files are synced, with new
+blocks marked pending until the transaction deleting their hot rows has
+committed. Readers skip pending blocks, so a row is never read from both
+tiers. A pending block left by a crash is completed on the next open by
+deleting those rows again (HealthTracker._finish_archive), so none is lost.
+"""
+
+import bisect
+import datetime
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ARCHIVE_VERSION = 1
+NULL_INT = -2 ** 31
+
+# record type -> (table, columns as (name, typecode)); 's' is a string column
+# stored as offsets and lengths into a heap file
+ARCHIVE_LAYOUT = {
+    'water': ('water_intake', (('id', 'q'), ('date', 'i'), ('minute', 'h'), ('amount_ml', 'i'),
+                               ('notes', 's'))),
+    'gym': ('gym_attendance', (('id', 'q'), ('date', 'i'), ('attended', 'b'), ('workout_type', 's'),
+                               ('duration_minutes', 'i'), ('calories_burned', 'i'), ('notes', 's'))),
+}
+
+# Rows that can be archived losslessly, and the columns read to archive them
+ARCHIVABLE_SQL = {
+    'water': '''
+        SELECT id, date, time_logged, amount_ml, notes FROM water_intake
+        WHERE date < ? AND date GLOB '[0-9][0-9][0-9][0-9]-[0-1][0-9]-[0-3][0-9]'
+          AND time_logged GLOB '[0-2][0-9]:[0-5][0-9]' AND typeof(amount_ml) = 'integer'
+          AND amount_ml BETWEEN -2147483647 AND 2147483647
+    ''',
+    'gym': '''
+        SELECT id, date, attended, workout_type, duration_minutes, calories_burned, notes
+        FROM gym_attendance
+        WHERE date < ? AND date GLOB '[0-9][0-9][0-9][0-9]-[0-1][0-9]-[0-3][0-9]'
+          AND attended IN (0, 1)
+          AND typeof(workout_type) IN ('text', 'null') AND typeof(notes) IN ('text', 'null')
+          AND (duration_minutes IS NULL OR (typeof(duration_minutes) = 'integer'
+               AND duration_minutes BETWEEN -2147483647 AND 2147483647))
+          AND (calories_burned IS NULL OR (typeof(calories_burned) = 'integer'
+               AND calories_burned BETWEEN -2147483647 AND 2147483647))
+    ''',
+}
+
+_ITEM_SIZES = {'q': 8, 'i': 4, 'h': 2, 'b': 1}
+
+
+def _ordinal(date: str, default: datetime.date) -> int:
+    """Day ordinal of a date bound; open bounds such as '0000-01-01' give default"""
+    try:
+        return datetime.date.fromisoformat(date).toordinal()
+    except ValueError:
+        return default.toordinal()
+
+
+def _encode(record_type: str, row: Tuple) -> Tuple:
+    """Hot-table row (id, date, ...) as archive column values (strings left as str)"""
+    record_id, date = row[0], datetime.date.fromisoformat(row[1]).toordinal()
+    if record_type == 'water':
+        hours, minutes = row[2].split(':')
+        return record_id, date, int(hours) * 60 + int(minutes), row[3], row[4]
+    attended, workout_type, duration, calories, notes = row[2:]
+    return (record_id, date, attended, workout_type,
+            NULL_INT if duration is None else duration,
+            NULL_INT if calories is None else calories, notes)
+
+
+class _Column:
+    """A read-only mmap of one fixed-width column file"""
+
+    def __init__(self, path: str, typecode: str):
+        self.typecode = typecode
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._mmap = None
+        if self.size:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def values(self, offset: int, count: int) -> List:
+        if not count:
+            return []
+        item = _ITEM_SIZES[self.typecode]
+        with memoryview(self._mmap)[offset * item:(offset + count) * item] as raw:
+            if sys.byteorder == 'little':
+                with raw.cast(self.typecode) as view:
+                    return view.tolist()
+            values = array(self.typecode, raw)
+            values.byteswap()
+            return values.tolist()
+
+    def read_bytes(self, offset: int, length: int) -> bytes:
+        # A heap of only empty strings is an empty file, which cannot be mapped
+        return self._mmap[offset:offset + length] if length else b''
+
+
+class ColumnarArchive:
+    """Reader and appender for an archive directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index_stat = None
+        self._index: Dict = {}
+        self._columns: Dict[Tuple[str, str], _Column] = {}
+        self._dates: Dict[int, str] = {}
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, 'index.json'))
+
+    # Reading
+
+    def _load(self) -> Dict:
+        """Current index; reloaded (and columns remapped) when another writer replaced it"""
+        path = os.path.join(self.directory, 'index.json')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if key != self._index_stat:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version in {path}")
+            self._index, self._index_stat = index, key
+            self._columns = {}
+        return self._index
+
+    def _column(self, record_type: str, file_name: str, typecode: str) -> _Column:
+        column = self._columns.get((record_type, file_name))
+        if column is None:
+            column = _Column(os.path.join(self.directory, record_type, file_name), typecode)
+            self._columns[(record_type, file_name)] = column
+        return column
+
+    def _date(self, ordinal: int) -> str:
+        date = self._dates.get(ordinal)
+        if date is None:
+            date = self._dates[ordinal] = datetime.date.fromordinal(ordinal).isoformat()
+        return date
+
+    def blocks(self, record_type: str) -> List[List]:
+        """[month, offset, count, pending] of every block of a type, in append order"""
+        return self._load().get(record_type, {}).get('blocks', [])
+
+    def pending_ids(self, record_type: str) -> List[int]:
+        """Ids in blocks whose hot rows may not have been deleted yet"""
+        ids = []
+        for month, offset, count, pending in self.blocks(record_type):
+            if pending:
+                ids.extend(self._column(record_type, 'id.col', 'q').values(offset, count))
+        return ids
+
+    def _slices(self, record_type: str, start_date: str, end_date: str) -> Iterator[Tuple[int, int]]:
+        """(offset, count) of the rows of each block inside [start_date, end_date]"""
+        first = _ordinal(start_date, datetime.date.min)
+        last = _ordinal(end_date, datetime.date.max)
+        dates = self._column(record_type, 'date.col', 'i')
+        for month, offset, count, pending in self.blocks(record_type):
+            if pending or month < start_date[:7] or month > end_date[:7]:
+                continue
+            block_dates = dates.values(offset, count)
+            low = bisect.bisect_left(block_dates, first)
+            high = bisect.bisect_right(block_dates, last)
+            if high > low:
+                yield offset + low, high - low
+
+    def _read(self, record_type: str, offset: int, count: int) -> List[List]:
+        """Decoded column lists for a run of rows"""
+        columns = []
+        for name, typecode in ARCHIVE_LAYOUT[record_type][1]:
+            if typecode != 's':
+                columns.append(self._column(record_type, f'{name}.col', typecode).values(offset, count))
+                continue
+            heap = self._column(record_type, f'{name}.heap', 'b')
+            starts = self._column(record_type, f'{name}.off', 'q').values(offset, count)
+            lengths = self._column(record_type, f'{name}.len', 'i').values(offset, count)
+            columns.append([None if length < 0 else heap.read_bytes(start, length).decode('utf-8')
+                            for start, length in zip(starts, lengths)])
+        return columns
+
+    def rows(self, record_type: str, start_date: str, end_date: str) -> List[Tuple]:
+        """Archived rows in a date range as (date, id, *export columns), sorted by (date, id).
+
+        The export columns are those of EXPORT_COLUMNS in health_tracker, with
+        the values the hot table holds.
+        """
+        rows = []
+        for offset, count in self._slices(record_type, start_date, end_date):
+            columns = self._read(record_type, offset, count)
+            dates = [self._date(ordinal) for ordinal in columns[1]]
+            if record_type == 'water':
+                ids, _, minutes, amounts, notes = columns
+                times = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in minutes]
+                rows.extend(zip(dates, ids, dates, times, amounts, notes))
+            else:
+                ids, _, attended, workout_types, durations, calories, notes = columns
+                durations = [None if value == NULL_INT else value for value in durations]
+                calories = [None if value == NULL_INT else value for value in calories]
+                rows.extend(zip(dates, ids, dates, attended, workout_types, durations, calories, notes))
+        # Blocks are sorted inside; a month archived twice needs a merge
+        rows.sort()
+        return rows
+
+    def daily_totals(self, record_type: str, start_date: str, end_date: str) -> List[Tuple]:
+        """Per-day rollup contributions of the archived rows in a range.
+
+        water: (date, total ml, entries); gym: (date, attended, missed,
+        minutes, calories), matching the rollup upserts.
+        """
+        totals: Dict[int, List[int]] = {}
+        for offset, count in self._slices(record_type, start_date, end_date):
+            columns = self._read(record_type, offset, count)
+            if record_type == 'water':
+                for date, amount in zip(columns[1], columns[3]):
+                    day = totals.setdefault(date, [0, 0])
+                    day[0] += amount
+                    day[1] += 1
+            else:
+                for date, attended, duration, calories in zip(columns[1], columns[2], columns[4], columns[5]):
+                    day = totals.setdefault(date, [0, 0, 0, 0])
+                    day[0 if attended else 1] += 1
+                    day[2] += 0 if duration == NULL_INT else duration
+                    day[3] += 0 if calories == NULL_INT else calories
+        return [(self._date(date), *values) for date, values in sorted(totals.items())]
+
+    def water_by_minute(self, start_date: str, end_date: str) -> List[Tuple[str, int, int, int]]:
+        """(date, minute of day, total ml, entries) of the archived water in a range, sorted.
+
+        Reads only the date, minute and amount columns, for the intraday
+        hydration getters.
+        """
+        totals: Dict[Tuple[int, int], List[int]] = {}
+        for offset, count in self._slices('water', start_date, end_date):
+            dates = self._column('water', 'date.col', 'i').values(offset, count)
+            minutes = self._column('water', 'minute.col', 'h').values(offset, count)
+            amounts = self._column('water', 'amount_ml.col', 'i').values(offset, count)
+            for date, minute, amount in zip(dates, minutes, amounts):
+                slot = totals.setdefault((date, minute), [0, 0])
+                slot[0] += amount
+                slot[1] += 1
+        return [(self._date(date), minute, *values) for (date, minute), values in sorted(totals.items())]
+
+    def row_count(self, record_type: Optional[str] = None) -> int:
+        index = self._load()
+        types = [record_type] if record_type else list(ARCHIVE_LAYOUT)
+        return sum(index.get(t, {}).get('rows', 0) for t in types)
+
+    def disk_bytes(self) -> int:
+        """Total size of the archive files"""
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    # Writing
+
+    def append(self, record_type: str, rows: List[Tuple]) -> int:
+        """Append hot-table rows (as selected by ARCHIVABLE_SQL) as pending monthly blocks.
+
+        Readers see the rows once confirm() clears the pending mark; returns
+        the number of rows written.
+        """
+        if not rows:
+            return 0
+        index = dict(self._load()) or {'version': ARCHIVE_VERSION}
+        state = dict(index.get(record_type) or {'rows': 0, 'heaps': {}, 'blocks': []})
+        layout = ARCHIVE_LAYOUT[record_type][1]
+        folder = os.path.join(self.directory, record_type)
+        os.makedirs(folder, exist_ok=True)
+
+        # (date, id) order within every month
+        encoded = sorted((_encode(record_type, row) for row in rows), key=lambda values: (values[1], values[0]))
+        months: Dict[str, int] = {}
+        for values in encoded:
+            month = self._date(values[1])[:7]
+            months[month] = months.get(month, 0) + 1
+
+        rows_before = state['rows']
+        heaps = dict(state['heaps'])
+        for position, (name, typecode) in enumerate(layout):
+            values = [row[position] for row in encoded]
+            if typecode == 's':
+                heaps[name] = self._append_strings(folder, name, rows_before, heaps.get(name, 0), values)
+            else:
+                self._append_values(folder, f'{name}.col', rows_before * _ITEM_SIZES[typecode],
+                                    array(typecode, values))
+
+        blocks = list(state['blocks'])
+        offset = rows_before
+        for month, count in months.items():
+            blocks.append([month, offset, count, True])
+            offset += count
+        index[record_type] = {'rows': offset, 'heaps': heaps, 'blocks': blocks}
+        self._publish(index)
+        return len(encoded)
+
+    def confirm(self, record_type: str):
+        """Clear the pending mark once the archived rows are gone from the hot table"""
+        index = dict(self._load())
+        state = index.get(record_type)
+        if not state or not any(block[3] for block in state['blocks']):
+            return
+        index[record_type] = dict(state, blocks=[[month, offset, count, False]
+                                                 for month, offset, count, _ in state['blocks']])
+        self._publish(index)
+
+    @staticmethod
+    def _append_values(folder: str, file_name: str, committed_bytes: int, values: array):
+        """Append to a column file, first cutting off anything past the indexed rows
+        (left by an append that never reached the index)"""
+        if sys.byteorder != 'little':
+            values.byteswap()
+        with open(os.path.join(folder, file_name), 'ab') as f:
+            f.truncate(committed_bytes)
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_strings(self, folder: str, name: str, rows_before: int, heap_size: int,
+                        strings: List[Optional[str]]) -> int:
+        """Append strings to a column's heap and their offsets and lengths; returns the heap size"""
+        starts, lengths, chunks = array('q'), array('i'), []
+        position = heap_size
+        for value in strings:
+            data = b'' if value is None else value.encode('utf-8')
+            starts.append(position)
+            lengths.append(-1 if value is None else len(data))
+            chunks.append(data)
+            position += len(data)
+        self._append_values(folder, f'{name}.heap', heap_size, array('b', b''.join(chunks)))
+        self._append_values(folder, f'{name}.off', rows_before * 8, starts)
+        self._append_values(folder, f'{name}.len', rows_before * 4, lengths)
+        return position
+
+    def _publish(self, index: Dict):
+        path = os.path.join(self.directory, 'index.json')
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        self._index_stat = None
+        self._load()
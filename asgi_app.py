@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Async JSON API for quick water logging
+
+An ASGI application that runs alongside the Flask app (app.py) and serves
+the high-frequency endpoints used by phone and watch clients:
+
+- POST /api/quick-water       {"amount": 250}
+- GET  /api/daily-water/<date>
+
+Requests do not write to SQLite themselves. They are queued and a single
+writer task flushes everything that arrived within a few milliseconds in
+one transaction, so bursts from several clients do not serialize on the
+SQLite write lock. Running daily totals are kept in memory and returned
+without re-querying.
+
+Run with any ASGI server, for example:
+    uvicorn asgi_app:app --port 5001
+
+When the Flask app writes through an event log (HEALTH_TRACKER_EVENT_LOG),
+that log is owned by the Flask process and this app cannot append to it;
+POST /api/quick-water then answers 503 instead of writing to SQLite behind
+the log's back, where replay would never see the entry. Log water through
+the Flask app's /api/quick-water in that setup.
+"""
+
+import asyncio
+import datetime
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from health_tracker import HealthTracker
+
+
+class WaterWriteCoalescer:
+    """Single writer that batches queued water logs into one transaction"""
+
+    def __init__(self, tracker: HealthTracker, flush_interval: float = 0.005,
+                 max_batch: int = 1000):
+        self.tracker = tracker
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.batches_flushed = 0
+        self.entries_flushed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # One thread, so every flush runs on the same pooled connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='water-writer')
+        self._daily_totals: Dict[str, int] = {}
+        self._data_version: Optional[int] = None
+
+    def start(self):
+        """Start the writer task on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush anything queued and stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def log(self, amount_ml: int, date: str, time_logged: str, notes: str = "",
+                  idempotency_key: Optional[str] = None) -> int:
+        """Queue one entry, wait for its batch to commit and return the new daily total"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((date, time_logged, amount_ml, notes, idempotency_key), future))
+        return await future
+
+    async def daily_total(self, date: str) -> int:
+        """Current total for a date, served from memory once known"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read_total, date)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            # Let the burst accumulate, then drain whatever is queued
+            await asyncio.sleep(self.flush_interval)
+            batch = [item]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                queued = self._queue.get_nowait()
+                if queued is None:
+                    stopping = True
+                    break
+                batch.append(queued)
+
+            entries = [entry for entry, _ in batch]
+            try:
+                totals = await loop.run_in_executor(self._executor, self._flush, entries)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), total in zip(batch, totals):
+                if not future.done():
+                    future.set_result(total)
+
+    def _sync_totals(self):
+        """Drop cached totals if another connection or process has written"""
+        version = self.tracker.data_version()
+        if version != self._data_version:
+            self._daily_totals.clear()
+            self._data_version = version
+
+    def _read_total(self, date: str) -> int:
+        """Daily total from memory, seeding it from the rollup on first use"""
+        self._sync_totals()
+        if date not in self._daily_totals:
+            self._daily_totals[date] = self.tracker.get_daily_water_total(date)
+        return self._daily_totals[date]
+
+    def _flush(self, entries: List[Tuple[str, str, int, str, Optional[str]]]) -> List[int]:
+        """Write a batch (on the writer thread) and return each entry's running total"""
+        for date in {entry[0] for entry in entries}:
+            self._read_total(date)
+
+        if not self.tracker.log_water_intake_batch(entries):
+            raise RuntimeError("Failed to log water intake")
+        self.batches_flushed += 1
+        self.entries_flushed += len(entries)
+
+        if any(entry[4] is not None for entry in entries):
+            # Retried entries may have been skipped; report the committed totals
+            for date in {entry[0] for entry in entries}:
+                self._daily_totals[date] = self.tracker.get_daily_water_total(date)
+            return [self._daily_totals[entry[0]] for entry in entries]
+
+        running_totals = []
+        for date, _, amount_ml, _, _ in entries:
+            self._daily_totals[date] += amount_ml
+            running_totals.append(self._daily_totals[date])
+        return running_totals
+
+
+class QuickWaterApp:
+    """Minimal ASGI application exposing the quick water endpoints"""
+
+    def __init__(self, tracker: HealthTracker, accept_writes: bool = True):
+        self.tracker = tracker
+        self.writer = WaterWriteCoalescer(tracker)
+        self.accept_writes = accept_writes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        method = scope['method']
+        path = scope['path']
+        try:
+            if method == 'POST' and path == '/api/quick-water' and not self.accept_writes:
+                status, payload = 503, {'success': False,
+                                        'error': "Writes go through the event log; use the main app"}
+            elif method == 'POST' and path == '/api/quick-water':
+                headers = dict(scope.get('headers') or ())
+                key = headers.get(b'idempotency-key')
+                status, payload = await self._quick_water(await self._read_json(receive),
+                                                          key.decode('latin-1') if key else None)
+            elif method == 'GET' and path.startswith('/api/daily-water/'):
+                date = path[len('/api/daily-water/'):]
+                datetime.date.fromisoformat(date)
+                status, payload = 200, {'total': await self.writer.daily_total(date), 'date': date}
+            elif method == 'GET' and path == '/api/writer-stats':
+                status, payload = 200, {'batches_flushed': self.writer.batches_flushed,
+                                        'entries_flushed': self.writer.entries_flushed}
+            else:
+                status, payload = 404, {'error': 'Not found'}
+        except ValueError as e:
+            status, payload = 400, {'success': False, 'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'success': False, 'error': str(e)}
+
+        await self._send_json(send, status, payload)
+
+    async def _quick_water(self, data: Dict, idempotency_key: Optional[str] = None) -> Tuple[int, Dict]:
+        amount = int(data.get('amount', 250))  # Default 250ml
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+
+        now = datetime.datetime.now()
+        new_total = await self.writer.log(amount, now.strftime("%Y-%m-%d"), now.strftime("%H:%M"),
+                                          idempotency_key=idempotency_key or data.get('idempotency_key'))
+        return 200, {'success': True, 'new_total': new_total, 'amount_added': amount}
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.writer.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.writer.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_json(receive) -> Dict:
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        data = json.loads(body or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return data
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = QuickWaterApp(HealthTracker(), accept_writes=not os.environ.get('HEALTH_TRACKER_EVENT_LOG'))
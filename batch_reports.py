@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Report tables for many date ranges at once
+
+Report packs cover every month (or ISO week) of several years. Instead of
+one /reports computation per range, HealthTracker.get_range_summaries reads
+the daily rollup, missed ledger and membership price history once for the
+whole span and slices each range out of them in memory. This module builds
+the ranges and flattens the results into one table, one row per range,
+which is served as JSON or CSV.
+"""
+
+import datetime
+import io
+from typing import Dict, List, Tuple
+
+from health_tracker import HealthTracker
+from series import BUCKETS, iter_buckets
+
+MAX_BATCH_RANGES = 1000
+
+# Table columns; the last four come from each range's opportunity loss
+COLUMNS = ('start_date', 'end_date', 'days', 'sleep_nights', 'average_sleep_hours',
+           'total_sleep_hours', 'gym_sessions_attended', 'total_gym_entries',
+           'gym_attendance_rate', 'total_water_ml', 'average_daily_water_ml',
+           'missed_sessions', 'membership_cost_for_period', 'opportunity_loss', 'total_loss')
+LOSS_COLUMNS = ('missed_sessions', 'membership_cost_for_period', 'opportunity_loss', 'total_loss')
+
+
+def period_ranges(start_date: str, end_date: str, period: str = 'month') -> List[Tuple[str, str]]:
+    """Consecutive day, week or month ranges covering [start_date, end_date].
+
+    The first and last range are clipped to the requested dates.
+    """
+    if period not in BUCKETS:
+        raise ValueError(f"Unknown period: {period}")
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+
+    ranges = []
+    for bucket, days in iter_buckets(start, end, period):
+        first_day = max(bucket, start)
+        ranges.append((first_day.isoformat(), (first_day + datetime.timedelta(days=days - 1)).isoformat()))
+    return ranges
+
+
+def parse_ranges(value) -> List[Tuple[str, str]]:
+    """Ranges from JSON: a list of [start, end] pairs or {start_date, end_date} objects"""
+    if not isinstance(value, list):
+        raise ValueError("ranges must be a list")
+    ranges = []
+    for item in value:
+        if isinstance(item, dict):
+            item = (item.get('start_date'), item.get('end_date'))
+        if not isinstance(item, (list, tuple)) or len(item) != 2:
+            raise ValueError(f"Invalid range: {item!r}")
+        ranges.append((str(item[0]), str(item[1])))
+    return ranges
+
+
+def batch_report(tracker: HealthTracker, ranges: List[Tuple[str, str]]) -> Dict:
+    """Per-range stats as a table: {'columns': [...], 'rows': [[...], ...]}"""
+    if len(ranges) > MAX_BATCH_RANGES:
+        raise ValueError(f"At most {MAX_BATCH_RANGES} ranges per report")
+
+    rows = []
+    for summary in tracker.get_range_summaries(ranges):
+        loss = summary['opportunity_loss']
+        rows.append([loss[column] if column in LOSS_COLUMNS else summary[column] for column in COLUMNS])
+    return {'columns': list(COLUMNS), 'rows': rows}
+
+
+def report_csv(table: Dict) -> str:
+    """A batch report table as CSV with a header row"""
+    import csv
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table['columns'])
+    writer.writerows(table['rows'])
+    return buffer.getvalue()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Long-range analytics benchmark
+
+Generates ten years of synthetic sleep, gym and water data and times the
+vectorized RangeAnalytics report against the same metrics computed with
+Python loops over get_daily_aggregates.
+
+    python benchmarks/bench_analytics.py --years 10
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+from analytics import RangeAnalytics
+from datagen import populate
+
+
+def python_report(tracker, start_date, end_date):
+    """Reference implementation of the report metrics with plain loops"""
+    days = tracker.get_daily_aggregates(start_date, end_date)
+    water_goal = tracker.get_setting_float('daily_water_goal_ml')
+    target_sleep = tracker.get_setting_float('target_sleep_hours')
+
+    rolling = {}
+    for window in (7, 30):
+        sleep_avgs, water_avgs = [], []
+        for i in range(len(days)):
+            chunk = days[max(0, i - window + 1):i + 1]
+            nights = [d['sleep_hours'] for d in chunk if d['has_sleep']]
+            sleep_avgs.append(sum(nights) / len(nights) if nights else 0)
+            water_avgs.append(sum(d['water_ml'] for d in chunk) / len(chunk))
+        rolling[window] = (sleep_avgs, water_avgs)
+
+    longest = run = 0
+    for d in days:
+        run = run + 1 if d['water_ml'] >= water_goal else 0
+        longest = max(longest, run)
+
+    debt = sum(max(target_sleep - d['sleep_hours'], 0) for d in days if d['has_sleep'])
+    hit_rate = sum(1 for d in days if d['water_ml'] >= water_goal) / len(days)
+    return rolling, longest, debt, hit_rate
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tracker = HealthTracker(os.path.join(tempfile.mkdtemp(prefix='health_tracker_bench_'), 'bench.db'))
+    start = datetime.date(2015, 1, 1)
+    days = args.years * 365
+    populate(tracker, start, days)
+    start_date = start.isoformat()
+    end_date = (start + datetime.timedelta(days=days - 1)).isoformat()
+
+    load_ms = timed(lambda: RangeAnalytics.load(tracker, start_date, end_date), args.repeat)
+    analytics = RangeAnalytics.load(tracker, start_date, end_date)
+    compute_ms = timed(analytics.report, args.repeat)
+    python_ms = timed(lambda: python_report(tracker, start_date, end_date), 1)
+
+    print(f"{args.years} years ({days} days)")
+    print(f"RangeAnalytics.load:     {load_ms:10.2f} ms")
+    print(f"RangeAnalytics.report:   {compute_ms:10.2f} ms")
+    print(f"Python loop reference:   {python_ms:10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Archive tier benchmark
+
+Generates several years of synthetic data, then compares two copies of the
+database: one with every entry hot, and one whose months older than
+--keep-months were moved to the columnar archive (and VACUUMed). Prints the
+database and archive sizes and the latency of a five-year report (summary
+with records, analytics), five years of water entries and a five-year water
+export on each.
+
+    python benchmarks/bench_archive.py --years 6 --water-per-day 8
+"""
+
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+from analytics import range_report
+from datagen import DEFAULT_START, days_for_years, populate
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def db_bytes(tracker: HealthTracker) -> int:
+    tracker._get_connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(tracker.db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=float, default=6)
+    parser.add_argument('--water-per-day', type=int, default=8)
+    parser.add_argument('--keep-months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    days = days_for_years(args.years)
+    hot = HealthTracker(os.path.join(workdir, 'hot.db'))
+    populate(hot, DEFAULT_START, days, args.water_per_day)
+    hot_size = db_bytes(hot)
+
+    shutil.copyfile(hot.db_path, os.path.join(workdir, 'archived.db'))
+    archived = HealthTracker(os.path.join(workdir, 'archived.db'))
+    today = DEFAULT_START + datetime.timedelta(days=days)
+    start = time.perf_counter()
+    counts = archived.archive_cold_data(args.keep_months, today)
+    archive_seconds = time.perf_counter() - start
+    archived._get_connection().execute('VACUUM')
+
+    end_date = (today - datetime.timedelta(days=1)).isoformat()
+    start_date = (today - datetime.timedelta(days=5 * 365)).isoformat()
+
+    def scenarios(tracker):
+        return {
+            '5y report (summary + records)': lambda: tracker.get_range_summary(start_date, end_date),
+            '5y report analytics': lambda: range_report(tracker, start_date, end_date),
+            '5y get_water_entries': lambda: tracker.get_water_entries(start_date, end_date),
+            '5y gym records': lambda: tracker.get_gym_attendance_data(start_date, end_date),
+            '5y water export (jsonl)': lambda: sum(1 for _ in tracker.export('water', 'jsonl', start_date, end_date)),
+        }
+
+    print(f"{args.years:g} years, {args.water_per_day} water entries/day; "
+          f"archived {counts['water']} water and {counts['gym']} gym entries in {archive_seconds:.2f} s")
+    print(f"{'':<32}{'all hot':>12}{'archived':>12}")
+    print(f"{'database bytes':<32}{hot_size:>12}{db_bytes(archived):>12}")
+    print(f"{'archive bytes':<32}{0:>12}{archived.archive_stats()['bytes']:>12}")
+    hot_runs, archived_runs = scenarios(hot), scenarios(archived)
+    for name in hot_runs:
+        print(f"{name + ' ms':<32}{timed(hot_runs[name], args.repeat):>12.1f}"
+              f"{timed(archived_runs[name], args.repeat):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Batch report benchmark
+
+Generates ten years of synthetic data and computes a report pack of 120
+monthly ranges three ways: one /reports request per month (the loop a
+report pack needed before), get_range_summary per month, and a single
+get_range_summaries call / /api/reports/batch request. The batch results
+are checked against get_range_summary first.
+
+    python benchmarks/bench_batch_reports.py --months 120
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from datagen import DEFAULT_START, populate
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--months', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # app.py opens health_tracker.db in the working directory; background
+    # precomputation would compete with the timings
+    os.chdir(tempfile.mkdtemp(prefix='health_tracker_bench_'))
+    os.environ['HEALTH_TRACKER_SCHEDULER'] = '0'
+    from app import app, default_tracker as tracker, result_cache
+    from batch_reports import period_ranges
+
+    first = DEFAULT_START
+    months = first.month - 1 + args.months
+    last = datetime.date(first.year + months // 12, months % 12 + 1, 1) - datetime.timedelta(days=1)
+    populate(tracker, first, (last - first).days + 1)
+    ranges = period_ranges(first.isoformat(), last.isoformat(), 'month')
+
+    for (start_date, end_date), summary in zip(ranges, tracker.get_range_summaries(ranges)):
+        reference = tracker.get_range_summary(start_date, end_date, include_records=False)
+        assert all(reference[key] == value for key, value in summary.items() if key in reference), \
+            (start_date, end_date)
+
+    client = app.test_client()
+
+    def reports_loop():
+        # Stored summaries and cached pages would turn repeats into lookups
+        result_cache.clear()
+        with tracker._get_connection() as conn:
+            conn.execute('DELETE FROM precomputed_summaries')
+        for start_date, end_date in ranges:
+            response = client.get(f'/reports?start_date={start_date}&end_date={end_date}')
+            response.get_data()
+            assert response.status_code == 200
+
+    def batch_request():
+        result_cache.clear()
+        response = client.get(f'/api/reports/batch?start_date={first}&end_date={last}&period=month')
+        assert response.status_code == 200 and len(response.get_json()['rows']) == len(ranges)
+
+    timings = {
+        '/reports per range': timed(reports_loop, args.repeat),
+        'get_range_summary per range': timed(
+            lambda: [tracker.get_range_summary(start_date, end_date, include_records=False)
+                     for start_date, end_date in ranges], args.repeat),
+        'get_range_summaries': timed(lambda: tracker.get_range_summaries(ranges), args.repeat),
+        '/api/reports/batch': timed(batch_request, args.repeat),
+    }
+
+    print(f"{len(ranges)} monthly ranges, {first} to {last}")
+    for name, ms in timings.items():
+        print(f"{name:<30}{ms:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
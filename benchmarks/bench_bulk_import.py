@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bulk import/export throughput benchmark
+
+Compares rows per second for a log_water_intake loop against
+HealthTracker.bulk_import (CSV stream), and measures the streaming export.
+
+    python benchmarks/bench_bulk_import.py --rows 200000
+"""
+
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+
+
+def water_csv(rows, seed=42):
+    """Build a CSV of synthetic water entries, ~8 per day"""
+    rng = random.Random(seed)
+    start = datetime.date(2015, 1, 1)
+    lines = ["date,time_logged,amount_ml,notes"]
+    for i in range(rows):
+        day = start + datetime.timedelta(days=i // 8)
+        lines.append(f"{day.isoformat()},{rng.randint(6, 22):02d}:{rng.randint(0, 59):02d},"
+                     f"{rng.choice((150, 250, 330, 500))},")
+    return "\n".join(lines) + "\n"
+
+
+def csv_records(data, limit):
+    """Split the first `limit` CSV data lines into fields"""
+    for line in data.splitlines()[1:limit + 1]:
+        yield line.split(',')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--loop-rows', type=int, default=5000,
+                        help="Rows for the per-row log_water_intake baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    data = water_csv(args.rows)
+
+    loop_tracker = HealthTracker(os.path.join(workdir, 'loop.db'))
+    records = list(csv_records(data, args.loop_rows))
+    start = time.perf_counter()
+    for record in records:
+        loop_tracker.log_water_intake(int(record[2]), record[0], record[1])
+    loop_rate = len(records) / (time.perf_counter() - start)
+
+    bulk_tracker = HealthTracker(os.path.join(workdir, 'bulk.db'))
+    start = time.perf_counter()
+    result = bulk_tracker.bulk_import('water', io.StringIO(data), 'csv')
+    bulk_rate = result['imported'] / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    exported = sum(1 for _ in bulk_tracker.export('water', 'jsonl'))
+    export_rate = exported / (time.perf_counter() - start)
+
+    print(f"log_water_intake loop: {loop_rate:>12,.0f} rows/s ({len(records)} rows)")
+    print(f"bulk_import (csv):     {bulk_rate:>12,.0f} rows/s ({result['imported']} rows)")
+    print(f"export (jsonl):        {export_rate:>12,.0f} rows/s ({exported} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Connection benchmark for the Flask routes
+
+Counts how many SQLite connections each request opens and reports p50/p99
+latency for the dashboard (`/`) and quick water logging (`/api/quick-water`).
+Each request runs on a fresh thread, the same way the threaded Flask
+development server serves requests.
+
+Run it on two commits to compare before/after:
+    python benchmarks/bench_connections.py --requests 500
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+connect_calls = 0
+_original_connect = sqlite3.connect
+
+
+def _counting_connect(*args, **kwargs):
+    global connect_calls
+    connect_calls += 1
+    return _original_connect(*args, **kwargs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_requests(client, method, path, count, json_body=None):
+    """Issue `count` requests, each on its own thread, and collect timings"""
+    global connect_calls
+    timings = []
+    connect_calls = 0
+
+    def one_request():
+        start = time.perf_counter()
+        if method == 'POST':
+            response = client.post(path, json=json_body)
+        else:
+            response = client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    for _ in range(count):
+        worker = threading.Thread(target=one_request)
+        worker.start()
+        worker.join()
+
+    return {
+        'connects_per_request': connect_calls / count,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    os.chdir(workdir)
+    sqlite3.connect = _counting_connect
+
+    from app import app, tracker
+
+    # A week of data so the dashboard has something to summarize
+    today = time.strftime("%Y-%m-%d")
+    for _ in range(20):
+        tracker.log_water_intake(250, today)
+    tracker.log_sleep(today, '23:00', '07:00', 8)
+    tracker.log_gym_attendance(today, True, 'Strength', 60, 300)
+
+    client = app.test_client()
+    results = {
+        'GET /': run_requests(client, 'GET', '/', args.requests),
+        'POST /api/quick-water': run_requests(client, 'POST', '/api/quick-water',
+                                              args.requests, {'amount': 250}),
+    }
+
+    print(f"{'route':<26}{'connects/req':>14}{'p50 ms':>10}{'p99 ms':>10}")
+    for route, stats in results.items():
+        print(f"{route:<26}{stats['connects_per_request']:>14.2f}"
+              f"{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
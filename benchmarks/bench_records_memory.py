@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Record memory benchmark
+
+Measures memory and time per 100k rows for the slotted record types
+(SleepRecord, GymSession) against the per-row dicts the getters used to
+build, plus the peak memory of the lazy iterator variants.
+
+    python benchmarks/bench_records_memory.py --rows 100000
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+
+
+def dict_rows(tracker, start_date, end_date):
+    """The previous get_gym_attendance_data: one dict per row"""
+    cursor = tracker._get_connection().cursor()
+    cursor.execute('''
+        SELECT date, attended, workout_type, duration_minutes, calories_burned, notes
+        FROM gym_attendance WHERE date BETWEEN ? AND ? ORDER BY date DESC
+    ''', (start_date, end_date))
+    return [
+        {'date': row[0], 'attended': bool(row[1]), 'workout_type': row[2],
+         'duration_minutes': row[3], 'calories_burned': row[4], 'notes': row[5]}
+        for row in cursor.fetchall()
+    ]
+
+
+def measure(func):
+    """Return (result size, peak MiB, seconds) for building func()"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    size = result if isinstance(result, int) else len(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak / (1024 * 1024), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    tracker = HealthTracker(os.path.join(tempfile.mkdtemp(prefix='health_tracker_bench_'), 'bench.db'))
+    start = datetime.date(2000, 1, 1)
+    tracker.bulk_import('gym', (
+        {'date': (start + datetime.timedelta(days=i // 3)).isoformat(), 'attended': i % 4 != 0,
+         'workout_type': 'Strength', 'duration_minutes': 60, 'calories_burned': 400, 'notes': ''}
+        for i in range(args.rows)
+    ))
+    start_date, end_date = '0000-01-01', '9999-12-31'
+
+    scale = 100000 / args.rows
+    cases = (
+        ('dicts (before)', lambda: dict_rows(tracker, start_date, end_date)),
+        ('GymSession list', lambda: tracker.get_gym_attendance_data(start_date, end_date)),
+        ('GymSession iterator', lambda: sum(1 for _ in tracker.iter_gym_attendance_data(start_date, end_date))),
+    )
+    print(f"{'variant':<22}{'rows':>10}{'MiB/100k':>12}{'s/100k':>10}")
+    for name, func in cases:
+        rows, peak_mib, elapsed = measure(func)
+        print(f"{name:<22}{rows:>10}{peak_mib * scale:>12.2f}{elapsed * scale:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for short-lived processes
+
+Times fresh Python processes that import health_tracker, construct a
+HealthTracker against a new and an already-migrated database, run a CLI
+command, and boot the Flask app. An empty interpreter (`python -c pass`) is
+timed as well so its fixed cost can be subtracted.
+
+Run it on two commits to compare before/after:
+    python benchmarks/bench_startup.py --runs 30
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'python -c pass': "pass",
+    'import health_tracker': "import health_tracker",
+    'HealthTracker (new db)': "from health_tracker import HealthTracker; HealthTracker('new.db')",
+    'HealthTracker (current db)': "from health_tracker import HealthTracker; HealthTracker('current.db')",
+    'CLI rebuild-rollup': "import health_tracker; health_tracker.main(['--db', 'current.db', 'rebuild-rollup'])",
+    'import app': "import app",
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_process(code: str, workdir: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    # The app's defaults, whatever the calling shell sets: importing it must
+    # stay cheap with the background scheduler enabled
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE='1',
+               HEALTH_TRACKER_SCHEDULER='1', HEALTH_TRACKER_METRICS='0', HEALTH_TRACKER_MULTI_USER='0')
+    env.pop('HEALTH_TRACKER_EVENT_LOG', None)
+    # Bytecode for the repo modules is compiled once here, not inside the timings
+    subprocess.run([sys.executable, '-c', SCENARIOS['import app'] + "; import tenants, instrumentation"],
+                   cwd=workdir, env=dict(env, PYTHONDONTWRITEBYTECODE=''), check=True)
+    subprocess.run([sys.executable, '-c', SCENARIOS['HealthTracker (new db)'].replace('new.db', 'current.db')],
+                   cwd=workdir, env=env, check=True)
+
+    print(f"{'scenario':<30}{'p50 ms':>10}{'mean ms':>10}{'min ms':>10}")
+    for name, code in SCENARIOS.items():
+        timings = []
+        for _ in range(args.runs):
+            for leftover in ('new.db', 'new.db-wal', 'new.db-shm'):
+                if os.path.exists(os.path.join(workdir, leftover)):
+                    os.remove(os.path.join(workdir, leftover))
+            timings.append(time_process(code, workdir, env))
+        print(f"{name:<30}{percentile(timings, 50):>10.1f}{sum(timings) / len(timings):>10.1f}"
+              f"{min(timings):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Dashboard latency as the number of tenants grows
+
+Runs the app in multi-user mode, creates N tenant shards with a week of data
+each, then requests the dashboard as randomly chosen tenants and reports
+p50/p99 latency, how often a shard had to be reopened, and how many SQLite
+connections stayed open under the LRU bound.
+
+    python benchmarks/bench_tenants.py --tenants 10,100,1000 --max-open 64
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed_tenant(tracker, today):
+    """A week of sleep, gym and water entries"""
+    for offset in range(7):
+        day = (today - datetime.timedelta(days=offset)).strftime("%Y-%m-%d")
+        tracker.log_sleep(day, '23:00', '07:00', 7)
+        tracker.log_gym_attendance(day, offset % 2 == 0, 'Strength', 45, 300)
+        tracker.log_water_intake_batch([(day, '12:00', 500, '')] * 4)
+
+
+def run(tenant_count, requests, max_open, seed):
+    from app import app, tenants, result_cache
+
+    tenants.close()
+    tenants.max_open_trackers = max_open
+    result_cache.clear()
+    today = datetime.date.today()
+
+    user_ids = list(range(1, tenant_count + 1))
+    for user_id in user_ids:
+        if not os.path.exists(tenants.shard_path(user_id)):
+            seed_tenant(tenants.tracker_for(user_id), today)
+    tenants.close()
+
+    opened_before = tenants.trackers_opened
+    rng = random.Random(seed)
+    client = app.test_client()
+    timings = []
+    for _ in range(requests):
+        with client.session_transaction() as session:
+            session['user_id'] = rng.choice(user_ids)
+        start = time.perf_counter()
+        response = client.get('/')
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    open_connections = sum(len(tracker._all_connections) for tracker in tenants._trackers.values())
+    return {
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'reopen_rate': (tenants.trackers_opened - opened_before) / requests,
+        'open_trackers': tenants.stats()['open_trackers'],
+        'open_connections': open_connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tenants', default='10,100,1000',
+                        help='comma-separated tenant counts to measure')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--max-open', type=int, default=64,
+                        help='LRU bound on open tenant trackers')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    os.chdir(workdir)
+    os.environ['HEALTH_TRACKER_MULTI_USER'] = '1'
+
+    print(f"{'tenants':>8}{'p50 ms':>10}{'p99 ms':>10}{'reopen %':>10}"
+          f"{'open trackers':>15}{'open conns':>12}")
+    for count in (int(value) for value in args.tenants.split(',')):
+        stats = run(count, args.requests, args.max_open, args.seed)
+        print(f"{count:>8}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['reopen_rate'] * 100:>10.1f}{stats['open_trackers']:>15}"
+              f"{stats['open_connections']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic data for the benchmarks
+
+Each record type is drawn from its own seeded generator, so the same
+arguments always produce the same rows no matter which types are loaded or
+in what order. Records are yielded lazily and loaded with bulk_import, so
+decades of data never sit in memory at once.
+
+    python benchmarks/datagen.py out.db --years 5 --water-per-day 8
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+from typing import Dict, Iterator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+
+DEFAULT_START = datetime.date(2015, 1, 1)
+WORKOUT_TYPES = ('Strength', 'Cardio', 'Yoga', 'HIIT', 'Swimming')
+WATER_AMOUNTS = (200, 250, 330, 500, 750)
+
+
+def days_for_years(years: float) -> int:
+    return max(1, int(round(years * 365)))
+
+
+def _dates(start: datetime.date, days: int) -> Iterator[str]:
+    for offset in range(days):
+        yield (start + datetime.timedelta(days=offset)).isoformat()
+
+
+def sleep_records(start: datetime.date, days: int, density: float = 0.9,
+                  seed: int = 7) -> Iterator[Dict]:
+    """One night on roughly `density` of the days"""
+    rng = random.Random(f"{seed}-sleep")
+    for date in _dates(start, days):
+        if rng.random() >= density:
+            continue
+        yield {'date': date,
+               'bedtime': f"{rng.randint(21, 23)}:{rng.randint(0, 59):02d}",
+               'wake_time': f"{rng.randint(5, 8):02d}:{rng.randint(0, 59):02d}",
+               'sleep_quality': rng.randint(1, 10)}
+
+
+def gym_records(start: datetime.date, days: int, density: float = 0.6,
+                attendance: float = 0.7, seed: int = 7) -> Iterator[Dict]:
+    """A planned session on roughly `density` of the days, attended `attendance` of the time"""
+    rng = random.Random(f"{seed}-gym")
+    for date in _dates(start, days):
+        if rng.random() >= density:
+            continue
+        attended = rng.random() < attendance
+        yield {'date': date,
+               'attended': attended,
+               'workout_type': rng.choice(WORKOUT_TYPES) if attended else '',
+               'duration_minutes': rng.randint(30, 90) if attended else None,
+               'calories_burned': rng.randint(150, 700) if attended else None}
+
+
+def water_records(start: datetime.date, days: int, per_day: int = 6,
+                  seed: int = 7) -> Iterator[Dict]:
+    """Exactly `per_day` drinks per day at sorted times between 07:00 and 22:59"""
+    rng = random.Random(f"{seed}-water")
+    for date in _dates(start, days):
+        minutes = sorted(rng.randint(7 * 60, 23 * 60 - 1) for _ in range(per_day))
+        for minute in minutes:
+            yield {'date': date,
+                   'time_logged': f"{minute // 60:02d}:{minute % 60:02d}",
+                   'amount_ml': rng.choice(WATER_AMOUNTS)}
+
+
+def populate(tracker: HealthTracker, start: datetime.date, days: int, water_per_day: int = 6,
+             sleep_density: float = 0.9, gym_density: float = 0.6, seed: int = 7) -> Dict[str, int]:
+    """Bulk import `days` days of synthetic records; returns rows imported per type"""
+    sources = (
+        ('sleep', sleep_records(start, days, sleep_density, seed)),
+        ('gym', gym_records(start, days, gym_density, seed=seed)),
+        ('water', water_records(start, days, water_per_day, seed)),
+    )
+    return {record_type: tracker.bulk_import(record_type, records)['imported']
+            for record_type, records in sources}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('db_path')
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--start-date', default=DEFAULT_START.isoformat())
+    parser.add_argument('--water-per-day', type=int, default=6)
+    parser.add_argument('--sleep-density', type=float, default=0.9)
+    parser.add_argument('--gym-density', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    tracker = HealthTracker(args.db_path)
+    counts = populate(tracker, datetime.date.fromisoformat(args.start_date),
+                      days_for_years(args.years), args.water_per_day,
+                      args.sleep_density, args.gym_density, args.seed)
+    print(', '.join(f"{count} {record_type}" for record_type, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Quick water load test
+
+Drives POST /api/quick-water with many concurrent clients and reports
+requests per second and latency percentiles for:
+
+- the Flask app (one thread per client, each request a synchronous insert
+  followed by a total query)
+- the ASGI app (asgi_app.py), whose single writer coalesces requests into
+  batched transactions
+
+Both apps are called in-process, so the numbers exclude network and HTTP
+server overhead.
+
+    python benchmarks/load_quick_water.py --clients 32 --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(name, latencies, elapsed):
+    print(f"{name:<8}{len(latencies) / elapsed:>12,.0f} req/s"
+          f"{percentile(latencies, 50):>10.2f} ms p50"
+          f"{percentile(latencies, 99):>10.2f} ms p99"
+          f"{max(latencies):>10.2f} ms max")
+
+
+def run_flask(clients, requests_per_client):
+    from app import app
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            response = test_client.post('/api/quick-water', json={'amount': 250})
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report('flask', latencies, time.perf_counter() - start)
+
+
+async def asgi_request(app, body):
+    sent = []
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/quick-water', 'headers': []}
+    await app(scope, receive, send)
+    return sent[0]['status']
+
+
+async def run_asgi_clients(clients, requests_per_client):
+    from asgi_app import app
+    latencies = []
+    body = json.dumps({'amount': 250}).encode()
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            status = await asgi_request(app, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert status == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    report('asgi', latencies, elapsed)
+    print(f"         {app.writer.entries_flushed} entries in {app.writer.batches_flushed} transactions")
+    await app.writer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per client")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='health_tracker_bench_'))
+    print(f"{args.clients} clients x {args.requests} requests")
+    run_flask(args.clients, args.requests)
+    asyncio.run(run_asgi_clients(args.clients, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+HealthTracker benchmark suite
+
+Loads a deterministic synthetic dataset (see datagen.py), then times each
+public HealthTracker method and the main Flask routes through the test
+client. Results are printed and can be written as JSON; passing an earlier
+results file with --compare prints the change per benchmark, so two commits
+can be compared on the same machine:
+
+    python benchmarks/run_benchmarks.py --years 3 --output before.json
+    git checkout <other commit>
+    python benchmarks/run_benchmarks.py --years 3 --compare before.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from datagen import DEFAULT_START, days_for_years, populate
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func: Callable[[int], object], iterations: int, warmup: int) -> Dict:
+    """Time `iterations` calls of func(i) after `warmup` untimed calls"""
+    for i in range(warmup):
+        func(i)
+    timings = []
+    for i in range(warmup, warmup + iterations):
+        start = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    mean = sum(timings) / len(timings)
+    return {
+        'calls': iterations,
+        'mean_ms': round(mean, 4),
+        'p50_ms': round(percentile(timings, 50), 4),
+        'p95_ms': round(percentile(timings, 95), 4),
+        'p99_ms': round(percentile(timings, 99), 4),
+        'ops_per_sec': round(1000 / mean, 1) if mean else None,
+    }
+
+
+def method_benchmarks(tracker, first_day: datetime.date, last_day: datetime.date) -> Dict[str, Callable]:
+    """Micro-benchmarks of the public HealthTracker API"""
+    end = last_day.isoformat()
+    week_start = (last_day - datetime.timedelta(days=6)).isoformat()
+    month_start = (last_day - datetime.timedelta(days=29)).isoformat()
+    year_start = max(first_day, last_day - datetime.timedelta(days=364)).isoformat()
+
+    def future_day(i):
+        # Writes go after the dataset so they never replace generated rows
+        return (last_day + datetime.timedelta(days=1 + i)).isoformat()
+
+    return {
+        'get_daily_water_total': lambda i: tracker.get_daily_water_total(end),
+        'get_sleep_data (30d)': lambda i: tracker.get_sleep_data(month_start, end),
+        'get_sleep_data (365d)': lambda i: tracker.get_sleep_data(year_start, end),
+        'get_gym_attendance_data (30d)': lambda i: tracker.get_gym_attendance_data(month_start, end),
+        'get_gym_attendance_data (365d)': lambda i: tracker.get_gym_attendance_data(year_start, end),
+        'get_water_entries (7d)': lambda i: tracker.get_water_entries(week_start, end),
+        'get_water_entries (365d)': lambda i: tracker.get_water_entries(year_start, end),
+        'get_daily_aggregates (365d)': lambda i: tracker.get_daily_aggregates(year_start, end),
+        'calculate_opportunity_loss (30d)': lambda i: tracker.calculate_opportunity_loss(month_start, end),
+        'calculate_opportunity_loss (365d)': lambda i: tracker.calculate_opportunity_loss(year_start, end),
+        'get_weekly_summary': lambda i: tracker.get_weekly_summary(end),
+        'get_range_summary (365d)': lambda i: tracker.get_range_summary(year_start, end),
+        'get_settings': lambda i: tracker.get_settings(),
+        'log_water_intake': lambda i: tracker.log_water_intake(250, future_day(0), '12:00'),
+        'log_sleep': lambda i: tracker.log_sleep(future_day(i), '23:00', '07:00', 7),
+        'log_gym_attendance': lambda i: tracker.log_gym_attendance(future_day(i), i % 3 != 0, 'Strength', 45, 300),
+    }
+
+
+def route_benchmarks(client, result_cache, last_day: datetime.date) -> Dict[str, Callable]:
+    """End-to-end timings through the Flask test client"""
+    end = last_day.isoformat()
+    year_start = (last_day - datetime.timedelta(days=364)).isoformat()
+
+    def get(path, cold=True):
+        def run(i):
+            if cold:
+                # Measure the full computation, not the result cache
+                result_cache.clear()
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return run
+
+    def post(path, **kwargs):
+        def run(i):
+            response = client.post(path, **kwargs)
+            assert response.status_code in (200, 302), (path, response.status_code)
+        return run
+
+    return {
+        'GET /': get('/'),
+        'GET / (cached)': get('/', cold=False),
+        'GET /reports (30d)': get('/reports'),
+        'GET /reports (365d)': get(f'/reports?start_date={year_start}&end_date={end}'),
+        'GET /log-water': get('/log-water'),
+        'GET /settings': get('/settings'),
+        'GET /api/daily-water': get(f'/api/daily-water/{end}'),
+        'POST /api/quick-water': post('/api/quick-water', json={'amount': 250}),
+        'POST /log-water': post('/log-water', data={'amount': '250', 'notes': ''}),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results: Dict[str, Dict], baseline: Dict[str, Dict] = None, threshold: float = 10.0):
+    header = f"{'benchmark':<38}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>11}"
+    if baseline:
+        header += f"{'base p50':>10}{'change':>9}"
+    print(header)
+    for name, stats in results.items():
+        line = f"{name:<38}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['ops_per_sec']:>11.1f}"
+        previous = (baseline or {}).get(name)
+        if previous:
+            change = (stats['p50_ms'] / previous['p50_ms'] - 1) * 100 if previous['p50_ms'] else 0.0
+            marker = '  <-- slower' if change > threshold else ''
+            line += f"{previous['p50_ms']:>10.3f}{change:>+8.1f}%{marker}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--water-per-day', type=int, default=6)
+    parser.add_argument('--sleep-density', type=float, default=0.9)
+    parser.add_argument('--gym-density', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', choices=('methods', 'routes'),
+                        help='run only one group of benchmarks')
+    parser.add_argument('--metrics', action='store_true',
+                        help='run with instrumentation enabled to measure its overhead')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent p50 slowdown flagged in --compare output')
+    args = parser.parse_args()
+    # Resolve result paths before moving to the scratch directory
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    # app.py opens health_tracker.db in the working directory
+    workdir = tempfile.mkdtemp(prefix='health_tracker_bench_')
+    os.chdir(workdir)
+    if args.metrics:
+        os.environ['HEALTH_TRACKER_METRICS'] = '1'
+        # Log slow queries without printing them over the results
+        os.environ.setdefault('HEALTH_TRACKER_SLOW_QUERY_MS', '1000')
+    from app import app, default_tracker, result_cache
+
+    days = days_for_years(args.years)
+    first_day = DEFAULT_START
+    last_day = first_day + datetime.timedelta(days=days - 1)
+    load_start = time.perf_counter()
+    rows = populate(default_tracker, first_day, days, args.water_per_day,
+                    args.sleep_density, args.gym_density, args.seed)
+    load_seconds = time.perf_counter() - load_start
+    print(f"Loaded {days} days ({', '.join(f'{n} {t}' for t, n in rows.items())}) "
+          f"in {load_seconds:.2f}s\n")
+
+    benchmarks: Dict[str, Callable] = {}
+    if args.only != 'routes':
+        benchmarks.update(method_benchmarks(default_tracker, first_day, last_day))
+    if args.only != 'methods':
+        benchmarks.update(route_benchmarks(app.test_client(), result_cache, last_day))
+
+    results = {name: measure(func, args.iterations, args.warmup) for name, func in benchmarks.items()}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline, args.threshold)
+
+    if args.output:
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'dataset': {'days': days, 'rows': rows, 'water_per_day': args.water_per_day,
+                            'sleep_density': args.sleep_density, 'gym_density': args.gym_density,
+                            'seed': args.seed},
+                'load_seconds': round(load_seconds, 3),
+                'iterations': args.iterations,
+                'metrics_enabled': args.metrics,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+Append-only event log for sleep, gym and water logs
+
+Every log action and settings change is appended as one JSON line to a
+segment file under the log directory before it touches SQLite. Appends use group commit: whichever
+caller finds no flush in progress writes and fsyncs everything queued so
+far, so concurrent writers share one fsync. A materializer thread applies
+new events to the HealthTracker database in batches, one transaction per
+batch, recording the last applied sequence number in the same transaction
+(see HealthTracker.apply_events). An event that cannot be applied is set
+aside in the rejected_events table instead of stalling the ones after it.
+
+Segments roll over at a size limit. Compaction merges segments that have
+been fully applied into one gzip file, so nothing is ever dropped and the
+log stays a complete audit history; `replay` rebuilds a database from it:
+
+    python health_tracker.py --db rebuilt.db replay events/
+"""
+
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from health_tracker import (BULK_IMPORT_SQL, MAX_REPORTED_IMPORT_ERRORS, SETTING_EVENT, HealthTracker,
+                            iter_import_records, normalize_record)
+
+logger = logging.getLogger('health_tracker.event_log')
+
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+# events-<first seq>.jsonl while live, events-<first>-<last>.jsonl.gz once compacted
+SEGMENT_PATTERN = re.compile(r'^events-(\d{12})(?:-(\d{12})\.jsonl\.gz|\.jsonl)$')
+
+Event = Tuple[int, str, Dict]
+
+
+def _segment_name(first_seq: int, last_seq: Optional[int] = None) -> str:
+    if last_seq is None:
+        return f"events-{first_seq:012d}.jsonl"
+    return f"events-{first_seq:012d}-{last_seq:012d}.jsonl.gz"
+
+
+def _fsync_directory(directory: str):
+    """Make file creations, renames and removals in a directory durable"""
+    if os.name == 'nt':
+        # Directories cannot be opened for fsync; NTFS journals the metadata
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def list_segments(directory: str) -> List[Tuple[int, Optional[int], str]]:
+    """(first_seq, last_seq or None if not compacted, path) of every segment, in order"""
+    segments = []
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            last_seq = int(match.group(2)) if match.group(2) else None
+            segments.append((int(match.group(1)), last_seq, os.path.join(directory, name)))
+    segments.sort(key=lambda segment: (segment[0], segment[1] is None))
+    return segments
+
+
+def _read_segment(path: str, offset: int = 0) -> Iterator[Tuple[int, Event]]:
+    """Yield (end offset, event) for each complete line of a segment"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                # A torn write at the tail; it was never acknowledged
+                return
+            offset += len(line)
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return
+            yield offset, (entry['seq'], entry['type'], entry['data'])
+
+
+def iter_events(directory: str, after_seq: int = 0) -> Iterator[Event]:
+    """Every event in the log after a sequence number, in order"""
+    last_seen = after_seq
+    segments = list_segments(directory)
+    for index, (first_seq, last_seq, path) in enumerate(segments):
+        following = segments[index + 1][0] if index + 1 < len(segments) else None
+        if following is not None and following <= last_seen + 1:
+            continue
+        for _, event in _read_segment(path):
+            # Skipping seen sequence numbers also hides segments left behind
+            # by an interrupted compaction
+            if event[0] > last_seen:
+                last_seen = event[0]
+                yield event
+
+
+class EventLog:
+    """Segmented JSON-lines log with group commit"""
+
+    def __init__(self, directory: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES, fsync: bool = True,
+                 start_seq: int = 0):
+        """start_seq numbers the first event of an empty log start_seq + 1"""
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.appends = 0
+        self.group_commits = 0
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._buffer: List[bytes] = []
+        self._flushing = False
+        self._error: Optional[BaseException] = None
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._remove_compacted_leftovers()
+        self.last_seq = self._recover() or start_seq
+        self.durable_seq = self.last_seq
+
+    def _remove_compacted_leftovers(self):
+        # Live segments already merged into a gzip segment, left behind when
+        # a compaction stopped before deleting them
+        segments = list_segments(self.directory)
+        compacted = [(first, last) for first, last, _ in segments if last is not None]
+        for first_seq, last_seq, path in segments:
+            if last_seq is None and any(start <= first_seq <= end for start, end in compacted):
+                os.remove(path)
+
+    def _recover(self) -> int:
+        """Last durable sequence number; truncates a torn line at the tail"""
+        segments = list_segments(self.directory)
+        if not segments:
+            return 0
+        first_seq, last_seq, path = segments[-1]
+        if last_seq is not None:
+            return last_seq
+
+        end, last_seq = 0, first_seq - 1
+        for end, (last_seq, _, _) in _read_segment(path):
+            pass
+        if os.path.getsize(path) > end:
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        if end < self.segment_bytes:
+            self._file = open(path, 'ab')
+        return last_seq
+
+    def append(self, record_type: str, record: Dict) -> int:
+        """Append one event and return its sequence number once it is durable"""
+        return self.append_many([(record_type, record)])
+
+    def append_many(self, records: Iterable[Tuple[str, Dict]]) -> int:
+        """Append several events in one group commit; returns the last sequence number"""
+        timestamp = datetime.datetime.now().isoformat(timespec='milliseconds')
+        with self._lock:
+            for record_type, record in records:
+                self.last_seq += 1
+                self._buffer.append(json.dumps(
+                    {'seq': self.last_seq, 'ts': timestamp, 'type': record_type, 'data': record},
+                    separators=(',', ':')).encode('utf-8') + b'\n')
+                self.appends += 1
+            seq = self.last_seq
+
+            while self.durable_seq < seq:
+                if self._error is not None:
+                    raise IOError(f"Event log write failed: {self._error}")
+                if self._flushing:
+                    self._flushed.wait()
+                    continue
+
+                # Become the leader: flush every queued line, ours and others'
+                self._flushing = True
+                batch, self._buffer = self._buffer, []
+                batch_last = self.last_seq
+                self._lock.release()
+                try:
+                    self._write(batch, batch_last - len(batch) + 1)
+                except BaseException as e:
+                    self._lock.acquire()
+                    self._error = e
+                    self._flushing = False
+                    self._flushed.notify_all()
+                    raise
+                self._lock.acquire()
+                self.durable_seq = batch_last
+                self.group_commits += 1
+                self._flushing = False
+                self._flushed.notify_all()
+        return seq
+
+    def _write(self, batch: List[bytes], first_seq: int):
+        new_segment = self._file is None
+        if new_segment:
+            self._file = open(os.path.join(self.directory, _segment_name(first_seq)), 'ab')
+        self._file.write(b''.join(batch))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+            if new_segment:
+                _fsync_directory(self.directory)
+        if self._file.tell() >= self.segment_bytes:
+            # The next batch starts a new segment named after its first event
+            self._file.close()
+            self._file = None
+
+    def read(self, after_seq: int = 0, limit: Optional[int] = None) -> List[Event]:
+        """Durable events after a sequence number, at most `limit` of them"""
+        events = []
+        for event in iter_events(self.directory, after_seq):
+            if event[0] > self.durable_seq or (limit is not None and len(events) >= limit):
+                break
+            events.append(event)
+        return events
+
+    def reader(self, after_seq: int = 0) -> 'EventLogReader':
+        return EventLogReader(self, after_seq)
+
+    def compact(self, up_to_seq: int) -> int:
+        """Merge live segments fully at or below up_to_seq into one gzip segment.
+
+        Returns the number of segments merged.
+        """
+        with self._lock:
+            current = self._file.name if self._file is not None else None
+            segments = list_segments(self.directory)
+
+        mergeable = []
+        for index, (first_seq, last_seq, path) in enumerate(segments):
+            if index + 1 >= len(segments) or path == current:
+                break
+            end_seq = segments[index + 1][0] - 1
+            if last_seq is not None or end_seq > up_to_seq:
+                if mergeable:
+                    break
+                continue
+            mergeable.append((first_seq, end_seq, path))
+        if len(mergeable) < 2:
+            return 0
+
+        name = _segment_name(mergeable[0][0], mergeable[-1][1])
+        temp_path = os.path.join(self.directory, name + '.tmp')
+        with open(temp_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as out:
+                for _, _, path in mergeable:
+                    with open(path, 'rb') as f:
+                        for line in f:
+                            out.write(line)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, os.path.join(self.directory, name))
+        # The merged segment must be on disk under its final name before the
+        # only other copy of its events goes; a crash in between leaves both,
+        # and the live copies are removed on the next open
+        _fsync_directory(self.directory)
+        for _, _, path in mergeable:
+            os.remove(path)
+        _fsync_directory(self.directory)
+        self.compactions += 1
+        return len(mergeable)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> Dict:
+        segments = list_segments(self.directory)
+        return {
+            'last_seq': self.last_seq,
+            'durable_seq': self.durable_seq,
+            'appends': self.appends,
+            'group_commits': self.group_commits,
+            'compactions': self.compactions,
+            'segments': len(segments),
+            'compacted_segments': sum(1 for segment in segments if segment[1] is not None),
+            'bytes': sum(os.path.getsize(path) for _, _, path in segments),
+        }
+
+
+class EventLogReader:
+    """Incremental reader that resumes from its last file offset"""
+
+    def __init__(self, log: EventLog, after_seq: int = 0):
+        self.log = log
+        self.last_seq = after_seq
+        self._path: Optional[str] = None
+        self._offset = 0
+
+    def poll(self, limit: int) -> List[Event]:
+        """Up to `limit` durable events after the last one returned"""
+        events: List[Event] = []
+        while len(events) < limit:
+            durable = self.log.durable_seq
+            if self.last_seq >= durable:
+                break
+            if self._path is None and not self._locate():
+                break
+            try:
+                for offset, event in _read_segment(self._path, self._offset):
+                    if event[0] > durable:
+                        break
+                    self._offset = offset
+                    if event[0] > self.last_seq:
+                        self.last_seq = event[0]
+                        events.append(event)
+                        if len(events) >= limit:
+                            return events
+                else:
+                    # End of this segment; continue in the next one if there is one
+                    position = (self._path, self._offset)
+                    if not self._locate() or self._path == position[0]:
+                        self._path, self._offset = position
+                        break
+            except FileNotFoundError:
+                # Compacted away under us; find the events again by number
+                self._path = None
+        return events
+
+    def _locate(self) -> bool:
+        candidates = [(first_seq, path) for first_seq, _, path in list_segments(self.log.directory)
+                      if first_seq <= self.last_seq + 1]
+        if not candidates:
+            return False
+        self._path, self._offset = candidates[-1][1], 0
+        return True
+
+
+class EventStore:
+    """Durable event log in front of a HealthTracker, materialized in the background.
+
+    The log_* methods match HealthTracker's: they validate the record and
+    return True once its event is on disk. The database catches up a few
+    milliseconds later; call wait_applied() where a caller must read its
+    own write.
+    """
+
+    def __init__(self, tracker: HealthTracker, directory: str, batch_size: int = 5000,
+                 compact_interval: float = 300.0, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 fsync: bool = True):
+        self.tracker = tracker
+        self.applied_seq = tracker.applied_event_seq()
+        # A fresh log continues the database's numbering
+        self.log = EventLog(directory, segment_bytes, fsync, start_seq=self.applied_seq)
+        if self.log.last_seq < self.applied_seq:
+            raise ValueError(f"Event log in {directory} ends at {self.log.last_seq}, "
+                             f"but the database has applied up to {self.applied_seq}")
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.batches_applied = 0
+        self.events_rejected = 0
+        self.last_error: Optional[str] = None
+        self._reader = self.log.reader(self.applied_seq)
+        self._applied = threading.Condition()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='event-materializer', daemon=True)
+        self._thread.start()
+
+    def _append(self, record_type: str, record: Dict, idempotency_key: Optional[str] = None) -> bool:
+        try:
+            record = normalize_record(record_type, record)
+            if idempotency_key is not None:
+                # Checked when the event is applied, so a retried write that
+                # reached the log twice still lands in the database once
+                record['idempotency_key'] = str(idempotency_key)
+            self.log.append(record_type, record)
+        except (ValueError, IOError) as e:
+            print(f"Error logging {record_type}: {e}")
+            return False
+        self._wake.set()
+        return True
+
+    def log_sleep(self, date: str, bedtime: str, wake_time: str,
+                  sleep_quality: Optional[int] = None, notes: str = "",
+                  idempotency_key: Optional[str] = None) -> bool:
+        return self._append('sleep', {'date': date, 'bedtime': bedtime, 'wake_time': wake_time,
+                                      'sleep_quality': sleep_quality, 'notes': notes}, idempotency_key)
+
+    def log_gym_attendance(self, date: str, attended: bool, workout_type: str = "",
+                           duration_minutes: Optional[int] = None, calories_burned: Optional[int] = None,
+                           notes: str = "", idempotency_key: Optional[str] = None) -> bool:
+        return self._append('gym', {'date': date, 'attended': attended, 'workout_type': workout_type,
+                                    'duration_minutes': duration_minutes,
+                                    'calories_burned': calories_burned, 'notes': notes}, idempotency_key)
+
+    def log_water_intake(self, amount_ml: int, date: Optional[str] = None,
+                         time_logged: Optional[str] = None, notes: str = "",
+                         idempotency_key: Optional[str] = None) -> bool:
+        if date is None:
+            date = datetime.date.today().strftime("%Y-%m-%d")
+        if time_logged is None:
+            time_logged = datetime.datetime.now().strftime("%H:%M")
+        return self._append('water', {'date': date, 'time_logged': time_logged,
+                                      'amount_ml': amount_ml, 'notes': notes}, idempotency_key)
+
+    def update_setting(self, setting_name: str, setting_value: str) -> bool:
+        """Append a settings change and wait until it is applied, so the next read sees it.
+
+        The event carries today's date, so replay prices cost changes from
+        the day they were made, not the day of the replay.
+        """
+        try:
+            seq = self.log.append(SETTING_EVENT, {
+                'setting_name': str(setting_name), 'setting_value': str(setting_value),
+                'effective_date': datetime.date.today().strftime("%Y-%m-%d")})
+        except IOError as e:
+            print(f"Error updating setting: {e}")
+            return False
+        self._wake.set()
+        return self.wait_applied(seq)
+
+    def log_water_intake_batch(self, entries: List[Tuple]) -> bool:
+        """Log many (date, time_logged, amount_ml, notes[, idempotency_key]) water entries in one group commit"""
+        try:
+            records = []
+            for entry in entries:
+                record = normalize_record('water', dict(zip(('date', 'time_logged', 'amount_ml', 'notes'), entry)))
+                if len(entry) > 4 and entry[4] is not None:
+                    record['idempotency_key'] = str(entry[4])
+                records.append(('water', record))
+            if records:
+                self.log.append_many(records)
+        except (ValueError, IOError) as e:
+            print(f"Error logging water intake batch: {e}")
+            return False
+        self._wake.set()
+        return True
+
+    def bulk_import(self, record_type: str, source: Union[TextIO, Iterable[Dict]],
+                    fmt: Optional[str] = None, chunk_size: int = 5000) -> Dict:
+        """Append imported records as events, one group commit per chunk (see HealthTracker.bulk_import).
+
+        Rows are validated here and bad rows are reported the same way;
+        'imported' counts the rows appended, which reach the database when
+        the materializer applies them.
+        """
+        if record_type not in BULK_IMPORT_SQL:
+            raise ValueError(f"Unknown record type: {record_type}")
+        records = enumerate(source, start=1) if fmt is None else iter_import_records(source, fmt)
+        result = {'record_type': record_type, 'imported': 0, 'error_count': 0, 'errors': []}
+        chunk: List[Tuple[str, Dict]] = []
+
+        def flush():
+            self.log.append_many(chunk)
+            result['imported'] += len(chunk)
+            chunk.clear()
+            self._wake.set()
+
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                chunk.append((record_type, normalize_record(record_type, record)))
+            except ValueError as e:
+                result['error_count'] += 1
+                if len(result['errors']) < MAX_REPORTED_IMPORT_ERRORS:
+                    result['errors'].append({'line': line_number, 'error': str(e)})
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+        return result
+
+    def log_records(self, records: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Append raw (record_type, record) pairs in one group commit (see HealthTracker.log_records).
+
+        Waits until the materializer has applied them, so each result carries
+        the id of the record its idempotency key maps to. Whether a record was
+        new or a repeat is decided at apply time, so valid records report
+        'stored' rather than 'created' or 'duplicate'.
+        """
+        results: List[Optional[Dict]] = []
+        valid = []
+        for record_type, record in records:
+            try:
+                normalized = normalize_record(record_type, record)
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({'status': 'invalid', 'error': str(e)})
+                continue
+            if record.get('idempotency_key') is not None:
+                normalized['idempotency_key'] = str(record['idempotency_key'])
+            results.append(None)
+            valid.append((record_type, normalized))
+
+        record_ids: Dict[str, int] = {}
+        if valid:
+            last_seq = self.log.append_many(valid)
+            self._wake.set()
+            if not self.wait_applied(last_seq):
+                raise TimeoutError("Event log materializer is behind")
+            record_ids = self.tracker.get_idempotency_record_ids(
+                [record['idempotency_key'] for _, record in valid if 'idempotency_key' in record])
+        stored = iter(valid)
+        return [result or {'status': 'stored',
+                           'record_id': record_ids.get(next(stored)[1].get('idempotency_key'))}
+                for result in results]
+
+    def wait_applied(self, seq: Optional[int] = None, timeout: float = 5.0) -> bool:
+        """Wait until the database includes event `seq` (default: everything appended so far)"""
+        target = self.log.durable_seq if seq is None else seq
+        deadline = time.monotonic() + timeout
+        with self._applied:
+            while self.applied_seq < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._applied.wait(remaining)
+        return True
+
+    def compact(self) -> int:
+        """Compact the segments that are already in the database"""
+        return self.log.compact(self.applied_seq)
+
+    def _run(self):
+        last_compaction = time.monotonic()
+        pending: List[Event] = []
+        while not self._stopping:
+            self._wake.wait(0.5)
+            self._wake.clear()
+            while True:
+                if not pending:
+                    pending = self._reader.poll(self.batch_size)
+                if not pending:
+                    break
+                try:
+                    self.tracker.apply_events(pending, self._rejected)
+                except Exception as e:
+                    # The database could not take the batch at all (locked,
+                    # disk full); keep it and retry, the log still has it
+                    logger.exception("Applying events %d..%d failed", pending[0][0], pending[-1][0])
+                    self.last_error = str(e)
+                    time.sleep(1.0)
+                    break
+                with self._applied:
+                    self.applied_seq = pending[-1][0]
+                    self.batches_applied += 1
+                    self._applied.notify_all()
+                pending = []
+
+            if time.monotonic() - last_compaction >= self.compact_interval:
+                last_compaction = time.monotonic()
+                try:
+                    self.compact()
+                except OSError as e:
+                    logger.exception("Event log compaction failed")
+                    self.last_error = str(e)
+
+    def _rejected(self, seq: int, error: str):
+        logger.error("Event %d could not be applied and was set aside: %s", seq, error)
+        self.events_rejected += 1
+        self.last_error = f"Event {seq} rejected: {error}"
+
+    def close(self, timeout: float = 5.0):
+        """Apply everything appended so far, then stop the materializer"""
+        self.wait_applied(timeout=timeout)
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self.log.close()
+
+    def status(self) -> Dict:
+        return {**self.log.stats(),
+                'applied_seq': self.applied_seq,
+                'lag_events': self.log.durable_seq - self.applied_seq,
+                'batches_applied': self.batches_applied,
+                'events_rejected': self.events_rejected,
+                'last_error': self.last_error}
+
+
+def replay(tracker: HealthTracker, directory: str, batch_size: int = 5000) -> int:
+    """Apply every event the tracker's database has not seen yet; returns the number applied
+
+    Events that cannot be applied are logged and set aside in
+    rejected_events, as the materializer does.
+    """
+    def rejected(seq, error):
+        logger.error("Event %d could not be applied and was set aside: %s", seq, error)
+
+    applied = 0
+    batch: List[Event] = []
+    for event in iter_events(directory, tracker.applied_event_seq()):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            applied += tracker.apply_events(batch, rejected)
+            batch = []
+    if batch:
+        applied += tracker.apply_events(batch, rejected)
+    return applied
@@ -9,126 +9,973 @@ A comprehensive application to track:
 - Opportunity loss calculations for missed gym sessions
 """
 
+import os
 import sqlite3
 import datetime
-from typing import Dict, List, Optional, Tuple
+import bisect
+import heapq
+import itertools
+import threading
+import weakref
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 import json
 
+from archive import ARCHIVABLE_SQL, ARCHIVE_LAYOUT, ColumnarArchive
+from outliers import CHECKED_METRICS, RollingStats, check_value
+from records import GymSession, RecordPage, SleepRecord, WaterEntry, decode_cursor
+
+
+# Schema migrations in order. Migration N brings the database to
+# PRAGMA user_version N; existing databases are upgraded in place.
+#
+# Per-day aggregates recomputed from the raw tables; {date_filter} is either
+# empty or a "WHERE date BETWEEN ? AND ?" clause repeated for each table.
+DAILY_ROLLUP_REBUILD_SQL = '''
+    INSERT INTO daily_rollup
+    (date, water_total_ml, water_entries, sleep_logged, sleep_hours, sleep_quality,
+     gym_attended, gym_missed, gym_minutes, gym_calories)
+    SELECT date, SUM(water_total_ml), SUM(water_entries), MAX(sleep_logged),
+           MAX(sleep_hours), MAX(sleep_quality), SUM(gym_attended), SUM(gym_missed),
+           SUM(gym_minutes), SUM(gym_calories)
+    FROM (
+        SELECT date, SUM(amount_ml) AS water_total_ml, COUNT(*) AS water_entries,
+               0 AS sleep_logged, NULL AS sleep_hours, NULL AS sleep_quality,
+               0 AS gym_attended, 0 AS gym_missed, 0 AS gym_minutes, 0 AS gym_calories
+        FROM water_intake {date_filter}
+        GROUP BY date
+        UNION ALL
+        SELECT date, 0, 0, 1, sleep_duration_hours, sleep_quality, 0, 0, 0, 0
+        FROM sleep_records {date_filter}
+        UNION ALL
+        SELECT date, 0, 0, 0, NULL, NULL,
+               SUM(attended != 0), SUM(attended = 0),
+               COALESCE(SUM(duration_minutes), 0), COALESCE(SUM(calories_burned), 0)
+        FROM gym_attendance {date_filter}
+        GROUP BY date
+    )
+    GROUP BY date
+'''
+
+# Adds water to a day's rollup row: (date, amount_ml, entries)
+WATER_ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_rollup (date, water_total_ml, water_entries)
+    VALUES (?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        water_total_ml = water_total_ml + excluded.water_total_ml,
+        water_entries = water_entries + excluded.water_entries
+'''
+
+# Sets a day's sleep in its rollup row: (date, sleep_hours, sleep_quality)
+SLEEP_ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_rollup (date, sleep_logged, sleep_hours, sleep_quality)
+    VALUES (?, 1, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        sleep_logged = 1,
+        sleep_hours = excluded.sleep_hours,
+        sleep_quality = excluded.sleep_quality
+'''
+
+# Adds one gym entry to a day's rollup row:
+# (date, attended, missed, minutes, calories)
+GYM_ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_rollup
+    (date, gym_attended, gym_missed, gym_minutes, gym_calories)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        gym_attended = gym_attended + excluded.gym_attended,
+        gym_missed = gym_missed + excluded.gym_missed,
+        gym_minutes = gym_minutes + excluded.gym_minutes,
+        gym_calories = gym_calories + excluded.gym_calories
+'''
+
+# Settings every database starts with (migration 9)
+DEFAULT_SETTINGS = {
+    'daily_water_goal_ml': '2500',
+    'weekly_gym_goal': '4',
+    'target_sleep_hours': '8',
+    'gym_membership_cost_monthly': '50',
+    'missed_workout_opportunity_cost': '15'
+}
+
+# Settings whose history is kept so costs are priced at the rate in effect
+# on each day; the earliest row of each applies from the beginning of time
+PRICED_SETTINGS = ('gym_membership_cost_monthly', 'missed_workout_opportunity_cost')
+SETTINGS_HISTORY_START = '0001-01-01'
+
+# Running missed-session totals from {from_date} on, continuing from the last
+# ledger row before it. Each row also carries the running opportunity cost,
+# with every missed session priced at the rate in effect on its date.
+MISSED_LEDGER_REBUILD_SQL = '''
+    INSERT INTO missed_ledger (date, missed_cumulative, missed_cost_cumulative)
+    SELECT date,
+           COALESCE((SELECT missed_cumulative FROM missed_ledger
+                     WHERE date < {from_date} ORDER BY date DESC LIMIT 1), 0)
+               + SUM(gym_missed) OVER running,
+           COALESCE((SELECT missed_cost_cumulative FROM missed_ledger
+                     WHERE date < {from_date} ORDER BY date DESC LIMIT 1), 0)
+               + SUM(gym_missed * COALESCE(
+                     (SELECT CAST(setting_value AS REAL) FROM settings_history AS h
+                      WHERE h.setting_name = 'missed_workout_opportunity_cost'
+                        AND h.effective_date <= r.date
+                      ORDER BY h.effective_date DESC LIMIT 1),
+                     (SELECT CAST(setting_value AS REAL) FROM settings
+                      WHERE setting_name = 'missed_workout_opportunity_cost'),
+                     0)) OVER running
+    FROM daily_rollup AS r
+    WHERE date >= {from_date} AND gym_missed > 0
+    WINDOW running AS (ORDER BY date)
+'''
+
+SCHEMA_MIGRATIONS: List[Tuple[str, ...]] = [
+    # 1: base tables
+    (
+        # Sleep tracking table
+        '''
+        CREATE TABLE IF NOT EXISTS sleep_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE UNIQUE NOT NULL,
+            bedtime TIME,
+            wake_time TIME,
+            sleep_duration_hours REAL,
+            sleep_quality INTEGER CHECK(sleep_quality BETWEEN 1 AND 10),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Gym attendance table
+        '''
+        CREATE TABLE IF NOT EXISTS gym_attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            attended BOOLEAN NOT NULL,
+            workout_type TEXT,
+            duration_minutes INTEGER,
+            calories_burned INTEGER,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Water intake table
+        '''
+        CREATE TABLE IF NOT EXISTS water_intake (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            time_logged TIME NOT NULL,
+            amount_ml INTEGER NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Settings table for goals and preferences
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            setting_name TEXT UNIQUE NOT NULL,
+            setting_value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ),
+    # 2: covering indexes for the date-filtered hot paths
+    (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_water_intake_date_amount
+        ON water_intake(date, amount_ml)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_gym_attendance_date_attended
+        ON gym_attendance(date, attended)
+        ''',
+    ),
+    # 3: materialized per-day rollup, maintained by the log_* methods
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            date DATE PRIMARY KEY,
+            water_total_ml INTEGER NOT NULL DEFAULT 0,
+            water_entries INTEGER NOT NULL DEFAULT 0,
+            sleep_logged INTEGER NOT NULL DEFAULT 0,
+            sleep_hours REAL,
+            sleep_quality INTEGER,
+            gym_attended INTEGER NOT NULL DEFAULT 0,
+            gym_missed INTEGER NOT NULL DEFAULT 0,
+            gym_minutes INTEGER NOT NULL DEFAULT 0,
+            gym_calories INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        DAILY_ROLLUP_REBUILD_SQL.format(date_filter=''),
+    ),
+    # 4: effective-dated cost settings and the missed-session ledger
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS settings_history (
+            setting_name TEXT NOT NULL,
+            effective_date DATE NOT NULL,
+            setting_value TEXT NOT NULL,
+            PRIMARY KEY (setting_name, effective_date)
+        ) WITHOUT ROWID
+        ''',
+        f'''
+        INSERT OR IGNORE INTO settings_history (setting_name, effective_date, setting_value)
+        SELECT setting_name, '{SETTINGS_HISTORY_START}', setting_value FROM settings
+        WHERE setting_name IN {PRICED_SETTINGS}
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS missed_ledger (
+            date DATE PRIMARY KEY,
+            missed_cumulative INTEGER NOT NULL,
+            missed_cost_cumulative REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        MISSED_LEDGER_REBUILD_SQL.format(from_date="'0000-01-01'"),
+    ),
+    # 5: keyset pagination of gym entries by (date, id)
+    (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_gym_attendance_date_id
+        ON gym_attendance(date, id)
+        ''',
+    ),
+    # 6: summaries computed in the background. The triggers mark them stale
+    # in the same transaction as the write that changes their inputs, so a
+    # stale summary is never served.
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS precomputed_summaries (
+            kind TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            payload TEXT NOT NULL,
+            stale INTEGER NOT NULL DEFAULT 0,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, start_date, end_date)
+        ) WITHOUT ROWID
+        ''',
+        *(f'''
+        CREATE TRIGGER IF NOT EXISTS daily_rollup_{event.lower()}_stale_summaries
+        AFTER {event} ON daily_rollup
+        BEGIN
+            UPDATE precomputed_summaries SET stale = 1
+            WHERE stale = 0 AND start_date <= {row}.date AND end_date >= {row}.date;
+        END
+        ''' for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))),
+        *(f'''
+        CREATE TRIGGER IF NOT EXISTS settings_{event.lower()}_stale_summaries
+        AFTER {event} ON settings
+        BEGIN
+            UPDATE precomputed_summaries SET stale = 1 WHERE stale = 0;
+        END
+        ''' for event in ('INSERT', 'UPDATE')),
+    ),
+    # 7: position of the event log (event_log.py) materialized so far
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS event_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_applied_seq INTEGER NOT NULL
+        )
+        ''',
+        'INSERT OR IGNORE INTO event_log_state (id, last_applied_seq) VALUES (1, 0)',
+    ),
+    # 8: idempotency keys of recent writes, and outlier/duplicate flags with
+    # the rolling statistics they were checked against (see outliers.py)
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            record_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS flagged_records (
+            record_type TEXT NOT NULL,
+            record_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL,
+            reason TEXT NOT NULL,
+            expected REAL,
+            flagged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (record_type, record_id, metric)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_flagged_records_date
+        ON flagged_records(date)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS outlier_stats (
+            metric TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            variance REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    ),
+    # 9: default settings, seeded once here instead of on every startup.
+    # The first known value of each priced setting applies to all past days.
+    (
+        f'''
+        INSERT OR IGNORE INTO settings (setting_name, setting_value)
+        VALUES {', '.join(f"('{name}', '{value}')" for name, value in DEFAULT_SETTINGS.items())}
+        ''',
+        f'''
+        INSERT OR IGNORE INTO settings_history (setting_name, effective_date, setting_value)
+        SELECT setting_name, '{SETTINGS_HISTORY_START}', setting_value FROM settings
+        WHERE setting_name IN {PRICED_SETTINGS}
+          AND setting_name NOT IN (SELECT setting_name FROM settings_history)
+        ''',
+    ),
+    # 10: water entries by time of day. minute_of_day is a virtual column
+    # derived from time_logged, so no write path changes; the index stores
+    # it as an integer next to date and amount, which covers the timeline,
+    # pace and heatmap queries.
+    (
+        '''
+        ALTER TABLE water_intake ADD COLUMN minute_of_day INTEGER
+        GENERATED ALWAYS AS (CAST(substr(time_logged, 1, 2) AS INTEGER) * 60
+                             + CAST(substr(time_logged, 4, 2) AS INTEGER)) VIRTUAL
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_water_intake_date_minute
+        ON water_intake(date, minute_of_day, amount_ml)
+        ''',
+    ),
+    # 11: change sequence for client sync. Triggers give every inserted,
+    # updated or deleted record a new sequence number in the same
+    # transaction, keeping one row per record (a tombstone once deleted), so
+    # a client pulls each changed record once however often it changed.
+    # Existing records are numbered in id order. The epoch identifies this
+    # database, so tokens from a rebuilt one are recognized as stale.
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS record_changes (
+            record_type TEXT NOT NULL,
+            record_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (record_type, record_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_record_changes_seq
+        ON record_changes(seq)
+        ''',
+        '''
+        INSERT INTO record_changes (record_type, record_id, date, seq)
+        SELECT record_type, id, date, ROW_NUMBER() OVER (ORDER BY record_type, id)
+        FROM (SELECT 'gym' AS record_type, id, date FROM gym_attendance
+              UNION ALL SELECT 'sleep', id, date FROM sleep_records
+              UNION ALL SELECT 'water', id, date FROM water_intake)
+        ''',
+        *(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_record_change
+        AFTER {event} ON {table}
+        BEGIN
+            INSERT OR REPLACE INTO record_changes (record_type, record_id, date, deleted, seq)
+            VALUES ('{record_type}', {row}.id, {row}.date, {int(event == 'DELETE')},
+                    COALESCE((SELECT MAX(seq) FROM record_changes), 0) + 1);
+        END
+        ''' for record_type, table in (('sleep', 'sleep_records'), ('gym', 'gym_attendance'),
+                                        ('water', 'water_intake'))
+          for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))),
+        # INSERT OR REPLACE of a night deletes the old row without firing
+        # delete triggers; record the replaced id as deleted here instead
+        '''
+        CREATE TRIGGER IF NOT EXISTS sleep_records_replace_record_change
+        BEFORE INSERT ON sleep_records
+        BEGIN
+            INSERT OR REPLACE INTO record_changes (record_type, record_id, date, deleted, seq)
+            SELECT 'sleep', id, date, 1, COALESCE((SELECT MAX(seq) FROM record_changes), 0) + 1
+            FROM sleep_records WHERE date = NEW.date;
+        END
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO sync_state (id, epoch) VALUES (1, lower(hex(randomblob(8))))",
+        # Lets a client map its own ids to the server records they created
+        'ALTER TABLE idempotency_keys ADD COLUMN record_id INTEGER',
+    ),
+    # 12: goal evaluation per period with run lengths, and the days whose
+    # rollup changed since goals were last evaluated
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS goal_status (
+            goal TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            value REAL NOT NULL,
+            target REAL NOT NULL,
+            met INTEGER NOT NULL,
+            run_length INTEGER NOT NULL,
+            PRIMARY KEY (goal, period_start)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_goal_status_run ON goal_status(goal, run_length)',
+        'CREATE INDEX IF NOT EXISTS idx_goal_status_met ON goal_status(goal, met, period_start)',
+        '''
+        CREATE TABLE IF NOT EXISTS goal_state (
+            goal TEXT PRIMARY KEY,
+            target REAL NOT NULL,
+            longest INTEGER NOT NULL,
+            longest_end TEXT,
+            last_met_period TEXT,
+            current_run INTEGER NOT NULL
+        )
+        ''',
+        'CREATE TABLE IF NOT EXISTS goal_dirty (date TEXT PRIMARY KEY) WITHOUT ROWID',
+        *(f'''
+        CREATE TRIGGER IF NOT EXISTS daily_rollup_{event.lower()}_goal_dirty
+        AFTER {event} ON daily_rollup
+        BEGIN
+            -- Not OR IGNORE: the conflict policy of the statement firing
+            -- the trigger would override it
+            INSERT INTO goal_dirty (date)
+            SELECT {row}.date WHERE NOT EXISTS (SELECT 1 FROM goal_dirty WHERE date = {row}.date);
+        END
+        ''' for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))),
+    ),
+    # 13: change sequence numbers come from a counter in sync_state instead
+    # of MAX(seq) + 1, so dropping change rows (archiving) never lets a later
+    # change reuse a number a client has already pulled past
+    (
+        'ALTER TABLE sync_state ADD COLUMN last_seq INTEGER NOT NULL DEFAULT 0',
+        'UPDATE sync_state SET last_seq = (SELECT COALESCE(MAX(seq), 0) FROM record_changes)',
+        *(f'DROP TRIGGER IF EXISTS {table}_{event}_record_change'
+          for table in ('sleep_records', 'gym_attendance', 'water_intake')
+          for event in ('insert', 'update', 'delete')),
+        'DROP TRIGGER IF EXISTS sleep_records_replace_record_change',
+        *(f'''
+        CREATE TRIGGER {table}_{event.lower()}_record_change
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE sync_state SET last_seq = last_seq + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO record_changes (record_type, record_id, date, deleted, seq)
+            VALUES ('{record_type}', {row}.id, {row}.date, {int(event == 'DELETE')},
+                    (SELECT last_seq FROM sync_state WHERE id = 1));
+        END
+        ''' for record_type, table in (('sleep', 'sleep_records'), ('gym', 'gym_attendance'),
+                                        ('water', 'water_intake'))
+          for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))),
+        '''
+        CREATE TRIGGER sleep_records_replace_record_change
+        BEFORE INSERT ON sleep_records
+        BEGIN
+            UPDATE sync_state SET last_seq = last_seq + 1
+            WHERE id = 1 AND EXISTS (SELECT 1 FROM sleep_records WHERE date = NEW.date);
+            INSERT OR REPLACE INTO record_changes (record_type, record_id, date, deleted, seq)
+            SELECT 'sleep', id, date, 1, (SELECT last_seq FROM sync_state WHERE id = 1)
+            FROM sleep_records WHERE date = NEW.date;
+        END
+        ''',
+    ),
+    # 14: event-log entries that could not be applied, set aside so the
+    # events after them still reach the database
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS rejected_events (
+            seq INTEGER PRIMARY KEY,
+            record_type TEXT NOT NULL,
+            record TEXT NOT NULL,
+            error TEXT NOT NULL,
+            rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ),
+]
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+# Bulk import/export: statement and column layout per record type
+BULK_IMPORT_SQL = {
+    'sleep': '''
+        INSERT OR REPLACE INTO sleep_records
+        (date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'gym': '''
+        INSERT INTO gym_attendance
+        (date, attended, workout_type, duration_minutes, calories_burned, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'water': '''
+        INSERT INTO water_intake (date, time_logged, amount_ml, notes)
+        VALUES (?, ?, ?, ?)
+    ''',
+}
+EXPORT_COLUMNS = {
+    'sleep': ('sleep_records',
+              ('date', 'bedtime', 'wake_time', 'sleep_duration_hours', 'sleep_quality', 'notes')),
+    'gym': ('gym_attendance',
+            ('date', 'attended', 'workout_type', 'duration_minutes', 'calories_burned', 'notes')),
+    'water': ('water_intake', ('date', 'time_logged', 'amount_ml', 'notes')),
+}
+IMPORT_FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_IMPORT_ERRORS = 1000
+# Event-log record type of a settings change: {'setting_name',
+# 'setting_value', 'effective_date'}
+SETTING_EVENT = 'setting'
+
+# Idempotency keys are remembered this long, which bounds how late a retry
+# may arrive and still be recognized
+IDEMPOTENCY_KEY_DAYS = 7
+
+# An earlier entry on the same day with identical values: (id, *columns).
+# The per-day lookup goes through the date indexes, so checking a new row
+# never rescans the table.
+DUPLICATE_LOOKUP_SQL = {
+    'gym': '''
+        SELECT 1 FROM gym_attendance
+        WHERE id < ? AND date = ? AND attended = ? AND workout_type IS ?
+          AND duration_minutes IS ? AND calories_burned IS ? AND notes IS ?
+        LIMIT 1
+    ''',
+    'water': '''
+        SELECT 1 FROM water_intake
+        WHERE id < ? AND date = ? AND time_logged = ? AND amount_ml = ? AND notes IS ?
+        LIMIT 1
+    ''',
+}
+
+# Water and gym entries of months at least this far back can be moved to
+# the columnar archive (archive_cold_data)
+ARCHIVE_AFTER_MONTHS = 12
+
+# Keyset pagination of the record getters
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Chart series: bucket key over daily_rollup.date, and the aggregate per metric
+SERIES_BUCKET_SQL = {
+    'day': "date",
+    'week': "date(date, '-6 days', 'weekday 1')",    # Monday of the week
+    'month': "strftime('%Y-%m-01', date)",
+}
+SERIES_AGGREGATE_SQL = {
+    'water_ml': "SUM(water_total_ml)",
+    'sleep_hours': "AVG(CASE WHEN sleep_logged THEN sleep_hours END)",
+    'sleep_quality': "AVG(sleep_quality)",
+    'gym_sessions': "SUM(gym_attended)",
+    'gym_minutes': "SUM(gym_minutes)",
+    'gym_attendance_rate': "100.0 * SUM(gym_attended) / NULLIF(SUM(gym_attended) + SUM(gym_missed), 0)",
+}
+
+# Goals: goal -> (period, setting holding the target, value of a period over
+# daily_rollup). A period meets its goal when the value reaches the target;
+# periods without a value are not stored and break a streak.
+GOAL_DEFINITIONS = {
+    'water': ('day', 'daily_water_goal_ml', "SUM(water_total_ml)"),
+    'sleep': ('day', 'target_sleep_hours', "MAX(CASE WHEN sleep_logged THEN sleep_hours END)"),
+    'gym': ('week', 'weekly_gym_goal', "SUM(gym_attended)"),
+}
+GOAL_PERIOD_DAYS = {'day': 1, 'week': 7}
+# A backlog of more changed days than this is re-evaluated in one pass
+GOAL_BULK_THRESHOLD = 366
+# Whole-history evaluation of one goal. Consecutive met periods share an
+# island (period index minus their row number), and the run length is the
+# position within the island.
+GOAL_EVALUATE_SQL = '''
+    INSERT INTO goal_status (goal, period_start, value, target, met, run_length)
+    SELECT :goal, period_start, value, :target, met,
+           CASE WHEN met THEN ROW_NUMBER() OVER (PARTITION BY met, island ORDER BY period_start)
+                ELSE 0 END
+    FROM (
+        SELECT period_start, value, met,
+               CAST(julianday(period_start) AS INTEGER) / {period_days}
+                   - ROW_NUMBER() OVER (PARTITION BY met ORDER BY period_start) AS island
+        FROM (
+            SELECT {bucket} AS period_start, {value} AS value, {value} >= :target AS met
+            FROM daily_rollup
+            GROUP BY period_start
+        )
+        WHERE value IS NOT NULL
+    )
+'''
+
+
+def _page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def _summary_json(value):
+    """json.dumps default for records inside stored summaries"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Cannot store {type(value).__name__} in a summary")
+
+
+def _sleep_duration_hours(date: str, bedtime: str, wake_time: str) -> float:
+    """Hours slept between bedtime and wake time, rolling over midnight"""
+    bedtime_obj = datetime.datetime.strptime(f"{date} {bedtime}", "%Y-%m-%d %H:%M")
+    wake_time_obj = datetime.datetime.strptime(f"{date} {wake_time}", "%Y-%m-%d %H:%M")
+    
+    # Handle cases where wake time is next day
+    if wake_time_obj <= bedtime_obj:
+        wake_time_obj += datetime.timedelta(days=1)
+    
+    return (wake_time_obj - bedtime_obj).total_seconds() / 3600
+
+
+def _parse_date(value) -> str:
+    """Validate a YYYY-MM-DD date string"""
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+
+def _parse_time(value) -> str:
+    """Validate an HH:MM time string"""
+    return datetime.datetime.strptime(str(value).strip(), "%H:%M").strftime("%H:%M")
+
+
+def _parse_optional_int(value) -> Optional[int]:
+    """Parse an optional integer field; blanks become None"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return int(value)
+
+
+def _parse_bool(value) -> bool:
+    """Parse booleans as they appear in CSV and JSON exports"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    normalized = str(value).strip().lower()
+    if normalized in ('1', 'true', 'yes', 'y'):
+        return True
+    if normalized in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"invalid boolean: {value!r}")
+
+
+def _import_row(record_type: str, record: Dict) -> Tuple:
+    """Validate one import record and return its insert parameters"""
+    if not isinstance(record, dict):
+        raise ValueError("record must be an object")
+    
+    try:
+        date = _parse_date(record['date'])
+        notes = record.get('notes') or ""
+        
+        if record_type == 'sleep':
+            bedtime = _parse_time(record['bedtime'])
+            wake_time = _parse_time(record['wake_time'])
+            sleep_quality = _parse_optional_int(record.get('sleep_quality'))
+            if sleep_quality is not None and not 1 <= sleep_quality <= 10:
+                raise ValueError("sleep_quality must be between 1 and 10")
+            duration = _sleep_duration_hours(date, bedtime, wake_time)
+            return (date, bedtime, wake_time, duration, sleep_quality, notes)
+        
+        if record_type == 'gym':
+            attended = _parse_bool(record['attended'])
+            return (date, attended, record.get('workout_type') or "",
+                    _parse_optional_int(record.get('duration_minutes')),
+                    _parse_optional_int(record.get('calories_burned')), notes)
+        
+        amount_ml = int(record['amount_ml'])
+        if amount_ml <= 0:
+            raise ValueError("amount_ml must be positive")
+        return (date, _parse_time(record['time_logged']), amount_ml, notes)
+    
+    except KeyError as e:
+        raise ValueError(f"missing field {e.args[0]}")
+    except TypeError as e:
+        raise ValueError(str(e))
+
+
+def normalize_record(record_type: str, record: Dict) -> Dict:
+    """Validate a sleep, gym or water record; returns it with the stored columns"""
+    if record_type not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown record type: {record_type}")
+    return dict(zip(EXPORT_COLUMNS[record_type][1], _import_row(record_type, record)))
+
+
+def iter_import_records(source: TextIO, fmt: str) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """Yield (line number, record) pairs from a CSV or JSON-lines stream.
+    
+    Lines that cannot be parsed are yielded as exceptions instead of
+    aborting the stream.
+    """
+    if fmt == 'csv':
+        import csv
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+class _LineBuffer:
+    """Minimal file-like sink so csv.writer output can be yielded line by line"""
+    
+    def __init__(self):
+        self._parts: List[str] = []
+    
+    def write(self, text: str):
+        self._parts.append(text)
+    
+    def pop(self) -> str:
+        text = ''.join(self._parts)
+        self._parts.clear()
+        return text
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that can be tracked by the pool via weak references"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Settings cache owned by this connection, see HealthTracker._settings
+        self.settings_cache: Optional[Dict[str, str]] = None
+        self.settings_data_version: Optional[int] = None
+        # Last PRAGMA data_version seen, see HealthTracker.current_generation
+        self.generation_data_version: Optional[int] = None
+
+
+class _ConnectionLease:
+    """Thread-local handle whose finalizer returns a connection to the pool"""
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _return_to_pool(tracker_ref: 'weakref.ref', conn: sqlite3.Connection):
+    """Lease finalizer: give the connection back, or close it if its tracker is gone"""
+    tracker = tracker_ref()
+    if tracker is None:
+        conn.close()
+    else:
+        tracker._release_connection(conn)
+
 
 class HealthTracker:
-    def __init__(self, db_path: str = "health_tracker.db"):
-        """Initialize the health tracker with database connection"""
+    # Applied to every pooled connection when it is opened
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-8000",      # 8 MB page cache per connection
+        "PRAGMA mmap_size=67108864",    # 64 MB memory-mapped reads
+        "PRAGMA temp_store=MEMORY",
+    )
+    STATEMENT_CACHE_SIZE = 128
+    MAX_IDLE_CONNECTIONS = 8
+    BUSY_TIMEOUT_SECONDS = 30
+
+    def __init__(self, db_path: str = "health_tracker.db",
+                 connection_factory: Optional[type] = None, archive_dir: Optional[str] = None):
+        """Initialize the health tracker with database connection.
+        
+        connection_factory must subclass _PooledConnection; instrumentation
+        passes one that records SQL timings. Archived history lives in
+        archive_dir, by default next to the database.
+        """
         self.db_path = db_path
+        self.archive_dir = archive_dir or f"{db_path}.archive"
+        self._archive: Optional[ColumnarArchive] = None
+        self.connection_factory = connection_factory or _PooledConnection
+        self.connections_opened = 0
+        # Bumped after every committed write; lets callers key caches on it.
+        # The instance id keeps keys from another process or an earlier
+        # tracker for the same file from ever matching.
+        self.instance_id = os.urandom(6).hex()
+        self.data_generation = 0
+        self._generation_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._idle_connections: List[sqlite3.Connection] = []
+        self._all_connections = weakref.WeakSet()
+        self._change_listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
         self.init_database()
+        if self._cold_archive() is not None:
+            self._finish_archive()
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a new tuned connection to the database"""
+        conn = sqlite3.connect(self.db_path,
+                               timeout=self.BUSY_TIMEOUT_SECONDS,
+                               check_same_thread=False,
+                               cached_statements=self.STATEMENT_CACHE_SIZE,
+                               factory=self.connection_factory)
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         
-    def init_database(self):
-        """Initialize the SQLite database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._pool_lock:
+            self._all_connections.add(conn)
+            self.connections_opened += 1
+        return conn
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the connection bound to the current thread.
         
-        # Sleep tracking table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sleep_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE UNIQUE NOT NULL,
-                bedtime TIME,
-                wake_time TIME,
-                sleep_duration_hours REAL,
-                sleep_quality INTEGER CHECK(sleep_quality BETWEEN 1 AND 10),
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        Each thread borrows one connection from the pool on first use and
+        keeps it for its lifetime; when the thread exits the connection goes
+        back to the idle pool, so short-lived Flask worker threads reuse
+        connections instead of reconnecting.
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            return lease.conn
         
-        # Gym attendance table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gym_attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL,
-                attended BOOLEAN NOT NULL,
-                workout_type TEXT,
-                duration_minutes INTEGER,
-                calories_burned INTEGER,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self._pool_lock:
+            conn = self._idle_connections.pop() if self._idle_connections else None
+        if conn is None:
+            conn = self._open_connection()
         
-        # Water intake table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS water_intake (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL,
-                time_logged TIME NOT NULL,
-                amount_ml INTEGER NOT NULL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        lease = _ConnectionLease(conn)
+        # Only a weak reference to the tracker, so a lease held by a
+        # long-lived thread does not keep a discarded tracker alive
+        finalizer = weakref.finalize(lease, _return_to_pool, weakref.ref(self), conn)
+        # At interpreter exit daemon threads may still be using their
+        # connection; leave it to be closed with the process
+        finalizer.atexit = False
+        self._local.lease = lease
+        return conn
+    
+    def _release_connection(self, conn: sqlite3.Connection):
+        """Return a connection to the idle pool, closing it if the pool is full"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_lock:
+            if len(self._idle_connections) < self.MAX_IDLE_CONNECTIONS:
+                self._idle_connections.append(conn)
+                return
+            self._all_connections.discard(conn)
+        conn.close()
+    
+    def close(self):
+        """Close every connection opened by this tracker"""
+        with self._pool_lock:
+            connections = list(self._all_connections)
+            self._idle_connections.clear()
+            self._all_connections.clear()
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
         
-        # Settings table for goals and preferences
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                setting_name TEXT UNIQUE NOT NULL,
-                setting_value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    def data_version(self) -> int:
+        """PRAGMA data_version of this thread's connection.
         
-        conn.commit()
-        conn.close()
+        The value changes whenever another connection or process commits,
+        which lets in-memory state detect writes it did not make.
+        """
+        return self._get_connection().execute('PRAGMA data_version').fetchone()[0]
+    
+    def current_generation(self) -> int:
+        """data_generation, bumped first if someone else committed since this thread last looked.
         
-        # Initialize default settings
-        self._init_default_settings()
-    
-    def _init_default_settings(self):
-        """Initialize default settings if they don't exist"""
-        default_settings = {
-            'daily_water_goal_ml': '2500',
-            'weekly_gym_goal': '4',
-            'target_sleep_hours': '8',
-            'gym_membership_cost_monthly': '50',
-            'missed_workout_opportunity_cost': '15'
-        }
+        Writes through this tracker bump the generation themselves. Commits
+        by another process or another tracker on the same file only show up
+        in PRAGMA data_version, so a change there (or a connection that has
+        not looked yet) bumps it too. Commits by this tracker's other
+        connections may cause one extra bump, which costs a cache miss.
+        """
+        conn = self._get_connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if conn.generation_data_version != data_version:
+            with self._generation_lock:
+                self.data_generation += 1
+            conn.generation_data_version = data_version
+        return self.data_generation
+    
+    def _data_changed(self, start_date: Optional[str] = None, end_date: Optional[str] = None):
+        """Record that a write committed, touching [start_date, end_date] (None: everything)"""
+        with self._generation_lock:
+            self.data_generation += 1
+        for listener in self._change_listeners:
+            listener(start_date, end_date)
+    
+    def add_change_listener(self, listener: Callable[[Optional[str], Optional[str]], None]):
+        """Call listener(start_date, end_date) after every committed write.
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        Listeners run on the writing thread, so they should only hand work off.
+        """
+        self._change_listeners.append(listener)
         
-        for setting_name, setting_value in default_settings.items():
-            cursor.execute('''
-                INSERT OR IGNORE INTO settings (setting_name, setting_value)
-                VALUES (?, ?)
-            ''', (setting_name, setting_value))
+    def init_database(self):
+        """Initialize the SQLite database, applying any pending schema migrations.
         
-        conn.commit()
-        conn.close()
+        A current database costs a single PRAGMA read, so short-lived
+        workers and CLI runs skip schema work entirely.
+        """
+        conn = self._get_connection()
+        current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if current_version < SCHEMA_VERSION:
+            self._apply_migrations(conn)
+            # Evaluates goals over existing history once, so readers always
+            # find them in goal_state
+            self.refresh_goals()
+    
+    def _apply_migrations(self, conn: sqlite3.Connection):
+        """Apply every migration newer than the database's user_version.
+        
+        Each migration runs in its own transaction together with the
+        user_version bump, so an interrupted upgrade resumes where it stopped.
+        BEGIN IMMEDIATE serializes workers that start up at the same time.
+        """
+        cursor = conn.cursor()
+        for version, statements in enumerate(SCHEMA_MIGRATIONS, start=1):
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                current_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+                if version <= current_version:
+                    cursor.execute('COMMIT')
+                    continue
+                
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {version}')
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
     
     def log_sleep(self, date: str, bedtime: str, wake_time: str, 
-                  sleep_quality: Optional[int] = None, notes: str = "") -> bool:
-        """Log sleep data for a specific date"""
+                  sleep_quality: Optional[int] = None, notes: str = "",
+                  idempotency_key: Optional[str] = None) -> bool:
+        """Log sleep data for a specific date.
+        
+        Repeating a call with the same idempotency_key (e.g. a client retry)
+        does nothing and still returns True.
+        """
         try:
             # Calculate sleep duration
-            bedtime_obj = datetime.datetime.strptime(f"{date} {bedtime}", "%Y-%m-%d %H:%M")
-            wake_time_obj = datetime.datetime.strptime(f"{date} {wake_time}", "%Y-%m-%d %H:%M")
+            sleep_duration = _sleep_duration_hours(date, bedtime, wake_time)
             
-            # Handle cases where wake time is next day
-            if wake_time_obj <= bedtime_obj:
-                wake_time_obj += datetime.timedelta(days=1)
-            
-            sleep_duration = (wake_time_obj - bedtime_obj).total_seconds() / 3600
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO sleep_records 
-                (date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (date, bedtime, wake_time, sleep_duration, sleep_quality, notes))
-            
-            conn.commit()
-            conn.close()
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.cursor()
+                if not self._claim_idempotency_key(cursor, idempotency_key, 'sleep'):
+                    return True
+                cursor.execute('''
+                    INSERT OR REPLACE INTO sleep_records 
+                    (date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (date, bedtime, wake_time, sleep_duration, sleep_quality, notes))
+                record_id = cursor.lastrowid
+                cursor.execute(SLEEP_ROLLUP_UPSERT_SQL, (date, sleep_duration, sleep_quality))
+                # after_id is exclusive: check just the row inserted above
+                self._flag_new_records(cursor, 'sleep', record_id - 1)
+                self._update_goals(cursor)
+            self._data_changed(date, date)
             return True
             
         except Exception as e:
@@ -137,20 +984,28 @@ class HealthTracker:
     
     def log_gym_attendance(self, date: str, attended: bool, workout_type: str = "",
                           duration_minutes: Optional[int] = None, calories_burned: Optional[int] = None,
-                          notes: str = "") -> bool:
-        """Log gym attendance for a specific date"""
+                          notes: str = "", idempotency_key: Optional[str] = None) -> bool:
+        """Log gym attendance for a specific date (idempotent per idempotency_key)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO gym_attendance 
-                (date, attended, workout_type, duration_minutes, calories_burned, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (date, attended, workout_type, duration_minutes, calories_burned, notes))
-            
-            conn.commit()
-            conn.close()
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.cursor()
+                if not self._claim_idempotency_key(cursor, idempotency_key, 'gym'):
+                    return True
+                cursor.execute('''
+                    INSERT INTO gym_attendance 
+                    (date, attended, workout_type, duration_minutes, calories_burned, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (date, attended, workout_type, duration_minutes, calories_burned, notes))
+                record_id = cursor.lastrowid
+                cursor.execute(GYM_ROLLUP_UPSERT_SQL, (date, 1 if attended else 0, 0 if attended else 1,
+                                                       duration_minutes or 0, calories_burned or 0))
+                if not attended:
+                    self._rebuild_missed_ledger(cursor, date)
+                # after_id is exclusive: check just the row inserted above
+                self._flag_new_records(cursor, 'gym', record_id - 1)
+                self._update_goals(cursor)
+            self._data_changed(date, date)
             return True
             
         except Exception as e:
@@ -158,133 +1013,391 @@ class HealthTracker:
             return False
     
     def log_water_intake(self, amount_ml: int, date: Optional[str] = None, 
-                        time_logged: Optional[str] = None, notes: str = "") -> bool:
-        """Log water intake"""
+                        time_logged: Optional[str] = None, notes: str = "",
+                        idempotency_key: Optional[str] = None) -> bool:
+        """Log water intake (idempotent per idempotency_key)"""
         try:
             if date is None:
                 date = datetime.date.today().strftime("%Y-%m-%d")
             if time_logged is None:
                 time_logged = datetime.datetime.now().strftime("%H:%M")
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO water_intake (date, time_logged, amount_ml, notes)
-                VALUES (?, ?, ?, ?)
-            ''', (date, time_logged, amount_ml, notes))
-            
-            conn.commit()
-            conn.close()
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.cursor()
+                if not self._claim_idempotency_key(cursor, idempotency_key, 'water'):
+                    return True
+                cursor.execute('''
+                    INSERT INTO water_intake (date, time_logged, amount_ml, notes)
+                    VALUES (?, ?, ?, ?)
+                ''', (date, time_logged, amount_ml, notes))
+                record_id = cursor.lastrowid
+                cursor.execute(WATER_ROLLUP_UPSERT_SQL, (date, amount_ml, 1))
+                # after_id is exclusive: check just the row inserted above
+                self._flag_new_records(cursor, 'water', record_id - 1)
+                self._update_goals(cursor)
+            self._data_changed(date, date)
             return True
             
         except Exception as e:
             print(f"Error logging water intake: {e}")
             return False
     
+    def log_water_intake_batch(self, entries: List[Tuple]) -> bool:
+        """Log many (date, time_logged, amount_ml, notes) water entries in one transaction.
+        
+        An entry may carry an idempotency key as a fifth element; entries
+        whose key was already used are skipped.
+        """
+        if not entries:
+            return True
+        
+        try:
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.cursor()
+                rows = [entry[:4] for entry in entries
+                        if len(entry) < 5 or self._claim_idempotency_key(cursor, entry[4], 'water')]
+                if not rows:
+                    return True
+                
+                # Pre-sum per date so the rollup gets one upsert per day, not per entry
+                per_date: Dict[str, List[int]] = {}
+                for date, _, amount_ml, _ in rows:
+                    totals = per_date.setdefault(date, [0, 0])
+                    totals[0] += amount_ml
+                    totals[1] += 1
+                
+                last_id = self._max_record_id(cursor, 'water')
+                cursor.executemany('''
+                    INSERT INTO water_intake (date, time_logged, amount_ml, notes)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                cursor.executemany(WATER_ROLLUP_UPSERT_SQL,
+                                   [(date, total, count) for date, (total, count) in per_date.items()])
+                self._flag_new_records(cursor, 'water', last_id)
+                self._update_goals(cursor)
+            self._data_changed(min(per_date), max(per_date))
+            return True
+            
+        except Exception as e:
+            print(f"Error logging water intake batch: {e}")
+            return False
+    
+    @staticmethod
+    def _claim_idempotency_key(cursor: sqlite3.Cursor, key: Optional[str], record_type: str) -> bool:
+        """Record a write's idempotency key; False if the key was already used"""
+        if key is None:
+            return True
+        cursor.execute('INSERT OR IGNORE INTO idempotency_keys (key, record_type) VALUES (?, ?)',
+                       (key, record_type))
+        return cursor.rowcount == 1
+    
+    def get_idempotency_record_ids(self, keys: List[str]) -> Dict[str, int]:
+        """Record id created under each known idempotency key (sync pushes and the event log)"""
+        record_ids = {}
+        conn = self._get_connection()
+        for offset in range(0, len(keys), 500):
+            chunk = keys[offset:offset + 500]
+            record_ids.update(conn.execute(f'''
+                SELECT key, record_id FROM idempotency_keys
+                WHERE key IN ({', '.join('?' * len(chunk))}) AND record_id IS NOT NULL
+            ''', chunk).fetchall())
+        return record_ids
+    
+    def prune_idempotency_keys(self, days: int = IDEMPOTENCY_KEY_DAYS) -> int:
+        """Forget idempotency keys older than `days`; returns the number removed"""
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)",
+                                  (f'-{int(days)} days',))
+        return cursor.rowcount
+    
+    @staticmethod
+    def _max_record_id(cursor: sqlite3.Cursor, record_type: str) -> int:
+        table = EXPORT_COLUMNS[record_type][0]
+        return cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+    
+    def _flag_new_records(self, cursor: sqlite3.Cursor, record_type: str, after_id: int) -> int:
+        """Check records with id > after_id for outliers and duplicates, in one pass.
+        
+        Runs inside the caller's write transaction. Rows are streamed in id
+        (arrival) order through the per-metric rolling statistics, which are
+        loaded once and saved back at the end. Returns the number of flags.
+        """
+        table, columns = EXPORT_COLUMNS[record_type]
+        metrics = CHECKED_METRICS[record_type]
+        stats = {metric: RollingStats() for metric in metrics}
+        for metric, count, mean, variance in cursor.execute(f'''
+            SELECT metric, count, mean, variance FROM outlier_stats
+            WHERE metric IN ({', '.join('?' * len(metrics))})
+        ''', metrics):
+            stats[metric] = RollingStats(count, mean, variance)
+        
+        duplicate_sql = DUPLICATE_LOOKUP_SQL.get(record_type)
+        flags = []
+        rows = cursor.connection.cursor()
+        rows.execute(f'SELECT id, {", ".join(columns)} FROM {table} WHERE id > ? ORDER BY id', (after_id,))
+        for row in rows:
+            record_id, record = row[0], dict(zip(columns, row[1:]))
+            for metric in metrics:
+                value = record[metric]
+                if value is None:
+                    continue
+                result = check_value(metric, value, stats[metric])
+                if result is not None:
+                    flags.append((record_type, record_id, record['date'], metric, value, *result))
+            
+            if duplicate_sql and cursor.execute(duplicate_sql, (record_id, *row[1:])).fetchone():
+                flags.append((record_type, record_id, record['date'], 'record', None, 'duplicate', None))
+        
+        if record_type == 'sleep' and after_id:
+            # A replaced night gets a new id; drop the old row's flags
+            cursor.execute('''
+                DELETE FROM flagged_records
+                WHERE record_type = 'sleep' AND record_id NOT IN (SELECT id FROM sleep_records)
+                  AND date IN (SELECT date FROM sleep_records WHERE id > ?)
+            ''', (after_id,))
+        cursor.executemany('''
+            INSERT OR REPLACE INTO flagged_records
+            (record_type, record_id, date, metric, value, reason, expected)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', flags)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO outlier_stats (metric, count, mean, variance)
+            VALUES (?, ?, ?, ?)
+        ''', [(metric, s.count, s.mean, s.variance) for metric, s in stats.items()])
+        return len(flags)
+    
     def get_daily_water_total(self, date: str) -> int:
         """Get total water intake for a specific date"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT SUM(amount_ml) FROM water_intake WHERE date = ?
+            SELECT water_total_ml FROM daily_rollup WHERE date = ?
         ''', (date,))
         
-        result = cursor.fetchone()[0]
-        conn.close()
+        result = cursor.fetchone()
         
-        return result if result else 0
+        return result[0] if result else 0
     
-    def get_sleep_data(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get sleep data for a date range"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def rebuild_daily_rollup(self, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> int:
+        """Recompute daily_rollup from the raw tables, optionally for a date range.
         
-        cursor.execute('''
+        Returns the number of rollup rows written.
+        """
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.cursor()
+            rows = self._rebuild_rollup_rows(cursor, start_date, end_date)
+            self._update_goals(cursor)
+        self._data_changed(start_date, end_date)
+        return rows
+    
+    def _rebuild_rollup_rows(self, cursor: sqlite3.Cursor, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> int:
+        """Replace rollup rows for a range inside the caller's transaction.
+        
+        The missed-session ledger is rebuilt from the start of the range.
+        Returns the number of rollup rows written.
+        """
+        bounds = (start_date or '0000-01-01', end_date or '9999-12-31')
+        if start_date is None and end_date is None:
+            cursor.execute('DELETE FROM daily_rollup')
+            cursor.execute(DAILY_ROLLUP_REBUILD_SQL.format(date_filter=''))
+        else:
+            cursor.execute('DELETE FROM daily_rollup WHERE date BETWEEN ? AND ?', bounds)
+            cursor.execute(DAILY_ROLLUP_REBUILD_SQL.format(date_filter='WHERE date BETWEEN ? AND ?'),
+                           bounds * 3)
+        rows = cursor.rowcount
+        
+        # Archived entries count towards their days as if they were still hot
+        archive = self._cold_archive()
+        if archive is not None:
+            cursor.executemany(WATER_ROLLUP_UPSERT_SQL, archive.daily_totals('water', *bounds))
+            cursor.executemany(GYM_ROLLUP_UPSERT_SQL, archive.daily_totals('gym', *bounds))
+            rows = cursor.execute('SELECT COUNT(*) FROM daily_rollup WHERE date BETWEEN ? AND ?',
+                                  bounds).fetchone()[0]
+        self._rebuild_missed_ledger(cursor, bounds[0])
+        return rows
+    
+    def _rebuild_missed_ledger(self, cursor: sqlite3.Cursor, from_date: str = '0000-01-01'):
+        """Recompute running missed-session totals from a date onwards.
+        
+        Rows before from_date are untouched, so logging today's session only
+        rewrites today's row; backfilling an old date rewrites the ledger
+        rows after it, one per day with a missed session.
+        """
+        cursor.execute('DELETE FROM missed_ledger WHERE date >= ?', (from_date,))
+        cursor.execute(MISSED_LEDGER_REBUILD_SQL.format(from_date='?'), (from_date,) * 3)
+    
+    def _query_records(self, record_class, sql: str, params: Tuple) -> sqlite3.Cursor:
+        """Run a record query on a cursor that builds record_class objects"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = record_class.row_factory
+        cursor.execute(sql, params)
+        return cursor
+    
+    def _sleep_cursor(self, start_date: str, end_date: str) -> sqlite3.Cursor:
+        """Cursor over SleepRecord objects for a date range, newest first"""
+        return self._query_records(SleepRecord, '''
             SELECT date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes
             FROM sleep_records 
             WHERE date BETWEEN ? AND ?
             ORDER BY date DESC
         ''', (start_date, end_date))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'date': row[0],
-                'bedtime': row[1],
-                'wake_time': row[2],
-                'sleep_duration_hours': row[3],
-                'sleep_quality': row[4],
-                'notes': row[5]
-            }
-            for row in rows
-        ]
     
-    def get_gym_attendance_data(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get gym attendance data for a date range"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+    def _gym_cursor(self, start_date: str, end_date: str) -> sqlite3.Cursor:
+        """Cursor over GymSession objects for a date range, newest first"""
+        return self._query_records(GymSession, '''
             SELECT date, attended, workout_type, duration_minutes, calories_burned, notes
             FROM gym_attendance 
             WHERE date BETWEEN ? AND ?
             ORDER BY date DESC
         ''', (start_date, end_date))
+    
+    def _water_cursor(self, start_date: str, end_date: str) -> sqlite3.Cursor:
+        """Cursor over WaterEntry objects for a date range, newest first"""
+        return self._query_records(WaterEntry, '''
+            SELECT date, time_logged, amount_ml, notes
+            FROM water_intake
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date DESC, time_logged DESC
+        ''', (start_date, end_date))
+    
+    def get_sleep_data(self, start_date: str, end_date: str, limit: Optional[int] = None,
+                       cursor: Optional[str] = None) -> List[SleepRecord]:
+        """Get sleep data for a date range, newest first.
         
-        rows = cursor.fetchall()
-        conn.close()
+        With limit (and the cursor of the previous page) only one page is
+        returned; get_sleep_page also gives the cursor for the next one.
+        """
+        if limit is None and cursor is None:
+            return self._sleep_cursor(start_date, end_date).fetchall()
+        return list(self.get_sleep_page(start_date, end_date, limit, cursor))
+    
+    def iter_sleep_data(self, start_date: str, end_date: str) -> Iterator[SleepRecord]:
+        """Iterate sleep data for a date range without materializing a list"""
+        yield from self._sleep_cursor(start_date, end_date)
+    
+    def get_sleep_page(self, start_date: str, end_date: str, limit: Optional[int] = None,
+                       cursor: Optional[str] = None) -> RecordPage:
+        """One keyset page of sleep records, newest first, fetched as it is iterated"""
+        limit = _page_size(limit)
+        sql = '''
+            SELECT date, date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes
+            FROM sleep_records
+            WHERE date BETWEEN ? AND ?
+        '''
+        params: Tuple = (start_date, end_date)
+        if cursor:
+            (after_date,) = decode_cursor(cursor, 1)
+            sql += ' AND date < ?'
+            params += (after_date,)
+        sql += ' ORDER BY date DESC LIMIT ?'
         
-        return [
-            {
-                'date': row[0],
-                'attended': bool(row[1]),
-                'workout_type': row[2],
-                'duration_minutes': row[3],
-                'calories_burned': row[4],
-                'notes': row[5]
-            }
-            for row in rows
-        ]
+        rows = self._get_connection().execute(sql, params + (limit + 1,))
+        return RecordPage(rows, limit, 1, lambda row: SleepRecord(*row))
     
-    def calculate_opportunity_loss(self, start_date: str, end_date: str) -> Dict:
-        """Calculate opportunity loss from missed gym sessions"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _archived_rows(self, record_type: str, start_date: str, end_date: str) -> List[Tuple]:
+        """Archived (date, id, *export columns) rows of a type in a range, by (date, id)"""
+        archive = self._cold_archive()
+        return archive.rows(record_type, start_date, end_date) if archive is not None else []
+    
+    def _gym_records(self, start_date: str, end_date: str) -> Iterable[GymSession]:
+        """Gym entries for a range from both tiers, newest first"""
+        records = self._gym_cursor(start_date, end_date)
+        archived = self._archived_rows('gym', start_date, end_date)
+        if not archived:
+            return records
+        return heapq.merge(records, [GymSession(*row[2:]) for row in reversed(archived)],
+                           key=lambda record: record.date, reverse=True)
+    
+    def get_gym_attendance_data(self, start_date: str, end_date: str, limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> List[GymSession]:
+        """Get gym attendance data for a date range, newest first (one page when limit is given)"""
+        if limit is None and cursor is None:
+            return list(self._gym_records(start_date, end_date))
+        return list(self.get_gym_attendance_page(start_date, end_date, limit, cursor))
+    
+    def iter_gym_attendance_data(self, start_date: str, end_date: str) -> Iterator[GymSession]:
+        """Iterate gym attendance data for a date range without materializing a list"""
+        yield from self._gym_records(start_date, end_date)
+    
+    def get_gym_attendance_page(self, start_date: str, end_date: str, limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> RecordPage:
+        """One keyset page of gym entries ordered by (date, id) descending"""
+        limit = _page_size(limit)
+        sql = '''
+            SELECT date, id, date, attended, workout_type, duration_minutes, calories_burned, notes
+            FROM gym_attendance
+            WHERE date BETWEEN ? AND ?
+        '''
+        params: Tuple = (start_date, end_date)
+        if cursor:
+            after_date, after_id = decode_cursor(cursor, 2)
+            sql += ' AND (date < ? OR (date = ? AND id < ?))'
+            params += (after_date, after_date, after_id)
+        sql += ' ORDER BY date DESC, id DESC LIMIT ?'
         
-        # Get settings
-        cursor.execute('SELECT setting_value FROM settings WHERE setting_name = ?', 
-                      ('gym_membership_cost_monthly',))
-        monthly_cost = float(cursor.fetchone()[0])
+        rows = self._get_connection().execute(sql, params + (limit + 1,))
+        archived = self._archived_rows('gym', start_date, end_date)
+        if archived:
+            if cursor:
+                archived = [row for row in archived if row[:2] < (after_date, after_id)]
+            rows = itertools.islice(heapq.merge(rows, reversed(archived), reverse=True), limit + 1)
+        return RecordPage(rows, limit, 2, lambda row: GymSession(*row))
+    
+    def _water_records(self, start_date: str, end_date: str) -> Iterable[WaterEntry]:
+        """Water entries for a range from both tiers, newest first"""
+        records = self._water_cursor(start_date, end_date)
+        archived = self._archived_rows('water', start_date, end_date)
+        if not archived:
+            return records
         
-        cursor.execute('SELECT setting_value FROM settings WHERE setting_name = ?', 
-                      ('missed_workout_opportunity_cost',))
-        opportunity_cost_per_session = float(cursor.fetchone()[0])
+        def order(record):
+            return record.date, record.time_logged
         
-        # Count missed sessions
-        cursor.execute('''
-            SELECT COUNT(*) FROM gym_attendance 
-            WHERE date BETWEEN ? AND ? AND attended = 0
-        ''', (start_date, end_date))
+        archived = sorted((WaterEntry(*row[2:]) for row in archived), key=order, reverse=True)
+        return heapq.merge(records, archived, key=order, reverse=True)
+    
+    def get_water_entries(self, start_date: str, end_date: str) -> List[WaterEntry]:
+        """Get individual water intake entries for a date range"""
+        return list(self._water_records(start_date, end_date))
+    
+    def iter_water_entries(self, start_date: str, end_date: str) -> Iterator[WaterEntry]:
+        """Iterate water intake entries for a date range without materializing a list"""
+        yield from self._water_records(start_date, end_date)
+    
+    def calculate_opportunity_loss(self, start_date: str, end_date: str) -> Dict:
+        """Calculate opportunity loss from missed gym sessions.
         
-        missed_sessions = cursor.fetchone()[0]
+        Missed sessions and their cost come from two lookups in the running
+        missed_ledger; membership is priced per day at the monthly rate in
+        effect on that day.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
         
+        missed_before, cost_before = self._missed_ledger_at(cursor, start_date, inclusive=False)
+        missed_through, cost_through = self._missed_ledger_at(cursor, end_date)
+        return self._loss_summary(start_date, end_date, missed_through - missed_before,
+                                  cost_through - cost_before,
+                                  self._membership_cost(cursor, start_date, end_date))
+    
+    @staticmethod
+    def _loss_summary(start_date: str, end_date: str, missed_sessions: int,
+                      opportunity_loss: float, membership_cost_for_period: float) -> Dict:
+        """Opportunity loss result for a range from its ledger and membership totals"""
         # Calculate date range in days
         start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
         end = datetime.datetime.strptime(end_date, "%Y-%m-%d")
         days_in_range = (end - start).days + 1
-        
-        # Calculate costs
-        daily_membership_cost = monthly_cost / 30.44  # Average days per month
-        membership_cost_for_period = daily_membership_cost * days_in_range
-        opportunity_loss = missed_sessions * opportunity_cost_per_session
         total_loss = membership_cost_for_period + opportunity_loss
         
-        conn.close()
-        
         return {
             'missed_sessions': missed_sessions,
             'membership_cost_for_period': round(membership_cost_for_period, 2),
@@ -293,6 +1406,333 @@ class HealthTracker:
             'days_in_range': days_in_range
         }
     
+    @staticmethod
+    def _missed_ledger_at(cursor: sqlite3.Cursor, date: str, inclusive: bool = True) -> Tuple[int, float]:
+        """Running (missed sessions, opportunity cost) through date, or before it"""
+        row = cursor.execute(f'''
+            SELECT missed_cumulative, missed_cost_cumulative FROM missed_ledger
+            WHERE date {'<=' if inclusive else '<'} ?
+            ORDER BY date DESC LIMIT 1
+        ''', (date,)).fetchone()
+        return row if row else (0, 0.0)
+    
+    def _membership_cost(self, cursor: sqlite3.Cursor, start_date: str, end_date: str) -> float:
+        """Membership cost for a range, each day priced at the monthly rate then in effect"""
+        # The rate in effect on start_date plus every change inside the range
+        changes = cursor.execute('''
+            SELECT * FROM (
+                SELECT effective_date, setting_value FROM settings_history
+                WHERE setting_name = 'gym_membership_cost_monthly' AND effective_date <= ?
+                ORDER BY effective_date DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT effective_date, setting_value FROM settings_history
+            WHERE setting_name = 'gym_membership_cost_monthly'
+              AND effective_date > ? AND effective_date <= ?
+            ORDER BY effective_date
+        ''', (start_date, start_date, end_date)).fetchall()
+        if not changes:
+            changes = [(start_date, self.get_setting('gym_membership_cost_monthly'))]
+        return self._price_membership(changes, start_date, end_date)
+    
+    @staticmethod
+    def _price_membership(changes: List[Tuple[str, str]], start_date: str, end_date: str) -> float:
+        """Price a range from the (effective_date, monthly_cost) changes covering it"""
+        end = datetime.date.fromisoformat(end_date)
+        total = 0.0
+        for i, (effective_date, monthly_cost) in enumerate(changes):
+            segment_start = datetime.date.fromisoformat(max(effective_date, start_date))
+            segment_end = (datetime.date.fromisoformat(changes[i + 1][0]) - datetime.timedelta(days=1)
+                           if i + 1 < len(changes) else end)
+            days = (segment_end - segment_start).days + 1
+            total += float(monthly_cost) / 30.44 * days  # Average days per month
+        return total
+    
+    # Column order of the rows returned by _daily_rollup_rows
+    DAILY_COLUMNS = ('date', 'water_ml', 'water_entries', 'has_sleep', 'sleep_hours',
+                     'sleep_quality', 'gym_attended', 'gym_missed', 'gym_minutes', 'gym_calories')
+    
+    def _daily_rollup_rows(self, start_date: str, end_date: str) -> List[Tuple]:
+        """Get one gap-filled row per date in a range, ordered by date.
+        
+        Reads daily_rollup joined onto a generated date series, so the cost is
+        O(days) regardless of how many entries were logged and days without
+        data come back as zeros.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            WITH RECURSIVE days(date) AS (
+                SELECT date(?)
+                UNION ALL
+                SELECT date(date, '+1 day') FROM days WHERE date < date(?)
+            )
+            SELECT days.date,
+                   COALESCE(r.water_total_ml, 0),
+                   COALESCE(r.water_entries, 0),
+                   COALESCE(r.sleep_logged, 0),
+                   COALESCE(r.sleep_hours, 0),
+                   r.sleep_quality,
+                   COALESCE(r.gym_attended, 0),
+                   COALESCE(r.gym_missed, 0),
+                   COALESCE(r.gym_minutes, 0),
+                   COALESCE(r.gym_calories, 0)
+            FROM days
+            LEFT JOIN daily_rollup AS r ON r.date = days.date
+            ORDER BY days.date
+        ''', (start_date, end_date))
+        
+        return cursor.fetchall()
+    
+    def get_daily_aggregates(self, start_date: str, end_date: str) -> List[Dict]:
+        """Get per-day water, sleep and gym aggregates for every date in a range"""
+        rows = [
+            dict(zip(self.DAILY_COLUMNS, row))
+            for row in self._daily_rollup_rows(start_date, end_date)
+        ]
+        for row in rows:
+            row['has_sleep'] = bool(row['has_sleep'])
+        return rows
+    
+    def get_daily_columns(self, start_date: str, end_date: str) -> Dict[str, tuple]:
+        """Get the same per-day aggregates as columns (one tuple per field)"""
+        rows = self._daily_rollup_rows(start_date, end_date)
+        columns = zip(*rows) if rows else [()] * len(self.DAILY_COLUMNS)
+        return dict(zip(self.DAILY_COLUMNS, columns))
+    
+    def get_series_buckets(self, metric: str, start_date: str, end_date: str,
+                           bucket: str = 'day') -> List[Tuple[str, Optional[float]]]:
+        """Aggregate one metric per day, week or month from the daily rollup.
+        
+        Returns (bucket_start, value) for buckets that have rollup rows;
+        see series.py for gap filling and downsampling.
+        """
+        if metric not in SERIES_AGGREGATE_SQL:
+            raise ValueError(f"Unknown metric: {metric}")
+        if bucket not in SERIES_BUCKET_SQL:
+            raise ValueError(f"Unknown bucket: {bucket}")
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {SERIES_BUCKET_SQL[bucket]} AS bucket, {SERIES_AGGREGATE_SQL[metric]}
+            FROM daily_rollup
+            WHERE date BETWEEN ? AND ?
+            GROUP BY bucket
+            ORDER BY bucket
+        ''', (start_date, end_date))
+        return cursor.fetchall()
+    
+    def _water_minutes(self, start_date: str, end_date: str) -> Optional[List[Tuple[str, int, int, int]]]:
+        """(date, minute_of_day, total ml, entries) from both tiers, or None if none is archived.
+        
+        The intraday getters answer from the hot table alone in SQL and only
+        fall back to this merge for ranges that reach into the archive.
+        """
+        archive = self._cold_archive()
+        archived = archive.water_by_minute(start_date, end_date) if archive is not None else []
+        if not archived:
+            return None
+        totals = {(date, minute): [ml, entries] for date, minute, ml, entries in archived}
+        for date, minute, ml, entries in self._get_connection().execute('''
+            SELECT date, minute_of_day, SUM(amount_ml), COUNT(*)
+            FROM water_intake INDEXED BY idx_water_intake_date_minute
+            WHERE date BETWEEN ? AND ?
+            GROUP BY date, minute_of_day
+        ''', (start_date, end_date)):
+            slot = totals.setdefault((date, minute), [0, 0])
+            slot[0] += ml
+            slot[1] += entries
+        return [(date, minute, ml, entries) for (date, minute), (ml, entries) in sorted(totals.items())]
+    
+    def get_water_timeline(self, start_date: str, end_date: str) -> List[Tuple[str, int, int]]:
+        """(date, minute_of_day, cumulative ml) at every minute with intake, per day.
+        
+        The running total restarts each day; see hydration.py for the curves
+        built from it.
+        """
+        minutes = self._water_minutes(start_date, end_date)
+        if minutes is None:
+            return self._get_connection().execute('''
+                SELECT date, minute_of_day,
+                       SUM(SUM(amount_ml)) OVER (PARTITION BY date ORDER BY minute_of_day)
+                FROM water_intake
+                WHERE date BETWEEN ? AND ?
+                GROUP BY date, minute_of_day
+                ORDER BY date, minute_of_day
+            ''', (start_date, end_date)).fetchall()
+        
+        timeline = []
+        day, running = None, 0
+        for date, minute, ml, _ in minutes:
+            if date != day:
+                day, running = date, 0
+            running += ml
+            timeline.append((date, minute, running))
+        return timeline
+    
+    def get_water_by_hour(self, start_date: str, end_date: str,
+                          by_weekday: bool = False) -> List[Tuple[int, ...]]:
+        """([weekday,] hour, total ml, entries) over a date range.
+        
+        weekday is 0 for Monday through 6 for Sunday.
+        """
+        minutes = self._water_minutes(start_date, end_date)
+        if minutes is None:
+            group = "(CAST(strftime('%w', date) AS INTEGER) + 6) % 7, " if by_weekday else ''
+            return self._get_connection().execute(f'''
+                SELECT {group}minute_of_day / 60 AS hour, SUM(amount_ml), COUNT(*)
+                FROM water_intake INDEXED BY idx_water_intake_date_minute
+                WHERE date BETWEEN ? AND ?
+                GROUP BY {group}hour
+                ORDER BY {group}hour
+            ''', (start_date, end_date)).fetchall()
+        
+        totals: Dict[Tuple[int, ...], List[int]] = {}
+        for date, minute, ml, entries in minutes:
+            hour = minute // 60
+            key = (datetime.date.fromisoformat(date).weekday(), hour) if by_weekday else (hour,)
+            slot = totals.setdefault(key, [0, 0])
+            slot[0] += ml
+            slot[1] += entries
+        return [(*key, ml, entries) for key, (ml, entries) in sorted(totals.items())]
+    
+    def get_water_total_until(self, start_date: str, end_date: str, minute_of_day: int) -> int:
+        """Water logged at or before minute_of_day, summed over a date range"""
+        total = self._get_connection().execute('''
+            SELECT COALESCE(SUM(amount_ml), 0)
+            FROM water_intake INDEXED BY idx_water_intake_date_minute
+            WHERE date BETWEEN ? AND ? AND minute_of_day <= ?
+        ''', (start_date, end_date, minute_of_day)).fetchone()[0]
+        archive = self._cold_archive()
+        if archive is not None:
+            total += sum(ml for _, minute, ml, _ in archive.water_by_minute(start_date, end_date)
+                         if minute <= minute_of_day)
+        return total
+    
+    def get_range_summary(self, start_date: str, end_date: str, include_records: bool = True) -> Dict:
+        """Get totals, averages and records for an arbitrary date range.
+        
+        With include_records=False the sleep_data and gym_data lists are left
+        empty, for callers that page through records separately.
+        """
+        daily = self.get_daily_aggregates(start_date, end_date)
+        
+        sleep_nights = sum(1 for d in daily if d['has_sleep'])
+        total_sleep_hours = sum(d['sleep_hours'] for d in daily)
+        avg_sleep = total_sleep_hours / sleep_nights if sleep_nights else 0
+        
+        gym_sessions_attended = sum(d['gym_attended'] for d in daily)
+        total_gym_entries = gym_sessions_attended + sum(d['gym_missed'] for d in daily)
+        gym_attendance_rate = (gym_sessions_attended / total_gym_entries * 100) if total_gym_entries > 0 else 0
+        
+        water_totals = [d['water_ml'] for d in daily]
+        avg_water = sum(water_totals) / len(water_totals) if water_totals else 0
+        
+        opportunity_loss = self.calculate_opportunity_loss(start_date, end_date)
+        
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'average_sleep_hours': round(avg_sleep, 2),
+            'total_sleep_hours': round(total_sleep_hours, 1),
+            'gym_sessions_attended': gym_sessions_attended,
+            'total_gym_entries': total_gym_entries,
+            'gym_attendance_rate': round(gym_attendance_rate, 1),
+            'average_daily_water_ml': round(avg_water, 0),
+            'opportunity_loss': opportunity_loss,
+            'sleep_data': self.get_sleep_data(start_date, end_date) if include_records else [],
+            'gym_data': self.get_gym_attendance_data(start_date, end_date) if include_records else [],
+            'daily_water_totals': water_totals,
+            'daily': daily
+        }
+    
+    def get_range_summaries(self, ranges: List[Tuple[str, str]]) -> List[Dict]:
+        """Summary totals for many date ranges at once, in the order given.
+        
+        Returns the same figures as get_range_summary(include_records=False)
+        without the per-day lists. The rollup is read once for the span of
+        all ranges (days with data only), the missed ledger and membership
+        price history once each; every range is then sliced out of those by
+        bisection, so a year of monthly reports costs one scan instead of
+        twelve rounds of queries.
+        """
+        if not ranges:
+            return []
+        for start_date, end_date in ranges:
+            if _parse_date(start_date) > _parse_date(end_date):
+                raise ValueError(f"Range {start_date}..{end_date} ends before it starts")
+        
+        span_start = min(start_date for start_date, _ in ranges)
+        span_end = max(end_date for _, end_date in ranges)
+        conn = self._get_connection()
+        # Only days with data; a missing day adds nothing to any total
+        rows = conn.execute('''
+            SELECT date, water_total_ml, sleep_logged, COALESCE(sleep_hours, 0),
+                   gym_attended, gym_missed
+            FROM daily_rollup
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+        ''', (span_start, span_end)).fetchall()
+        row_dates = [row[0] for row in rows]
+        ledger = conn.execute('''
+            SELECT date, missed_cumulative, missed_cost_cumulative FROM missed_ledger
+            WHERE date <= ? ORDER BY date
+        ''', (span_end,)).fetchall()
+        ledger_dates = [row[0] for row in ledger]
+        prices = conn.execute('''
+            SELECT effective_date, setting_value FROM settings_history
+            WHERE setting_name = 'gym_membership_cost_monthly' AND effective_date <= ?
+            ORDER BY effective_date
+        ''', (span_end,)).fetchall()
+        price_dates = [row[0] for row in prices]
+        
+        def ledger_at(index):
+            return ledger[index][1:] if index >= 0 else (0, 0.0)
+        
+        summaries = []
+        for start_date, end_date in ranges:
+            days = (datetime.date.fromisoformat(end_date) - datetime.date.fromisoformat(start_date)).days + 1
+            daily = rows[bisect.bisect_left(row_dates, start_date):bisect.bisect_right(row_dates, end_date)]
+            
+            sleep_nights = sum(row[2] for row in daily)
+            total_sleep_hours = sum(row[3] for row in daily)
+            avg_sleep = total_sleep_hours / sleep_nights if sleep_nights else 0
+            
+            gym_sessions_attended = sum(row[4] for row in daily)
+            total_gym_entries = gym_sessions_attended + sum(row[5] for row in daily)
+            gym_attendance_rate = (gym_sessions_attended / total_gym_entries * 100) if total_gym_entries > 0 else 0
+            
+            total_water = sum(row[1] for row in daily)
+            avg_water = total_water / days
+            
+            # Same lookups as calculate_opportunity_loss, by bisection
+            missed_before, cost_before = ledger_at(bisect.bisect_left(ledger_dates, start_date) - 1)
+            missed_through, cost_through = ledger_at(bisect.bisect_right(ledger_dates, end_date) - 1)
+            in_effect = bisect.bisect_right(price_dates, start_date) - 1
+            changes = prices[max(in_effect, 0):bisect.bisect_right(price_dates, end_date)]
+            if not changes:
+                changes = [(start_date, self.get_setting('gym_membership_cost_monthly'))]
+            
+            summaries.append({
+                'start_date': start_date,
+                'end_date': end_date,
+                'days': days,
+                'sleep_nights': sleep_nights,
+                'average_sleep_hours': round(avg_sleep, 2),
+                'total_sleep_hours': round(total_sleep_hours, 1),
+                'gym_sessions_attended': gym_sessions_attended,
+                'total_gym_entries': total_gym_entries,
+                'gym_attendance_rate': round(gym_attendance_rate, 1),
+                'total_water_ml': total_water,
+                'average_daily_water_ml': round(avg_water, 0),
+                'opportunity_loss': self._loss_summary(
+                    start_date, end_date, missed_through - missed_before, cost_through - cost_before,
+                    self._price_membership(changes, start_date, end_date)),
+            })
+        return summaries
+    
     def get_weekly_summary(self, date: str = None) -> Dict:
         """Get weekly summary for the week containing the given date"""
         if date is None:
@@ -306,80 +1746,979 @@ class HealthTracker:
         start_str = week_start.strftime("%Y-%m-%d")
         end_str = week_end.strftime("%Y-%m-%d")
         
-        # Get data for the week
-        sleep_data = self.get_sleep_data(start_str, end_str)
-        gym_data = self.get_gym_attendance_data(start_str, end_str)
-        opportunity_loss = self.calculate_opportunity_loss(start_str, end_str)
+        summary = self.get_range_summary(start_str, end_str)
+        summary['week_start'] = start_str
+        summary['week_end'] = end_str
+        return summary
+    
+    def get_precomputed_summary(self, kind: str, start_date: str, end_date: str) -> Optional[Dict]:
+        """Stored summary for a range, or None if missing or stale"""
+        row = self._get_connection().execute('''
+            SELECT payload FROM precomputed_summaries
+            WHERE kind = ? AND start_date = ? AND end_date = ? AND stale = 0
+        ''', (kind, start_date, end_date)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def store_precomputed_summary(self, kind: str, start_date: str, end_date: str,
+                                  payload: Dict, data_version: int) -> bool:
+        """Store a summary computed while PRAGMA data_version was `data_version`.
         
-        # Calculate averages and totals
-        avg_sleep = sum(s['sleep_duration_hours'] for s in sleep_data if s['sleep_duration_hours']) / len(sleep_data) if sleep_data else 0
-        gym_attendance_count = sum(1 for g in gym_data if g['attended'])
+        Returns False without storing if any write committed since then,
+        because the summary may already be out of date.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if cursor.execute('PRAGMA data_version').fetchone()[0] != data_version:
+                cursor.execute('ROLLBACK')
+                return False
+            cursor.execute('''
+                INSERT OR REPLACE INTO precomputed_summaries
+                (kind, start_date, end_date, payload, stale, computed_at)
+                VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP)
+            ''', (kind, start_date, end_date, json.dumps(payload, default=_summary_json)))
+            cursor.execute('COMMIT')
+            return True
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+    
+    def get_stale_summaries(self, min_end_date: str) -> List[Tuple[str, str, str]]:
+        """(kind, start_date, end_date) of stale summaries ending on or after min_end_date"""
+        return self._get_connection().execute('''
+            SELECT kind, start_date, end_date FROM precomputed_summaries
+            WHERE stale = 1 AND end_date >= ?
+            ORDER BY end_date DESC
+        ''', (min_end_date,)).fetchall()
+    
+    def prune_precomputed_summaries(self, before_end_date: str) -> int:
+        """Delete stored summaries ending before a date; returns the number removed"""
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.execute('DELETE FROM precomputed_summaries WHERE end_date < ?',
+                                  (before_end_date,))
+        return cursor.rowcount
+    
+    def scan_outliers(self) -> Dict[str, int]:
+        """Recheck every stored record and replace all flags; returns flags per record type.
         
-        # Get daily water totals
-        water_totals = []
-        current_date = week_start
-        while current_date <= week_end:
-            daily_total = self.get_daily_water_total(current_date.strftime("%Y-%m-%d"))
-            water_totals.append(daily_total)
-            current_date += datetime.timedelta(days=1)
+        One pass per table in arrival order, with the same rolling statistics
+        the ingest path uses, so the result matches what ingest would have
+        flagged had the current thresholds always applied.
+        """
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM flagged_records')
+            cursor.execute('DELETE FROM outlier_stats')
+            return {record_type: self._flag_new_records(cursor, record_type, 0)
+                    for record_type in EXPORT_COLUMNS}
+    
+    def get_flagged_records(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                            record_type: Optional[str] = None) -> List[Dict]:
+        """Flagged records, newest first, optionally limited to a date range and type"""
+        conditions, params = [], []
+        if start_date:
+            conditions.append('date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('date <= ?')
+            params.append(end_date)
+        if record_type:
+            conditions.append('record_type = ?')
+            params.append(record_type)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
         
-        avg_water = sum(water_totals) / len(water_totals) if water_totals else 0
+        cursor = self._get_connection().execute(f'''
+            SELECT record_type, record_id, date, metric, value, reason, expected, flagged_at
+            FROM flagged_records {where}
+            ORDER BY date DESC, record_type, record_id
+        ''', params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    
+    def remove_duplicate_records(self) -> int:
+        """Delete records flagged as duplicates; returns the number removed"""
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.cursor()
+            dates = cursor.execute('''
+                SELECT MIN(date), MAX(date) FROM flagged_records WHERE reason = 'duplicate'
+            ''').fetchone()
+            if dates[0] is None:
+                return 0
+            removed = 0
+            for record_type in DUPLICATE_LOOKUP_SQL:
+                table = EXPORT_COLUMNS[record_type][0]
+                removed += cursor.execute(f'''
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT record_id FROM flagged_records
+                        WHERE record_type = ? AND reason = 'duplicate')
+                ''', (record_type,)).rowcount
+                cursor.execute(f'''
+                    DELETE FROM flagged_records
+                    WHERE record_type = ? AND record_id NOT IN (SELECT id FROM {table})
+                ''', (record_type,))
+            self._rebuild_rollup_rows(cursor, *dates)
+            self._update_goals(cursor)
+        
+        self._data_changed(*dates)
+        return removed
+    
+    def applied_event_seq(self) -> int:
+        """Sequence number of the last event-log entry materialized into this database"""
+        return self._get_connection().execute(
+            'SELECT last_applied_seq FROM event_log_state WHERE id = 1').fetchone()[0]
+    
+    def apply_events(self, events: Iterable[Tuple[int, str, Dict]],
+                     on_reject: Optional[Callable[[int, str], None]] = None) -> int:
+        """Materialize (seq, record_type, record) event-log entries in one transaction.
+        
+        Records must already be normalized (see normalize_record); settings
+        changes come as SETTING_EVENT records. Events at or below the stored
+        sequence number are skipped, so a batch that was interrupted can
+        simply be applied again, as are records whose idempotency_key was
+        already used. If an event cannot be applied, the batch is retried
+        event by event and the failing ones are stored in rejected_events
+        and reported to on_reject(seq, error), so they do not hold up the
+        events after them. Returns the number applied.
+        """
+        events = list(events)
+        conn = self._get_connection()
+        rejected: List[Tuple[int, str]] = []
+        try:
+            with conn:
+                applied = self._apply_event_batch(conn.cursor(), events, None)
+        except sqlite3.OperationalError:
+            # Locked or unavailable, not a bad event: the caller retries
+            raise
+        except Exception:
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN')
+                applied = self._apply_event_batch(cursor, events, rejected)
+        
+        if applied is None:
+            return 0
+        dates, settings_changed = applied
+        if settings_changed:
+            # This connection's own commit does not change its data_version
+            conn.settings_cache = None
+            self._data_changed()
+        elif dates:
+            self._data_changed(min(dates), max(dates))
+        if on_reject is not None:
+            for seq, error in rejected:
+                on_reject(seq, error)
+        return len(dates) + settings_changed
+    
+    def _apply_event_batch(self, cursor: sqlite3.Cursor, events: List[Tuple[int, str, Dict]],
+                           rejected: Optional[List[Tuple[int, str]]]) -> Optional[Tuple[List[str], int]]:
+        """Write new events inside the caller's transaction; (dates, settings changed), or None.
+        
+        With rejected None the events are written together and any failure
+        propagates. Otherwise each event gets a savepoint, and failing ones
+        are recorded in rejected_events and appended to rejected.
+        """
+        last_seq = cursor.execute(
+            'SELECT last_applied_seq FROM event_log_state WHERE id = 1').fetchone()[0]
+        new_events = [(seq, record_type, record) for seq, record_type, record in events
+                      if seq > last_seq]
+        if not new_events:
+            return None
+        if rejected is None:
+            _, dates = self._write_records(
+                cursor, [(record_type, record) for _, record_type, record in new_events])
+            settings_changed = sum(record_type == SETTING_EVENT for _, record_type, _ in new_events)
+        else:
+            dates, settings_changed = [], 0
+            for seq, record_type, record in new_events:
+                try:
+                    cursor.execute('SAVEPOINT apply_event')
+                    _, event_dates = self._write_records(cursor, [(record_type, record)])
+                    cursor.execute('RELEASE apply_event')
+                except sqlite3.OperationalError:
+                    raise
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO apply_event')
+                    cursor.execute('RELEASE apply_event')
+                    error = f"{type(e).__name__}: {e}"
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO rejected_events (seq, record_type, record, error)
+                        VALUES (?, ?, ?, ?)
+                    ''', (seq, str(record_type), json.dumps(record, default=str), error))
+                    rejected.append((seq, error))
+                    continue
+                dates.extend(event_dates)
+                settings_changed += record_type == SETTING_EVENT
+        cursor.execute('UPDATE event_log_state SET last_applied_seq = ? WHERE id = 1',
+                       (new_events[-1][0],))
+        return dates, settings_changed
+    
+    def get_rejected_events(self) -> List[Dict]:
+        """Event-log entries set aside because they could not be applied, oldest first"""
+        cursor = self._get_connection().execute('''
+            SELECT seq, record_type, record, error, rejected_at FROM rejected_events ORDER BY seq
+        ''')
+        return [{'seq': seq, 'record_type': record_type, 'record': json.loads(record),
+                 'error': error, 'rejected_at': rejected_at}
+                for seq, record_type, record, error, rejected_at in cursor]
+    
+    def log_records(self, records: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Write raw (record_type, record) pairs in one transaction, e.g. a client's offline queue.
+        
+        A record may carry an 'idempotency_key'; one whose key was already
+        used is reported as a duplicate of the record it created. Invalid
+        records are reported and skipped without failing the rest. Returns
+        one {'status': 'created'|'duplicate'|'invalid', ...} per record.
+        """
+        results: List[Optional[Dict]] = []
+        valid = []
+        for record_type, record in records:
+            try:
+                normalized = normalize_record(record_type, record)
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({'status': 'invalid', 'error': str(e)})
+                continue
+            if record.get('idempotency_key') is not None:
+                normalized['idempotency_key'] = str(record['idempotency_key'])
+            results.append(None)
+            valid.append((record_type, normalized))
+        
+        dates = []
+        if valid:
+            conn = self._get_connection()
+            with conn:
+                written, dates = self._write_records(conn.cursor(), valid)
+            written = iter(written)
+            results = [result or next(written) for result in results]
+        if dates:
+            self._data_changed(min(dates), max(dates))
+        return results
+    
+    def _write_records(self, cursor: sqlite3.Cursor,
+                       records: List[Tuple[str, Dict]]) -> Tuple[List[Dict], List[str]]:
+        """Insert normalized records inside the caller's transaction.
         
+        Keeps the rollup, missed-session ledger, outlier flags and goals
+        current the same way the log_* methods do. Returns a {'status', 'record_id'} per
+        record and the dates written.
+        """
+        last_ids = {record_type: self._max_record_id(cursor, record_type)
+                    for record_type in {record_type for record_type, _ in records}
+                    if record_type != SETTING_EVENT}
+        results = []
+        dates = []
+        water_totals: Dict[str, List[int]] = {}
+        missed_from = None
+        for record_type, record in records:
+            if record_type == SETTING_EVENT:
+                self._write_setting(cursor, record['setting_name'], record['setting_value'],
+                                    record['effective_date'])
+                results.append({'status': 'created', 'record_id': None})
+                continue
+            key = record.get('idempotency_key')
+            if not self._claim_idempotency_key(cursor, key, record_type):
+                row = cursor.execute('SELECT record_id FROM idempotency_keys WHERE key = ?',
+                                     (key,)).fetchone()
+                results.append({'status': 'duplicate', 'record_id': row[0]})
+                continue
+            params = tuple(record[column] for column in EXPORT_COLUMNS[record_type][1])
+            date = params[0]
+            cursor.execute(BULK_IMPORT_SQL[record_type], params)
+            record_id = cursor.lastrowid
+            if key is not None:
+                cursor.execute('UPDATE idempotency_keys SET record_id = ? WHERE key = ?', (record_id, key))
+            if record_type == 'water':
+                totals = water_totals.setdefault(date, [0, 0])
+                totals[0] += params[2]
+                totals[1] += 1
+            elif record_type == 'sleep':
+                cursor.execute(SLEEP_ROLLUP_UPSERT_SQL, (date, params[3], params[4]))
+            else:
+                attended = bool(params[1])
+                cursor.execute(GYM_ROLLUP_UPSERT_SQL, (date, 1 if attended else 0, 0 if attended else 1,
+                                                       params[3] or 0, params[4] or 0))
+                if not attended:
+                    missed_from = min(missed_from or date, date)
+            results.append({'status': 'created', 'record_id': record_id})
+            dates.append(date)
+        
+        cursor.executemany(WATER_ROLLUP_UPSERT_SQL,
+                           [(date, total, count) for date, (total, count) in water_totals.items()])
+        if missed_from is not None:
+            self._rebuild_missed_ledger(cursor, missed_from)
+        for record_type, last_id in last_ids.items():
+            self._flag_new_records(cursor, record_type, last_id)
+        self._update_goals(cursor)
+        return results, dates
+    
+    def sync_epoch(self) -> str:
+        """Random id of this database; change sequence numbers are only comparable within one"""
+        return self._get_connection().execute('SELECT epoch FROM sync_state WHERE id = 1').fetchone()[0]
+    
+    def get_changes(self, since_seq: int = 0, limit: int = 1000) -> Tuple[List[Tuple], int, bool]:
+        """Records changed after change sequence number since_seq, oldest change first.
+        
+        Returns (changes, last seq, whether more remain). Each change is
+        (record_type, record_id, record dict) with record None for a deleted
+        record; a record that changed several times appears once, as it is now.
+        """
+        conn = self._get_connection()
+        rows = conn.execute('''
+            SELECT seq, record_type, record_id, deleted FROM record_changes
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (since_seq, limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        current: Dict[Tuple[str, int], Dict] = {}
+        for record_type in {row[1] for row in rows if not row[3]}:
+            table, columns = EXPORT_COLUMNS[record_type]
+            ids = [row[2] for row in rows if row[1] == record_type and not row[3]]
+            for offset in range(0, len(ids), 500):
+                chunk = ids[offset:offset + 500]
+                for record_id, *values in conn.execute(f'''
+                    SELECT id, {', '.join(columns)} FROM {table}
+                    WHERE id IN ({', '.join('?' * len(chunk))})
+                ''', chunk):
+                    record = dict(zip(columns, values))
+                    if record_type == 'gym':
+                        record['attended'] = bool(record['attended'])
+                    current[(record_type, record_id)] = record
+        
+        changes = [(record_type, record_id, current.get((record_type, record_id)))
+                   for _, record_type, record_id, _ in rows]
+        return changes, rows[-1][0] if rows else since_seq, has_more
+    
+    def bulk_import(self, record_type: str, source: Union[TextIO, Iterable[Dict]],
+                    fmt: Optional[str] = None, chunk_size: int = 5000) -> Dict:
+        """Import many sleep, gym or water records in chunked transactions.
+        
+        `source` is a text stream in `fmt` ('csv' or 'jsonl') or, when fmt is
+        None, an iterable of dicts. Rows are validated individually and bad
+        rows are reported without aborting the import; valid rows are written
+        with executemany, one transaction per chunk, and each chunk's rows are
+        added to the daily rollup the same way the log_* methods add theirs.
+        """
+        if record_type not in BULK_IMPORT_SQL:
+            raise ValueError(f"Unknown record type: {record_type}")
+        
+        if fmt is None:
+            records = enumerate(source, start=1)
+        else:
+            records = iter_import_records(source, fmt)
+        
+        result = {'record_type': record_type, 'imported': 0, 'error_count': 0, 'errors': []}
+        
+        def record_error(line_number, error):
+            result['error_count'] += 1
+            if len(result['errors']) < MAX_REPORTED_IMPORT_ERRORS:
+                result['errors'].append({'line': line_number, 'error': str(error)})
+        
+        chunk = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                chunk.append((line_number, _import_row(record_type, record)))
+            except ValueError as e:
+                record_error(line_number, e)
+                continue
+            
+            if len(chunk) >= chunk_size:
+                self._import_chunk(record_type, chunk, result, record_error)
+                chunk = []
+        
+        if chunk:
+            self._import_chunk(record_type, chunk, result, record_error)
+        # Goals once for the whole import rather than per chunk
+        self.refresh_goals()
+        
+        return result
+    
+    def _import_chunk(self, record_type: str, chunk: List[Tuple[int, Tuple]],
+                      result: Dict, record_error):
+        """Write one chunk of validated rows and add them to the rollup"""
+        conn = self._get_connection()
+        sql = BULK_IMPORT_SQL[record_type]
+        rows = [params for _, params in chunk]
+        
+        try:
+            with conn:
+                cursor = conn.cursor()
+                last_id = self._max_record_id(cursor, record_type)
+                cursor.executemany(sql, rows)
+                self._add_to_rollup(cursor, record_type, rows)
+                self._flag_new_records(cursor, record_type, last_id)
+            result['imported'] += len(chunk)
+            self._data_changed(min(params[0] for params in rows), max(params[0] for params in rows))
+            return
+        except sqlite3.Error:
+            pass
+        
+        # Something in the chunk violated a constraint; retry row by row so
+        # only the offending rows are rejected
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            last_id = self._max_record_id(cursor, record_type)
+            written = []
+            for line_number, params in chunk:
+                try:
+                    cursor.execute('SAVEPOINT import_row')
+                    cursor.execute(sql, params)
+                    cursor.execute('RELEASE import_row')
+                    written.append(params)
+                except sqlite3.Error as e:
+                    cursor.execute('ROLLBACK TO import_row')
+                    cursor.execute('RELEASE import_row')
+                    record_error(line_number, e)
+            self._add_to_rollup(cursor, record_type, written)
+            self._flag_new_records(cursor, record_type, last_id)
+        result['imported'] += len(written)
+        if written:
+            self._data_changed(min(params[0] for params in written), max(params[0] for params in written))
+    
+    def _add_to_rollup(self, cursor: sqlite3.Cursor, record_type: str, rows: List[Tuple]):
+        """Add newly inserted rows (in BULK_IMPORT_SQL order) to the daily rollup.
+        
+        Rows are summed per day first, so a chunk costs one upsert per day it
+        touches however its rows are ordered. A later night replaces an
+        earlier one, as INSERT OR REPLACE did in sleep_records.
+        """
+        if record_type == 'water':
+            totals: Dict[str, List[int]] = {}
+            for date, _, amount_ml, _ in rows:
+                day = totals.setdefault(date, [0, 0])
+                day[0] += amount_ml
+                day[1] += 1
+            cursor.executemany(WATER_ROLLUP_UPSERT_SQL,
+                               [(date, total, count) for date, (total, count) in totals.items()])
+        elif record_type == 'sleep':
+            nights = {params[0]: (params[0], params[3], params[4]) for params in rows}
+            cursor.executemany(SLEEP_ROLLUP_UPSERT_SQL, nights.values())
+        else:
+            days: Dict[str, List[int]] = {}
+            for date, attended, _, duration_minutes, calories_burned, _ in rows:
+                day = days.setdefault(date, [0, 0, 0, 0])
+                day[0 if attended else 1] += 1
+                day[2] += duration_minutes or 0
+                day[3] += calories_burned or 0
+            cursor.executemany(GYM_ROLLUP_UPSERT_SQL, [(date, *day) for date, day in days.items()])
+            missed = [date for date, day in days.items() if day[1]]
+            if missed:
+                self._rebuild_missed_ledger(cursor, min(missed))
+    
+    def export(self, record_type: str, fmt: str = 'jsonl', start_date: Optional[str] = None,
+               end_date: Optional[str] = None, batch_size: int = 1000) -> Iterator[str]:
+        """Stream records as CSV or JSON-lines text, one line at a time.
+        
+        Rows are fetched in batches from a single cursor, so memory stays
+        flat regardless of table size.
+        """
+        if record_type not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown record type: {record_type}")
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        
+        table, columns = EXPORT_COLUMNS[record_type]
+        bounds = (start_date or '0000-01-01', end_date or '9999-12-31')
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        archived = self._archived_rows(record_type, *bounds) if record_type in ARCHIVE_LAYOUT else []
+        if archived:
+            # Merge both tiers on (date, id), then drop the sort key
+            cursor.execute(f'''
+                SELECT date, id, {', '.join(columns)} FROM {table}
+                WHERE date BETWEEN ? AND ?
+                ORDER BY date, id
+            ''', bounds)
+            merged = (row[2:] for row in heapq.merge(cursor, archived))
+            batches = iter(lambda: list(itertools.islice(merged, batch_size)), [])
+        else:
+            cursor.execute(f'''
+                SELECT {', '.join(columns)} FROM {table}
+                WHERE date BETWEEN ? AND ?
+                ORDER BY date, id
+            ''', bounds)
+            batches = iter(lambda: cursor.fetchmany(batch_size), [])
+        
+        if fmt == 'csv':
+            import csv
+            buffer = _LineBuffer()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.pop()
+        
+        for rows in batches:
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow(row)
+                    yield buffer.pop()
+                else:
+                    record = dict(zip(columns, row))
+                    if record_type == 'gym':
+                        record['attended'] = bool(record['attended'])
+                    yield json.dumps(record) + "\n"
+    
+    def _cold_archive(self) -> Optional[ColumnarArchive]:
+        """The archive tier, or None while nothing has been archived"""
+        if self._archive is None:
+            if not ColumnarArchive.exists(self.archive_dir):
+                return None
+            self._archive = ColumnarArchive(self.archive_dir)
+        return self._archive
+    
+    @staticmethod
+    def _delete_archived(cursor: sqlite3.Cursor, record_type: str, ids: List[int]):
+        """Remove archived entries from their hot table.
+        
+        The records still exist, so the sync tombstones written by the delete
+        triggers are dropped again; clients keep their copies. Sequence
+        numbers come from the sync_state counter, so later changes still
+        sort after every number handed out before.
+        """
+        table = ARCHIVE_LAYOUT[record_type][0]
+        cursor.executemany(f'DELETE FROM {table} WHERE id = ?', ((record_id,) for record_id in ids))
+        cursor.executemany('DELETE FROM record_changes WHERE record_type = ? AND record_id = ?',
+                           ((record_type, record_id) for record_id in ids))
+    
+    def _finish_archive(self):
+        """Complete archive runs that stopped between writing the archive and
+        deleting the hot rows, so no entry is read from both tiers"""
+        archive = self._cold_archive()
+        pending = {record_type: archive.pending_ids(record_type) for record_type in ARCHIVE_LAYOUT}
+        if not any(pending.values()):
+            return
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.cursor()
+            for record_type, ids in pending.items():
+                self._delete_archived(cursor, record_type, ids)
+        for record_type in ARCHIVE_LAYOUT:
+            archive.confirm(record_type)
+        self._data_changed()
+    
+    def archive_cold_data(self, months: int = ARCHIVE_AFTER_MONTHS,
+                          today: Optional[datetime.date] = None) -> Dict[str, int]:
+        """Move water and gym entries older than `months` whole months into the archive.
+        
+        The entries are appended to the columnar archive (archive.py) and
+        deleted from the hot tables while holding the write lock. Their
+        daily_rollup rows stay, so reports do not change, and the record
+        getters, intraday water getters and export read both tiers. Returns
+        entries archived per type.
+        """
+        if months < 1:
+            raise ValueError("months must be at least 1")
+        today = today or datetime.date.today()
+        month_index = today.year * 12 + today.month - 1 - months
+        cutoff = datetime.date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+        
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive = self._archive or ColumnarArchive(self.archive_dir)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            archived = {}
+            for record_type, sql in ARCHIVABLE_SQL.items():
+                # Rows of a run that stopped half way go first
+                self._delete_archived(cursor, record_type, archive.pending_ids(record_type))
+                rows = cursor.execute(sql, (cutoff,)).fetchall()
+                archived[record_type] = archive.append(record_type, rows)
+                self._delete_archived(cursor, record_type, [row[0] for row in rows])
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        
+        for record_type in ARCHIVE_LAYOUT:
+            archive.confirm(record_type)
+        self._archive = archive
+        if any(archived.values()):
+            self._data_changed(None, cutoff)
+        return archived
+    
+    def archive_stats(self) -> Dict:
+        """Entries and bytes in the archive tier"""
+        archive = self._cold_archive()
+        if archive is None:
+            return {'archived_entries': {record_type: 0 for record_type in ARCHIVE_LAYOUT}, 'months': [],
+                    'bytes': 0}
         return {
-            'week_start': start_str,
-            'week_end': end_str,
-            'average_sleep_hours': round(avg_sleep, 2),
-            'gym_sessions_attended': gym_attendance_count,
-            'average_daily_water_ml': round(avg_water, 0),
-            'opportunity_loss': opportunity_loss,
-            'sleep_data': sleep_data,
-            'gym_data': gym_data,
-            'daily_water_totals': water_totals
+            'archived_entries': {record_type: archive.row_count(record_type) for record_type in ARCHIVE_LAYOUT},
+            'months': sorted({block[0] for record_type in ARCHIVE_LAYOUT for block in archive.blocks(record_type)}),
+            'bytes': archive.disk_bytes(),
         }
     
     def update_setting(self, setting_name: str, setting_value: str) -> bool:
-        """Update a setting value"""
+        """Update a setting value.
+        
+        Cost settings take effect from today: earlier days keep the rate
+        that applied to them, and the ledger is repriced from today on.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            conn = self._get_connection()
+            with conn:
+                self._write_setting(conn.cursor(), setting_name, setting_value,
+                                    datetime.date.today().strftime("%Y-%m-%d"))
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO settings (setting_name, setting_value)
-                VALUES (?, ?)
-            ''', (setting_name, setting_value))
-            
-            conn.commit()
-            conn.close()
+            # Write through: this connection's own commit does not change its
+            # data_version, so update its cache directly
+            if conn.settings_cache is not None:
+                conn.settings_cache[setting_name] = setting_value
+            self._data_changed()
             return True
             
         except Exception as e:
             print(f"Error updating setting: {e}")
             return False
     
+    def _write_setting(self, cursor: sqlite3.Cursor, setting_name: str, setting_value: str,
+                       effective_date: str):
+        """Store a setting inside the caller's transaction, pricing costs from effective_date"""
+        previous = cursor.execute('SELECT setting_value FROM settings WHERE setting_name = ?',
+                                  (setting_name,)).fetchone()
+        cursor.execute('''
+            INSERT OR REPLACE INTO settings (setting_name, setting_value)
+            VALUES (?, ?)
+        ''', (setting_name, setting_value))
+        
+        if setting_name in PRICED_SETTINGS and (previous is None or previous[0] != setting_value):
+            cursor.execute('''
+                INSERT OR REPLACE INTO settings_history (setting_name, effective_date, setting_value)
+                VALUES (?, ?, ?)
+            ''', (setting_name, effective_date, setting_value))
+            if setting_name == 'missed_workout_opportunity_cost':
+                self._rebuild_missed_ledger(cursor, effective_date)
+        # A changed goal target re-evaluates that goal's history
+        self._update_goals(cursor)
+    
+    def _settings(self) -> Dict[str, str]:
+        """Get the whole settings table from the current connection's cache.
+        
+        The table is loaded once per pooled connection and reloaded only when
+        PRAGMA data_version reports a commit from another connection or
+        process since it was loaded.
+        """
+        conn = self._get_connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if conn.settings_cache is None or conn.settings_data_version != data_version:
+            conn.settings_cache = dict(conn.execute('SELECT setting_name, setting_value FROM settings'))
+            conn.settings_data_version = data_version
+        return conn.settings_cache
+    
+    def get_settings(self) -> Dict[str, str]:
+        """Get all settings as a name -> value dict"""
+        return dict(self._settings())
+    
     def get_setting(self, setting_name: str) -> Optional[str]:
         """Get a setting value"""
-        conn = sqlite3.connect(self.db_path)
+        return self._settings().get(setting_name)
+    
+    def get_setting_int(self, setting_name: str, default: Optional[int] = None) -> Optional[int]:
+        """Get a setting parsed as an int, or default if it is not set"""
+        value = self._settings().get(setting_name)
+        return int(value) if value else default
+    
+    def get_setting_float(self, setting_name: str, default: Optional[float] = None) -> Optional[float]:
+        """Get a setting parsed as a float, or default if it is not set"""
+        value = self._settings().get(setting_name)
+        return float(value) if value else default
+
+    @staticmethod
+    def _goal_period(date: str, period: str) -> str:
+        """First day of the goal period containing date"""
+        if period == 'week':
+            day = datetime.date.fromisoformat(date)
+            return (day - datetime.timedelta(days=day.weekday())).isoformat()
+        return date
+    
+    @staticmethod
+    def _goal_targets(cursor: sqlite3.Cursor) -> Dict[str, float]:
+        """Current target of every goal, read inside the caller's transaction"""
+        settings = dict(cursor.execute(f'''
+            SELECT setting_name, setting_value FROM settings
+            WHERE setting_name IN ({', '.join('?' * len(GOAL_DEFINITIONS))})
+        ''', [setting for _, setting, _ in GOAL_DEFINITIONS.values()]))
+        return {goal: float(settings.get(setting) or DEFAULT_SETTINGS[setting])
+                for goal, (_, setting, _) in GOAL_DEFINITIONS.items()}
+    
+    def refresh_goals(self) -> Dict[str, int]:
+        """Bring stored goal statuses and streaks up to date in their own transaction.
+        
+        Writes made through this class already do this as part of the write
+        (see _update_goals); this catches up after bulk imports and after
+        rows written by other means. Returns periods evaluated per goal.
+        """
+        conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            evaluated = self._update_goals(cursor)
+            if evaluated is None:
+                # Nothing to do; a rollback leaves data_version (and caches keyed on it) alone
+                cursor.execute('ROLLBACK')
+                return dict.fromkeys(GOAL_DEFINITIONS, 0)
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        self._data_changed()
+        return evaluated
+    
+    def _update_goals(self, cursor: sqlite3.Cursor) -> Optional[Dict[str, int]]:
+        """Evaluate the goal periods queued by this write, inside the caller's transaction.
         
-        cursor.execute('SELECT setting_value FROM settings WHERE setting_name = ?', 
-                      (setting_name,))
-        result = cursor.fetchone()
-        conn.close()
+        Days whose rollup changed are queued in goal_dirty by triggers
+        (migration 12). Only their periods are re-evaluated, and run lengths
+        are carried forward until they match what is stored, so logging
+        today touches one row per goal. A goal whose target changed, or a
+        backlog of more than GOAL_BULK_THRESHOLD days, is re-evaluated over
+        the whole history in one statement. Returns periods evaluated per
+        goal, or None when goals were already current.
+        """
+        targets = self._goal_targets(cursor)
+        dirty = [row[0] for row in cursor.execute('SELECT date FROM goal_dirty ORDER BY date')]
+        stored = dict(cursor.execute('SELECT goal, target FROM goal_state'))
+        if not dirty and stored == targets:
+            return None
+        evaluated = {}
+        for goal, (period, _, _) in GOAL_DEFINITIONS.items():
+            target = targets[goal]
+            if stored.get(goal) != target or len(dirty) > GOAL_BULK_THRESHOLD:
+                evaluated[goal] = self._evaluate_goal(cursor, goal, target)
+            elif dirty:
+                periods = sorted({self._goal_period(date, period) for date in dirty})
+                evaluated[goal] = self._evaluate_goal_periods(cursor, goal, target, periods)
+            else:
+                evaluated[goal] = 0
+                continue
+            self._store_goal_state(cursor, goal, target)
+        cursor.execute('DELETE FROM goal_dirty')
+        return evaluated
+    
+    def _evaluate_goal(self, cursor: sqlite3.Cursor, goal: str, target: float) -> int:
+        """Re-evaluate every period of a goal"""
+        period, _, value_sql = GOAL_DEFINITIONS[goal]
+        cursor.execute('DELETE FROM goal_status WHERE goal = ?', (goal,))
+        cursor.execute(GOAL_EVALUATE_SQL.format(period_days=GOAL_PERIOD_DAYS[period],
+                                                bucket=SERIES_BUCKET_SQL[period], value=value_sql),
+                       {'goal': goal, 'target': target})
+        return cursor.rowcount
+    
+    def _evaluate_goal_periods(self, cursor: sqlite3.Cursor, goal: str, target: float,
+                               periods: List[str]) -> int:
+        """Re-evaluate the given periods (ascending) of a goal and carry their runs forward"""
+        period, _, value_sql = GOAL_DEFINITIONS[goal]
+        days = GOAL_PERIOD_DAYS[period]
+        step = datetime.timedelta(days=days)
+        for period_start in periods:
+            value = cursor.execute(f'''
+                SELECT {value_sql} FROM daily_rollup WHERE date BETWEEN ? AND date(?, ?)
+            ''', (period_start, period_start, f'+{days - 1} days')).fetchone()[0]
+            run = 0
+            if value is None:
+                cursor.execute('DELETE FROM goal_status WHERE goal = ? AND period_start = ?',
+                               (goal, period_start))
+            else:
+                met = value >= target
+                if met:
+                    previous = (datetime.date.fromisoformat(period_start) - step).isoformat()
+                    row = cursor.execute('''
+                        SELECT run_length FROM goal_status WHERE goal = ? AND period_start = ?
+                    ''', (goal, previous)).fetchone()
+                    run = (row[0] if row else 0) + 1
+                cursor.execute('''
+                    INSERT OR REPLACE INTO goal_status (goal, period_start, value, target, met, run_length)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (goal, period_start, value, target, int(met), run))
+            self._carry_goal_run(cursor, goal, period_start, run, step)
+        return len(periods)
+    
+    @staticmethod
+    def _carry_goal_run(cursor: sqlite3.Cursor, goal: str, period_start: str, run: int,
+                        step: datetime.timedelta):
+        """Renumber the met periods after period_start until a stored run length agrees"""
+        last = period_start
+        expected = (datetime.date.fromisoformat(period_start) + step).isoformat()
+        while True:
+            rows = cursor.execute('''
+                SELECT period_start, met, run_length FROM goal_status
+                WHERE goal = ? AND period_start > ?
+                ORDER BY period_start
+                LIMIT 64
+            ''', (goal, last)).fetchall()
+            if not rows:
+                return
+            for last, met, stored_run in rows:
+                run = (run + 1 if last == expected else 1) if met else 0
+                if run == stored_run:
+                    return
+                cursor.execute('UPDATE goal_status SET run_length = ? WHERE goal = ? AND period_start = ?',
+                               (run, goal, last))
+                expected = (datetime.date.fromisoformat(last) + step).isoformat()
+    
+    @staticmethod
+    def _store_goal_state(cursor: sqlite3.Cursor, goal: str, target: float):
+        """Summarize a goal's statuses into its goal_state row"""
+        longest, longest_end = cursor.execute('''
+            SELECT run_length, period_start FROM goal_status
+            WHERE goal = ?
+            ORDER BY run_length DESC, period_start DESC
+            LIMIT 1
+        ''', (goal,)).fetchone() or (0, None)
+        last_met, current_run = cursor.execute('''
+            SELECT period_start, run_length FROM goal_status
+            WHERE goal = ? AND met = 1
+            ORDER BY period_start DESC
+            LIMIT 1
+        ''', (goal,)).fetchone() or (None, 0)
+        cursor.execute('''
+            INSERT OR REPLACE INTO goal_state
+            (goal, target, longest, longest_end, last_met_period, current_run)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (goal, target, longest, longest_end if longest else None, last_met, current_run))
+    
+    def get_goal_streaks(self, today: Optional[str] = None) -> Dict[str, Dict]:
+        """Current and longest streak of every goal, read from goal_state.
         
-        return result[0] if result else None
+        Streaks count consecutive met periods (days, or weeks for gym). The
+        current streak stays alive while this period or the previous one met
+        the goal, so today's unfinished day (or week) does not end it.
+        """
+        today = today or datetime.date.today().isoformat()
+        states = {row[0]: row[1:] for row in self._get_connection().execute('''
+            SELECT goal, target, longest, longest_end, last_met_period, current_run FROM goal_state
+        ''')}
+        streaks = {}
+        for goal, (period, _, _) in GOAL_DEFINITIONS.items():
+            target, longest, longest_end, last_met, current_run = states[goal]
+            this_period = self._goal_period(today, period)
+            previous = (datetime.date.fromisoformat(this_period)
+                        - datetime.timedelta(days=GOAL_PERIOD_DAYS[period])).isoformat()
+            streaks[goal] = {
+                'period': period,
+                'target': target,
+                'met_this_period': last_met == this_period,
+                'current': current_run if last_met in (this_period, previous) else 0,
+                'longest': longest,
+                'longest_end': longest_end,
+            }
+        return streaks
+    
+    def get_goal_status(self, start_date: str, end_date: str, goal: Optional[str] = None) -> List[Dict]:
+        """Evaluated goal periods starting within [start_date, end_date]"""
+        if goal is not None and goal not in GOAL_DEFINITIONS:
+            raise ValueError(f"Unknown goal: {goal}")
+        goals = [goal] if goal else list(GOAL_DEFINITIONS)
+        cursor = self._get_connection().execute(f'''
+            SELECT goal, period_start, value, target, met, run_length FROM goal_status
+            WHERE goal IN ({', '.join('?' * len(goals))}) AND period_start BETWEEN ? AND ?
+            ORDER BY goal, period_start
+        ''', (*goals, start_date, end_date))
+        return [{'goal': row[0], 'period_start': row[1], 'value': row[2], 'target': row[3],
+                 'met': bool(row[4]), 'run_length': row[5]} for row in cursor]
 
 
-if __name__ == "__main__":
-    # Example usage
-    tracker = HealthTracker()
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point"""
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description="Personal Health & Fitness Tracker")
+    parser.add_argument('--db', default="health_tracker.db", help="Path to the SQLite database")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('rebuild-rollup', help="Recompute the daily_rollup table from raw records")
+    
+    import_parser = subparsers.add_parser('import', help="Bulk import records from a CSV or JSON-lines file")
+    import_parser.add_argument('record_type', choices=sorted(BULK_IMPORT_SQL))
+    import_parser.add_argument('file', help="Input file, or - for stdin")
+    import_parser.add_argument('--format', choices=IMPORT_FORMATS,
+                               help="Input format (default: from the file extension)")
+    import_parser.add_argument('--chunk-size', type=int, default=5000)
+    
+    export_parser = subparsers.add_parser('export', help="Stream records as CSV or JSON lines")
+    export_parser.add_argument('record_type', choices=sorted(EXPORT_COLUMNS))
+    export_parser.add_argument('--format', choices=IMPORT_FORMATS, default='jsonl')
+    export_parser.add_argument('--start-date')
+    export_parser.add_argument('--end-date')
+    export_parser.add_argument('--output', default='-', help="Output file, or - for stdout")
+    
+    replay_parser = subparsers.add_parser(
+        'replay', help="Apply an event log to the database (use a new --db to rebuild from scratch)")
+    replay_parser.add_argument('log_dir', help="Event log directory")
+    replay_parser.add_argument('--batch-size', type=int, default=5000)
+    
+    scan_parser = subparsers.add_parser('scan-outliers', help="Recheck all records for outliers and duplicates")
+    scan_parser.add_argument('--remove-duplicates', action='store_true',
+                             help="Delete the records flagged as duplicates")
     
-    # Example data logging
-    today = datetime.date.today().strftime("%Y-%m-%d")
+    archive_parser = subparsers.add_parser('archive', help="Move old water and gym entries to the columnar archive")
+    archive_parser.add_argument('--months', type=int, default=ARCHIVE_AFTER_MONTHS,
+                                help="Keep this many whole months (plus the current one) in the database")
+    archive_parser.add_argument('--vacuum', action='store_true',
+                                help="Compact the database file afterwards to return the freed space")
+    args = parser.parse_args(argv)
     
+    tracker = HealthTracker(args.db)
+    
+    if args.command == 'rebuild-rollup':
+        rows = tracker.rebuild_daily_rollup()
+        print(f"Rebuilt daily rollup: {rows} days")
+        return
+    
+    if args.command == 'import':
+        fmt = args.format or ('csv' if args.file.lower().endswith('.csv') else 'jsonl')
+        source = sys.stdin if args.file == '-' else open(args.file, newline='', encoding='utf-8')
+        with source:
+            result = tracker.bulk_import(args.record_type, source, fmt, args.chunk_size)
+        for error in result['errors']:
+            print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+        print(f"Imported {result['imported']} {args.record_type} records "
+              f"({result['error_count']} rejected)")
+        return
+    
+    if args.command == 'export':
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+        with output:
+            output.writelines(tracker.export(args.record_type, args.format,
+                                             args.start_date, args.end_date))
+        return
+    
+    if args.command == 'replay':
+        from event_log import replay
+        applied = replay(tracker, args.log_dir, args.batch_size)
+        print(f"Replayed {applied} events; database is at event {tracker.applied_event_seq()}")
+        return
+    
+    if args.command == 'scan-outliers':
+        counts = tracker.scan_outliers()
+        print("Flagged " + ", ".join(f"{count} {record_type}" for record_type, count in counts.items()))
+        if args.remove_duplicates:
+            print(f"Removed {tracker.remove_duplicate_records()} duplicate records")
+        return
+    
+    if args.command == 'archive':
+        counts = tracker.archive_cold_data(args.months)
+        print("Archived " + ", ".join(f"{count} {record_type}" for record_type, count in counts.items())
+              + f" entries to {tracker.archive_dir}")
+        if args.vacuum:
+            tracker._get_connection().execute('VACUUM')
+        return
+    
+    # Example usage
     print("Health Tracker initialized successfully!")
-    print(f"Database created at: health_tracker.db")
+    print(f"Database created at: {args.db}")
     print("\nExample usage:")
     print("- tracker.log_sleep('2025-05-26', '23:00', '07:00', sleep_quality=8)")
     print("- tracker.log_gym_attendance('2025-05-26', True, 'Strength Training', 60, 300)")
     print("- tracker.log_water_intake(500)  # 500ml")
-    print("- tracker.get_weekly_summary()")
\ No newline at end of file
+    print("- tracker.get_weekly_summary()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Intraday hydration: cumulative intake curves, pace and hour heatmaps
+
+Everything is computed in SQL over the (date, minute_of_day, amount_ml)
+index of water_intake (migration 10): running totals with a window
+function, hour and weekday buckets with GROUP BY. Python only shapes the
+results, so the cost follows the number of minutes with intake, not a
+scan of every entry.
+
+Pace is measured against a linear goal over the waking day
+(HYDRATION_DAY_START to HYDRATION_DAY_END) and against the user's own
+average intake by the same time of day over the last TYPICAL_DAYS days.
+"""
+
+import datetime
+from typing import Dict, List, Optional
+
+from health_tracker import HealthTracker
+
+HYDRATION_DAY_START = 7 * 60     # 07:00
+HYDRATION_DAY_END = 22 * 60      # 22:00
+TYPICAL_DAYS = 30
+# Differences within this share of the goal count as on pace
+ON_PACE_TOLERANCE = 0.05
+MAX_TIMELINE_DAYS = 92
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def minute_of_day(time_logged: str) -> int:
+    """Minutes since midnight of an HH:MM time"""
+    hours, minutes = time_logged.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def goal_pace(goal_ml: int, minute: int) -> int:
+    """Share of the daily goal due by `minute` on a linear waking-day schedule"""
+    elapsed = (minute - HYDRATION_DAY_START) / (HYDRATION_DAY_END - HYDRATION_DAY_START)
+    return round(goal_ml * min(max(elapsed, 0.0), 1.0))
+
+
+def _active_days(tracker: HealthTracker, start_date: str, end_date: str) -> int:
+    return sum(1 for entries in tracker.get_daily_columns(start_date, end_date)['water_entries'] if entries)
+
+
+def typical_curve(tracker: HealthTracker, start_date: str, end_date: str) -> List[int]:
+    """Average cumulative ml by the end of each hour, over days with any intake"""
+    days = _active_days(tracker, start_date, end_date)
+    hourly = [0] * 24
+    for hour, total_ml, _ in tracker.get_water_by_hour(start_date, end_date):
+        hourly[hour] = total_ml
+    curve, running = [], 0
+    for total_ml in hourly:
+        running += total_ml
+        curve.append(round(running / days) if days else 0)
+    return curve
+
+
+def build_timeline(tracker: HealthTracker, start_date: str, end_date: str) -> Dict:
+    """Cumulative intake curve of each day in a range, plus the average by hour"""
+    first = datetime.date.fromisoformat(start_date)
+    last = datetime.date.fromisoformat(end_date)
+    if last < first:
+        raise ValueError("end_date is before start_date")
+    if (last - first).days >= MAX_TIMELINE_DAYS:
+        raise ValueError(f"At most {MAX_TIMELINE_DAYS} days per timeline")
+
+    days: Dict[str, List[List[int]]] = {}
+    for date, minute, cumulative_ml in tracker.get_water_timeline(start_date, end_date):
+        days.setdefault(date, []).append([minute, cumulative_ml])
+
+    goal_ml = tracker.get_setting_int('daily_water_goal_ml', 2500)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'goal_ml': goal_ml,
+        'pace': [[minute, goal_pace(goal_ml, minute)]
+                 for minute in (HYDRATION_DAY_START, HYDRATION_DAY_END)],
+        'days': [{'date': date, 'total_ml': points[-1][1], 'points': points}
+                 for date, points in days.items()],
+        'average_by_hour': typical_curve(tracker, start_date, end_date),
+    }
+
+
+def build_heatmap(tracker: HealthTracker, start_date: str, end_date: str) -> Dict:
+    """Average ml per hour of day for each weekday (Monday first) over a range"""
+    first = datetime.date.fromisoformat(start_date)
+    last = datetime.date.fromisoformat(end_date)
+    if last < first:
+        raise ValueError("end_date is before start_date")
+
+    # Calendar occurrences of each weekday, so quiet days lower the average
+    span = (last - first).days + 1
+    occurrences = [span // 7 + (1 if (weekday - first.weekday()) % 7 < span % 7 else 0)
+                   for weekday in range(7)]
+
+    totals = [[0] * 24 for _ in range(7)]
+    entries = [[0] * 24 for _ in range(7)]
+    for weekday, hour, total_ml, count in tracker.get_water_by_hour(start_date, end_date, by_weekday=True):
+        totals[weekday][hour] = total_ml
+        entries[weekday][hour] = count
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'weekdays': list(WEEKDAYS),
+        'hours': list(range(24)),
+        'average_ml': [[round(total / occurrences[weekday], 1) if occurrences[weekday] else 0.0
+                        for total in row] for weekday, row in enumerate(totals)],
+        'entries': entries,
+    }
+
+
+def water_pace(tracker: HealthTracker, date: str, minute: int, goal_ml: Optional[int] = None) -> Dict:
+    """Intake by `minute` on `date` against the goal pace and the usual intake by then"""
+    if goal_ml is None:
+        goal_ml = tracker.get_setting_int('daily_water_goal_ml', 2500)
+    total_ml = tracker.get_water_total_until(date, date, minute)
+
+    day = datetime.date.fromisoformat(date)
+    typical_start = (day - datetime.timedelta(days=TYPICAL_DAYS)).isoformat()
+    typical_end = (day - datetime.timedelta(days=1)).isoformat()
+    typical_days = _active_days(tracker, typical_start, typical_end)
+    typical_ml = (round(tracker.get_water_total_until(typical_start, typical_end, minute) / typical_days)
+                  if typical_days else None)
+
+    pace_ml = goal_pace(goal_ml, minute)
+    difference = total_ml - pace_ml
+    if abs(difference) <= goal_ml * ON_PACE_TOLERANCE:
+        status = 'on_pace'
+    else:
+        status = 'ahead' if difference > 0 else 'behind'
+    return {
+        'date': date,
+        'time': format_minute(minute),
+        'total_ml': total_ml,
+        'goal_ml': goal_ml,
+        'pace_ml': pace_ml,
+        'pace_percent': round(pace_ml / goal_ml * 100, 1) if goal_ml else 0.0,
+        'difference_ml': difference,
+        'status': status,
+        'typical_ml': typical_ml,
+    }
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Optional hot-path instrumentation
+
+When enabled (HEALTH_TRACKER_METRICS=1 for the web app), trackers are
+created through Metrics.create_tracker, which wraps every public
+HealthTracker method with a timer and opens connections whose cursors count
+statements, time and rows. Flask routes are timed with request hooks.
+Everything is exported in the Prometheus text format, and statements slower
+than a threshold go to a slow-query log.
+
+When disabled nothing is wrapped or hooked, so the only cost is the
+`if metrics` check at startup.
+"""
+
+import bisect
+import functools
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+from health_tracker import HealthTracker, _PooledConnection
+
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+slow_query_logger = logging.getLogger('health_tracker.slow_queries')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+def _statement_kind(sql: str) -> str:
+    """First keyword of a statement (SELECT, INSERT, PRAGMA, ...)"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else ''
+
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    return ','.join(f'{name}="{_label_value(value)}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    """Counters, histograms and the slow-query log shared by trackers and routes"""
+
+    def __init__(self, slow_query_ms: float = 50.0, slow_query_log_size: int = 100):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self.slow_query_count = 0
+        # Cumulative for the process: trackers closed or evicted keep counting
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        self._method_latency: Dict[str, Histogram] = {}
+        self._sql_count: Dict[str, int] = {}
+        self._sql_seconds: Dict[str, float] = {}
+        self._sql_rows: Dict[str, int] = {}
+        self._route_latency: Dict[Tuple[str, str], Histogram] = {}
+        self._route_count: Dict[Tuple[str, str, int], int] = {}
+        self._trackers = weakref.WeakSet()
+        self.connection_factory = self._build_connection_factory()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def observe_method(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._method_latency.get(name)
+            if histogram is None:
+                histogram = self._method_latency[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_sql(self, kind: str, seconds: float, rows: int = 0, executed: bool = False):
+        with self._lock:
+            if executed:
+                self._sql_count[kind] = self._sql_count.get(kind, 0) + 1
+            self._sql_seconds[kind] = self._sql_seconds.get(kind, 0.0) + seconds
+            self._sql_rows[kind] = self._sql_rows.get(kind, 0) + rows
+
+    def observe_route(self, endpoint: str, method: str, status: int, seconds: float):
+        with self._lock:
+            key = (endpoint, method)
+            histogram = self._route_latency.get(key)
+            if histogram is None:
+                histogram = self._route_latency[key] = Histogram()
+            histogram.observe(seconds)
+            count_key = (endpoint, method, status)
+            self._route_count[count_key] = self._route_count.get(count_key, 0) + 1
+
+    def count_connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_slow_query(self, sql: str, seconds: float, phase: str):
+        statement = ' '.join(sql.split())[:500]
+        entry = {
+            'sql': statement,
+            'duration_ms': round(seconds * 1000, 3),
+            'phase': phase,
+            'thread': threading.current_thread().name,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with self._lock:
+            self.slow_queries.append(entry)
+            self.slow_query_count += 1
+        slow_query_logger.warning("slow query (%.1f ms, %s): %s", seconds * 1000, phase, statement)
+
+    # ------------------------------------------------------------------
+    # Trackers
+    # ------------------------------------------------------------------
+
+    def create_tracker(self, db_path: str = "health_tracker.db") -> HealthTracker:
+        """Open a HealthTracker with instrumented connections and methods"""
+        tracker = HealthTracker(db_path, connection_factory=self.connection_factory)
+        # Wrappers hold the tracker weakly so it is still freed by reference
+        # counting when a tenant shard is evicted
+        tracker_ref = weakref.ref(tracker)
+        for name, function in inspect.getmembers(HealthTracker, inspect.isfunction):
+            if not name.startswith('_'):
+                setattr(tracker, name, self._timed(name, function, tracker_ref))
+        self._trackers.add(tracker)
+        return tracker
+
+    def _timed(self, name: str, function: Callable, tracker_ref: 'weakref.ref') -> Callable:
+        observe = self.observe_method
+        perf_counter = time.perf_counter
+
+        if inspect.isgeneratorfunction(function):
+            # Only time spent inside the generator counts, not the consumer's
+            @functools.wraps(function)
+            def timed_generator(*args, **kwargs):
+                generator = function(tracker_ref(), *args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += perf_counter() - start
+                        yield item
+                finally:
+                    generator.close()
+                    observe(name, elapsed)
+            return timed_generator
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(tracker_ref(), *args, **kwargs)
+            finally:
+                observe(name, perf_counter() - start)
+        return timed
+
+    def _build_connection_factory(self) -> type:
+        metrics = self
+        perf_counter = time.perf_counter
+
+        class InstrumentedCursor(sqlite3.Cursor):
+            """Cursor that reports statement counts, time and rows to metrics"""
+
+            def _account(self, seconds: float, rows: int = 0, executed: bool = False, phase: str = 'fetch'):
+                kind = getattr(self, '_kind', '')
+                metrics.observe_sql(kind, seconds, rows, executed)
+                if seconds >= metrics.slow_query_seconds:
+                    metrics.record_slow_query(getattr(self, '_sql', ''), seconds, phase)
+
+            def execute(self, sql, parameters=()):
+                self._sql, self._kind = sql, _statement_kind(sql)
+                start = perf_counter()
+                try:
+                    return super().execute(sql, parameters)
+                finally:
+                    self._account(perf_counter() - start, executed=True, phase='execute')
+
+            def executemany(self, sql, seq_of_parameters):
+                self._sql, self._kind = sql, _statement_kind(sql)
+                start = perf_counter()
+                try:
+                    return super().executemany(sql, seq_of_parameters)
+                finally:
+                    self._account(perf_counter() - start, executed=True, phase='executemany')
+
+            def executescript(self, sql_script):
+                self._sql, self._kind = sql_script, 'SCRIPT'
+                start = perf_counter()
+                try:
+                    return super().executescript(sql_script)
+                finally:
+                    self._account(perf_counter() - start, executed=True, phase='executescript')
+
+            def fetchone(self):
+                start = perf_counter()
+                row = super().fetchone()
+                self._account(perf_counter() - start, 0 if row is None else 1)
+                return row
+
+            def fetchmany(self, size=None):
+                start = perf_counter()
+                rows = super().fetchmany(self.arraysize if size is None else size)
+                self._account(perf_counter() - start, len(rows))
+                return rows
+
+            def fetchall(self):
+                start = perf_counter()
+                rows = super().fetchall()
+                self._account(perf_counter() - start, len(rows))
+                return rows
+
+            def __next__(self):
+                start = perf_counter()
+                try:
+                    row = super().__next__()
+                except StopIteration:
+                    self._account(perf_counter() - start)
+                    raise
+                self._account(perf_counter() - start, 1)
+                return row
+
+        class InstrumentedConnection(_PooledConnection):
+            """Pooled connection whose cursors are instrumented"""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                metrics.count_connection_opened()
+
+            def cursor(self, factory=InstrumentedCursor):
+                return super().cursor(factory)
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+            def executescript(self, sql_script):
+                return self.cursor().executescript(sql_script)
+
+        return InstrumentedConnection
+
+    # ------------------------------------------------------------------
+    # Flask
+    # ------------------------------------------------------------------
+
+    def instrument_app(self, app):
+        """Time every Flask request by endpoint, method and status"""
+        from flask import g, request
+
+        @app.before_request
+        def _start_timer():
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                self.observe_route(request.endpoint or 'unknown', request.method,
+                                   response.status_code, time.perf_counter() - start)
+            return response
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def slow_query_log(self) -> List[Dict]:
+        with self._lock:
+            return list(self.slow_queries)
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, label_names: Tuple[str, ...], series: Dict[Tuple, Histogram]):
+            for values, hist in sorted(series.items()):
+                base = _labels(label_names, values)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), hist.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{base},le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{base}}} {hist.total:.6f}')
+                lines.append(f'{name}_count{{{base}}} {hist.count}')
+
+        with self._lock:
+            method_latency = {(name,): hist for name, hist in self._method_latency.items()}
+            route_latency = dict(self._route_latency)
+            route_count = dict(self._route_count)
+            sql_count = dict(self._sql_count)
+            sql_seconds = dict(self._sql_seconds)
+            sql_rows = dict(self._sql_rows)
+            slow_query_count = self.slow_query_count
+            connections_opened = self.connections_opened
+        trackers = list(self._trackers)
+
+        family('health_tracker_method_calls_total', 'counter', 'HealthTracker method calls')
+        for (name,), hist in sorted(method_latency.items()):
+            lines.append(f'health_tracker_method_calls_total{{method="{name}"}} {hist.count}')
+        family('health_tracker_method_duration_seconds', 'histogram', 'HealthTracker method latency')
+        histogram('health_tracker_method_duration_seconds', ('method',), method_latency)
+
+        family('health_tracker_sql_statements_total', 'counter', 'SQL statements executed, by first keyword')
+        for kind, count in sorted(sql_count.items()):
+            lines.append(f'health_tracker_sql_statements_total{{statement="{kind}"}} {count}')
+        family('health_tracker_sql_seconds_total', 'counter', 'Time spent executing and fetching SQL')
+        for kind, seconds in sorted(sql_seconds.items()):
+            lines.append(f'health_tracker_sql_seconds_total{{statement="{kind}"}} {seconds:.6f}')
+        family('health_tracker_sql_rows_returned_total', 'counter', 'Rows fetched from SQL statements')
+        for kind, rows in sorted(sql_rows.items()):
+            lines.append(f'health_tracker_sql_rows_returned_total{{statement="{kind}"}} {rows}')
+        family('health_tracker_slow_queries_total', 'counter',
+               f'Statements slower than {self.slow_query_seconds * 1000:g} ms')
+        lines.append(f'health_tracker_slow_queries_total {slow_query_count}')
+
+        family('health_tracker_connections_opened_total', 'counter', 'SQLite connections opened by instrumented trackers')
+        lines.append(f'health_tracker_connections_opened_total {connections_opened}')
+        family('health_tracker_open_trackers', 'gauge', 'Instrumented trackers currently open')
+        lines.append(f'health_tracker_open_trackers {len(trackers)}')
+
+        family('health_tracker_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status')
+        for values, count in sorted(route_count.items()):
+            lines.append(f'health_tracker_http_requests_total{{{_labels(("endpoint", "method", "status"), values)}}} {count}')
+        family('health_tracker_http_request_duration_seconds', 'histogram', 'HTTP request latency')
+        histogram('health_tracker_http_request_duration_seconds', ('endpoint', 'method'), route_latency)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Outlier checks for ingested records
+
+Every checked metric keeps exponentially weighted rolling statistics (mean
+and variance over roughly the last ROLLING_WINDOW values) that are updated
+in constant time per record. The same update runs when a record is written
+and when the whole table is rescanned, so a rescan is a single pass and
+flags exactly what ingest would have flagged.
+
+A value is flagged when it is outside the plausible range for its metric
+(a 20-hour sleep, a 10 L drink), or when it is more than Z_THRESHOLD
+standard deviations from the rolling mean once MIN_SAMPLES values have been
+seen.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+# Columns checked per record type
+CHECKED_METRICS: Dict[str, Tuple[str, ...]] = {
+    'sleep': ('sleep_duration_hours',),
+    'gym': ('duration_minutes', 'calories_burned'),
+    'water': ('amount_ml',),
+}
+
+# Lowest and highest plausible value of each metric
+PLAUSIBLE_RANGES: Dict[str, Tuple[float, float]] = {
+    'sleep_duration_hours': (1, 16),
+    'duration_minutes': (1, 300),
+    'calories_burned': (1, 2500),
+    'amount_ml': (10, 3000),
+}
+
+ROLLING_WINDOW = 30
+Z_THRESHOLD = 4.0
+MIN_SAMPLES = 10
+
+_ALPHA = 2 / (ROLLING_WINDOW + 1)
+
+
+class RollingStats:
+    """Exponentially weighted mean and variance of one metric"""
+    __slots__ = ('count', 'mean', 'variance')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, variance: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.variance = variance
+
+    def update(self, value: float):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = _ALPHA * diff
+            self.mean += increment
+            self.variance = (1 - _ALPHA) * (self.variance + diff * increment)
+        self.count += 1
+
+
+def check_value(metric: str, value: float, stats: RollingStats) -> Optional[Tuple[str, Optional[float]]]:
+    """Check a value against its metric and fold it into the rolling stats.
+
+    Returns (reason, expected value) for an outlier, None otherwise.
+    """
+    low, high = PLAUSIBLE_RANGES[metric]
+    if not low <= value <= high:
+        # Impossible values would only distort the statistics
+        return 'out_of_range', round(stats.mean, 2) if stats.count else None
+
+    expected = stats.mean
+    spread = Z_THRESHOLD * math.sqrt(stats.variance)
+    if stats.count >= MIN_SAMPLES and spread > 0 and abs(value - expected) > spread:
+        # Clamp before updating, so one spike barely moves the statistics
+        # while a lasting change still shifts them within a few values
+        stats.update(min(max(value, expected - spread), expected + spread))
+        return 'outlier', round(expected, 2)
+
+    stats.update(value)
+    return None
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Typed record objects for rows read from the tracker database
+
+Records use __slots__ instead of a per-row dict, are built directly by a
+sqlite3 row factory, and still support dict-style access (record['date'],
+record.get(...), dict(record)) so templates and older callers keep working.
+
+RecordPage wraps one keyset-paginated page: records are yielded as they are
+fetched and the cursor for the following page is known once it is read.
+"""
+
+import base64
+import itertools
+import json
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class _Record:
+    """Base class giving slotted records a read-only mapping interface"""
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class SleepRecord(_Record):
+    """One night from sleep_records"""
+    __slots__ = ('date', 'bedtime', 'wake_time', 'sleep_duration_hours', 'sleep_quality', 'notes')
+    FIELDS = __slots__
+
+    def __init__(self, date, bedtime, wake_time, sleep_duration_hours, sleep_quality, notes):
+        self.date = date
+        self.bedtime = bedtime
+        self.wake_time = wake_time
+        self.sleep_duration_hours = sleep_duration_hours
+        self.sleep_quality = sleep_quality
+        self.notes = notes
+
+    @staticmethod
+    def row_factory(cursor, row) -> 'SleepRecord':
+        return SleepRecord(*row)
+
+
+class GymSession(_Record):
+    """One entry from gym_attendance"""
+    __slots__ = ('date', '_attended', 'workout_type', 'duration_minutes', 'calories_burned', 'notes')
+    FIELDS = ('date', 'attended', 'workout_type', 'duration_minutes', 'calories_burned', 'notes')
+
+    def __init__(self, date, attended, workout_type, duration_minutes, calories_burned, notes):
+        self.date = date
+        # Stored as SQLite's 0/1; converted to bool only when read
+        self._attended = attended
+        self.workout_type = workout_type
+        self.duration_minutes = duration_minutes
+        self.calories_burned = calories_burned
+        self.notes = notes
+
+    @property
+    def attended(self) -> bool:
+        return bool(self._attended)
+
+    @staticmethod
+    def row_factory(cursor, row) -> 'GymSession':
+        return GymSession(*row)
+
+
+class WaterEntry(_Record):
+    """One logged drink from water_intake"""
+    __slots__ = ('date', 'time_logged', 'amount_ml', 'notes')
+    FIELDS = __slots__
+
+    def __init__(self, date, time_logged, amount_ml, notes):
+        self.date = date
+        self.time_logged = time_logged
+        self.amount_ml = amount_ml
+        self.notes = notes
+
+    @staticmethod
+    def row_factory(cursor, row) -> 'WaterEntry':
+        return WaterEntry(*row)
+
+
+def encode_cursor(key: Tuple) -> str:
+    """Opaque page cursor for the sort key of the last record on a page"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, length: int) -> Tuple:
+    """Sort key from a cursor made by encode_cursor; ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != length:
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+class RecordPage:
+    """One page of records, fetched lazily from rows of (key..., record fields...)"""
+
+    def __init__(self, rows: Iterable[Tuple], limit: int, key_length: int,
+                 build: Callable[[Tuple], _Record]):
+        self._rows = rows
+        self.limit = limit
+        self._key_length = key_length
+        self._build = build
+        self.next_cursor: Optional[str] = None
+
+    def __iter__(self):
+        # The query asks for limit + 1 rows; the extra one only tells
+        # whether another page follows
+        key = None
+        for count, row in enumerate(self._rows):
+            if count == self.limit:
+                self.next_cursor = encode_cursor(key)
+                break
+            key = row[:self._key_length]
+            yield self._build(row[self._key_length:])
+
+    def prefetch(self) -> 'RecordPage':
+        """Read the page's rows now, so errors surface here rather than mid-iteration"""
+        self._rows = list(itertools.islice(self._rows, self.limit + 1))
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        records = [record.to_dict() for record in self]
+        return {'records': records, 'next_cursor': self.next_cursor}
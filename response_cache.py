@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Result cache for expensive page computations
+
+Entries are keyed by route, request parameters and the tracker's data
+generation, so any write makes older entries unreachable; they then age out
+of the bounded LRU. Each key also has a stable ETag for conditional GETs.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class ResultCache:
+    """Thread-safe LRU cache of computed results with hit/miss accounting"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag(key: Hashable) -> str:
+        """Stable ETag value for a cache key"""
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for key, computing and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Compute outside the lock; concurrent misses for the same key may
+        # both compute, which is harmless since results are identical
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def record_not_modified(self):
+        """Count a request answered with 304 from its ETag alone"""
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.not_modified
+            served = self.hits + self.not_modified
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Background precomputation of summaries
+
+Weekly summaries and range reports are stored in the tracker's
+precomputed_summaries table. Writes mark overlapping summaries stale inside
+their own transaction (see migration 6), then notify the scheduler, which
+recomputes the stale ones on a worker thread. Pending jobs are deduplicated,
+so a burst of water logs queues a single refresh, which also catches goal
+streaks up with rows written outside HealthTracker's write methods
+(HealthTracker.refresh_goals). At day rollover the
+summaries for the new day's dashboard and default report are computed ahead
+of the first request, and a periodic sweep picks up writes made by other
+processes.
+"""
+
+import datetime
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from health_tracker import HealthTracker
+
+logger = logging.getLogger('health_tracker.scheduler')
+
+# Reports default to the last REPORT_DAYS days ending today
+REPORT_DAYS = 30
+# Stale summaries ending this many days before today or later are refreshed
+# in the background; older ones are recomputed on request instead
+RECENT_DAYS = 62
+
+
+def week_bounds(date: str) -> Tuple[str, str]:
+    """Monday and Sunday of the week containing date"""
+    day = datetime.date.fromisoformat(date)
+    start = day - datetime.timedelta(days=day.weekday())
+    return start.isoformat(), (start + datetime.timedelta(days=6)).isoformat()
+
+
+def report_bounds(today: datetime.date) -> Tuple[str, str]:
+    """Default date range of the reports page"""
+    return (today - datetime.timedelta(days=REPORT_DAYS)).isoformat(), today.isoformat()
+
+
+def _report(tracker: HealthTracker, start_date: str, end_date: str) -> Dict:
+    # analytics pulls in numpy; most processes never build a report
+    from analytics import range_report
+    return {'summary': tracker.get_range_summary(start_date, end_date, include_records=False),
+            'insights': range_report(tracker, start_date, end_date)}
+
+
+# kind -> compute(tracker, start_date, end_date)
+SUMMARY_KINDS: Dict[str, Callable[[HealthTracker, str, str], Dict]] = {
+    'weekly': lambda tracker, start_date, end_date: tracker.get_weekly_summary(start_date),
+    'report': _report,
+}
+
+
+def compute_summary(tracker: HealthTracker, kind: str, start_date: str, end_date: str) -> Tuple[Dict, bool]:
+    """Compute and store a summary; returns it and whether it was stored"""
+    version = tracker.data_version()
+    payload = SUMMARY_KINDS[kind](tracker, start_date, end_date)
+    return payload, tracker.store_precomputed_summary(kind, start_date, end_date, payload, version)
+
+
+def load_summary(tracker: HealthTracker, kind: str, start_date: str, end_date: str) -> Dict:
+    """Stored summary if it is current, otherwise computed (and stored) now"""
+    payload = tracker.get_precomputed_summary(kind, start_date, end_date)
+    if payload is None:
+        try:
+            payload, _ = compute_summary(tracker, kind, start_date, end_date)
+        except Exception as e:
+            # Storing is only an optimization; never fail the request for it
+            logger.warning("Could not store %s summary %s..%s: %s", kind, start_date, end_date, e)
+            payload = SUMMARY_KINDS[kind](tracker, start_date, end_date)
+    return payload
+
+
+class _Job:
+    __slots__ = ('tracker_ref', 'kind', 'start_date', 'end_date', 'enqueued_at')
+
+    def __init__(self, tracker: HealthTracker, kind: str, start_date: Optional[str],
+                 end_date: Optional[str]):
+        self.tracker_ref = weakref.ref(tracker)
+        self.kind = kind
+        self.start_date = start_date
+        self.end_date = end_date
+        self.enqueued_at = time.monotonic()
+
+    def describe(self, now: float) -> Dict:
+        return {'kind': self.kind, 'start_date': self.start_date, 'end_date': self.end_date,
+                'waiting_seconds': round(now - self.enqueued_at, 3)}
+
+
+class SummaryScheduler:
+    """Single worker thread recomputing stored summaries after writes and at day rollover"""
+
+    def __init__(self, poll_seconds: float = 30.0,
+                 clock: Callable[[], datetime.date] = datetime.date.today,
+                 archive_months: Optional[int] = None):
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        # Months of water and gym entries kept hot; older ones are archived
+        # at rollover (None: never)
+        self.archive_months = archive_months
+        self._pending: 'OrderedDict[Tuple, _Job]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._trackers = weakref.WeakSet()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._current: Optional[_Job] = None
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.discarded = 0
+        self.failed = 0
+        self.rollovers = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def watch(self, tracker: HealthTracker) -> HealthTracker:
+        """Keep a tracker's summaries current; returns the tracker.
+        
+        Jobs queue up until start() is called, so a process that only
+        imports the app does no background work.
+        """
+        tracker_ref = weakref.ref(tracker)
+
+        def changed(start_date, end_date):
+            changed_tracker = tracker_ref()
+            if changed_tracker is not None:
+                self.submit(changed_tracker, 'refresh')
+
+        tracker.add_change_listener(changed)
+        with self._condition:
+            self._trackers.add(tracker)
+        self._submit_defaults(tracker, self.clock())
+        return tracker
+
+    def submit(self, tracker: HealthTracker, kind: str, start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> bool:
+        """Queue a job unless an identical one is already pending; returns True if queued"""
+        key = (tracker.instance_id, kind, start_date, end_date)
+        with self._condition:
+            self.submitted += 1
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+            self._pending[key] = _Job(tracker, kind, start_date, end_date)
+            self._condition.notify()
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='summary-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the worker after its current job"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Block until no job is pending or running; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._current is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _submit_defaults(self, tracker: HealthTracker, today: datetime.date):
+        # What the dashboard and the reports page ask for first
+        self.submit(tracker, 'weekly', *week_bounds(today.isoformat()))
+        self.submit(tracker, 'report', *report_bounds(today))
+
+    def _watched(self) -> List[HealthTracker]:
+        with self._condition:
+            return list(self._trackers)
+
+    def _run(self):
+        day = self.clock()
+        next_sweep = time.monotonic() + self.poll_seconds
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    now = datetime.datetime.now()
+                    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1),
+                                                         datetime.time())
+                    timeout = min(next_sweep - time.monotonic(), (midnight - now).total_seconds())
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+                job = self._pending.popitem(last=False)[1] if self._pending else None
+                self._current = job
+
+            today = self.clock()
+            if today != day:
+                day = today
+                self._rollover(today)
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self.poll_seconds
+                # Catches writes made by other processes, which do not notify us
+                for tracker in self._watched():
+                    self.submit(tracker, 'refresh')
+            if job is not None:
+                self._execute(job, today)
+
+            with self._condition:
+                self._current = None
+                self._condition.notify_all()
+
+    def _rollover(self, today: datetime.date):
+        self.rollovers += 1
+        keep_from = (today - datetime.timedelta(days=RECENT_DAYS)).isoformat()
+        for tracker in self._watched():
+            try:
+                tracker.prune_precomputed_summaries(keep_from)
+                tracker.prune_idempotency_keys()
+                if self.archive_months:
+                    tracker.archive_cold_data(self.archive_months, today)
+            except Exception as e:
+                self._record_failure(f"rollover: {e}")
+            self._submit_defaults(tracker, today)
+
+    def _execute(self, job: _Job, today: datetime.date):
+        tracker = job.tracker_ref()
+        if tracker is None:
+            return
+        try:
+            if job.kind == 'refresh':
+                # Writes evaluate goals themselves; this only finds work
+                # after rows were written by other means
+                tracker.refresh_goals()
+                # Stale summaries were flagged by the write itself; queue each
+                min_end = (today - datetime.timedelta(days=RECENT_DAYS)).isoformat()
+                for kind, start_date, end_date in tracker.get_stale_summaries(min_end):
+                    if kind in SUMMARY_KINDS:
+                        self.submit(tracker, kind, start_date, end_date)
+                return
+            if tracker.get_precomputed_summary(job.kind, job.start_date, job.end_date) is not None:
+                return
+            _, stored = compute_summary(tracker, job.kind, job.start_date, job.end_date)
+        except Exception as e:
+            logger.exception("Summary job %s %s..%s failed", job.kind, job.start_date, job.end_date)
+            self._record_failure(f"{job.kind} {job.start_date}..{job.end_date}: {e}")
+            return
+
+        if stored:
+            lag = time.monotonic() - job.enqueued_at
+            with self._condition:
+                self.completed += 1
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        else:
+            # Data changed mid-computation; that write queued a fresh refresh
+            with self._condition:
+                self.discarded += 1
+
+    def _record_failure(self, message: str):
+        with self._condition:
+            self.failed += 1
+            self.last_error = message
+
+    def status(self) -> Dict:
+        """Queue depth, lag and job counters"""
+        now = time.monotonic()
+        with self._condition:
+            pending = [job.describe(now) for job in self._pending.values()]
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'watched_trackers': len(self._trackers),
+                'pending': len(pending),
+                'oldest_pending_seconds': max((job['waiting_seconds'] for job in pending), default=0.0),
+                'current_job': self._current.describe(now) if self._current else None,
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'completed': self.completed,
+                'discarded': self.discarded,
+                'failed': self.failed,
+                'rollovers': self.rollovers,
+                'last_lag_seconds': round(self.last_lag_seconds, 3),
+                'max_lag_seconds': round(self.max_lag_seconds, 3),
+                'last_error': self.last_error,
+                'jobs': pending[:50],
+            }
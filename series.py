@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Chart series built from the daily rollup
+
+Metrics are grouped into day, week or month buckets in SQL (the bucket is
+picked from the range length unless one is requested), gaps are filled
+where a missing day means zero, and long series can be reduced to a point
+budget with Largest-Triangle-Three-Buckets (LTTB) downsampling, which keeps
+peaks and dips that plain averaging would flatten.
+"""
+
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from health_tracker import HealthTracker, SERIES_AGGREGATE_SQL
+
+# Finest bucket that gives at most this many points is chosen automatically
+MAX_AUTO_BUCKETS = 400
+
+# label, unit, whether a day without data counts as zero, whether the value
+# is averaged per day of the bucket
+METRICS = {
+    'water_ml': ('Water intake (avg per day)', 'ml', True, True),
+    'sleep_hours': ('Sleep duration', 'h', False, False),
+    'sleep_quality': ('Sleep quality', '/10', False, False),
+    'gym_sessions': ('Gym sessions attended', 'sessions', True, False),
+    'gym_minutes': ('Gym minutes', 'min', True, False),
+    'gym_attendance_rate': ('Gym attendance rate', '%', False, False),
+}
+BUCKETS = ('day', 'week', 'month')
+
+Point = Tuple[str, float]
+
+
+def bucket_start(day: datetime.date, bucket: str) -> datetime.date:
+    """First day of the bucket containing `day`"""
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: datetime.date, bucket: str) -> datetime.date:
+    if bucket == 'week':
+        return start + datetime.timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def iter_buckets(start: datetime.date, end: datetime.date, bucket: str):
+    """Yield (bucket_start, days of the bucket inside [start, end])"""
+    current = bucket_start(start, bucket)
+    while current <= end:
+        following = next_bucket(current, bucket)
+        first_day = max(current, start)
+        last_day = min(following - datetime.timedelta(days=1), end)
+        yield current, (last_day - first_day).days + 1
+        current = following
+
+
+def choose_bucket(start: datetime.date, end: datetime.date) -> str:
+    """Finest bucket that keeps the series within MAX_AUTO_BUCKETS points"""
+    days = (end - start).days + 1
+    if days <= MAX_AUTO_BUCKETS:
+        return 'day'
+    if days / 7 <= MAX_AUTO_BUCKETS:
+        return 'week'
+    return 'month'
+
+
+def lttb(points: List[Point], threshold: int) -> List[Point]:
+    """Downsample (date, value) points to `threshold` with Largest-Triangle-Three-Buckets"""
+    if threshold >= len(points) or threshold < 3:
+        return points
+
+    xs = [datetime.date.fromisoformat(date).toordinal() for date, _ in points]
+    ys = [value for _, value in points]
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Pick the point in this bucket forming the largest triangle with
+        # the previously selected point and that average
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def build_series(tracker: HealthTracker, metric: str, start_date: str, end_date: str,
+                 bucket: Optional[str] = None, max_points: Optional[int] = None) -> Dict:
+    """Bucketed (and optionally downsampled) series for one metric"""
+    if metric not in METRICS or metric not in SERIES_AGGREGATE_SQL:
+        raise ValueError(f"Unknown metric: {metric}")
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    if bucket in (None, '', 'auto'):
+        bucket = choose_bucket(start, end)
+    elif bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+
+    label, unit, zero_fill, per_day = METRICS[metric]
+    values = dict(tracker.get_series_buckets(metric, start_date, end_date, bucket))
+
+    points: List[Point] = []
+    for current, days in iter_buckets(start, end, bucket):
+        value = values.get(current.isoformat())
+        if value is None:
+            if not zero_fill:
+                continue
+            value = 0
+        if per_day:
+            value /= days
+        points.append((current.isoformat(), round(value, 2)))
+
+    bucketed = len(points)
+    if max_points:
+        points = lttb(points, max_points)
+
+    return {
+        'metric': metric,
+        'label': label,
+        'unit': unit,
+        'bucket': bucket,
+        'start_date': start_date,
+        'end_date': end_date,
+        'bucketed_points': bucketed,
+        'points': points,
+    }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Offline-first client sync
+
+Clients queue log entries while offline and push them in one request, each
+with a client-generated id. The id becomes an idempotency key scoped to the
+client, so a push that is retried after a lost response stores nothing
+twice, and the response maps every client id to the server record.
+
+Clients pull with a change token instead of re-reading days. Every insert,
+update and delete gets a new change sequence number in the write's own
+transaction (migrations 11 and 13), and a pull returns the records whose latest
+change comes after the token, oldest first, with a new token. Deleted
+records come back as ids only. A token from another database (for example
+one rebuilt from the event log) cannot be compared, so that pull starts
+over from the beginning and says so with reset=True.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from health_tracker import EXPORT_COLUMNS, HealthTracker
+from records import decode_cursor, encode_cursor
+
+DEFAULT_PULL_LIMIT = 1000
+MAX_PULL_LIMIT = 5000
+MAX_PUSH_ENTRIES = 5000
+
+
+def encode_token(epoch: str, seq: int) -> str:
+    return encode_cursor((epoch, seq))
+
+
+def decode_token(token: str) -> Tuple[str, int]:
+    """(epoch, seq) of a change token; ValueError if it is malformed"""
+    epoch, seq = decode_cursor(token, 2)
+    if not isinstance(epoch, str) or not isinstance(seq, int) or seq < 0:
+        raise ValueError("Invalid change token")
+    return epoch, seq
+
+
+def pull(tracker: HealthTracker, token: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+    """Changes after a change token (everything when token is None)"""
+    limit = DEFAULT_PULL_LIMIT if limit is None else max(1, min(int(limit), MAX_PULL_LIMIT))
+    epoch = tracker.sync_epoch()
+    since, reset = 0, False
+    if token:
+        token_epoch, since = decode_token(token)
+        if token_epoch != epoch:
+            since, reset = 0, True
+
+    changes, last_seq, has_more = tracker.get_changes(since, limit)
+    records: Dict[str, List[Dict]] = {record_type: [] for record_type in EXPORT_COLUMNS}
+    deleted: Dict[str, List[int]] = {record_type: [] for record_type in EXPORT_COLUMNS}
+    for record_type, record_id, record in changes:
+        if record is None:
+            deleted[record_type].append(record_id)
+        else:
+            records[record_type].append(dict(record, id=record_id))
+    return {'token': encode_token(epoch, last_seq), 'has_more': has_more, 'reset': reset,
+            'records': records, 'deleted': deleted}
+
+
+def push(writer, client_id: str, entries: List[Dict]) -> List[Dict]:
+    """Store a client's queued entries in one batch.
+
+    entries are {'id': client id, 'type': 'sleep'|'gym'|'water', 'record':
+    {...}} with records in the bulk import format. writer is a
+    HealthTracker or an EventStore. Returns {'id', 'status', ...} per entry.
+    """
+    if not isinstance(client_id, str) or not client_id.strip():
+        raise ValueError("client_id is required")
+    if not isinstance(entries, list):
+        raise ValueError("entries must be a list")
+    if len(entries) > MAX_PUSH_ENTRIES:
+        raise ValueError(f"At most {MAX_PUSH_ENTRIES} entries per push")
+
+    results: List[Optional[Dict]] = []
+    records = []
+    for entry in entries:
+        entry_id = entry.get('id') if isinstance(entry, dict) else None
+        if entry_id is None or not isinstance(entry.get('record'), dict):
+            results.append({'id': entry_id, 'status': 'invalid', 'error': "entries need an id and a record"})
+            continue
+        if entry.get('type') not in EXPORT_COLUMNS:
+            results.append({'id': entry_id, 'status': 'invalid',
+                            'error': f"Unknown record type: {entry.get('type')}"})
+            continue
+        results.append(None)
+        records.append((entry['type'], dict(entry['record'], idempotency_key=f"sync:{client_id}:{entry_id}")))
+
+    stored = iter(zip([entry['id'] for entry, result in zip(entries, results) if result is None],
+                      writer.log_records(records) if records else []))
+    merged = []
+    for result in results:
+        if result is None:
+            entry_id, outcome = next(stored)
+            result = dict(outcome, id=entry_id)
+        merged.append(result)
+    return merged
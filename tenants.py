@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+User accounts and per-tenant database shards
+
+Every user gets their own SQLite file under the shard directory, so one
+tenant's writes never contend with another's and a tenant can be backed up,
+moved or deleted as a single file. Accounts live in a small separate
+database. Open HealthTracker instances are kept in a bounded LRU; when a
+tenant is evicted its pooled connections are closed once no request is
+still using it, so thousands of accounts do not mean thousands of open
+connections.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from health_tracker import HealthTracker
+
+
+PASSWORD_HASH_ITERATIONS = 200_000
+
+
+def hash_password(password: str, salt: bytes) -> bytes:
+    """PBKDF2-SHA256 hash of a password"""
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PASSWORD_HASH_ITERATIONS)
+
+
+def load_secret_key(path: str) -> bytes:
+    """Random session signing key stored at path, created on first use.
+
+    The file is only readable by its owner. It is written under a temporary
+    name and linked into place, so workers starting together all end up
+    with the one key that won, and sessions stay valid across processes and
+    restarts.
+    """
+    if not os.path.exists(path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_bytes(32))
+                f.flush()
+                os.fsync(f.fileno())
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+    with open(path, 'rb') as f:
+        key = f.read()
+    if len(key) < 32:
+        raise ValueError(f"Session key file {path} holds fewer than 32 bytes")
+    return key
+
+
+class TenantRegistry:
+    """User accounts plus an LRU of open per-tenant HealthTracker shards"""
+
+    def __init__(self, accounts_db: str = "accounts.db", shard_dir: str = "tenants",
+                 max_open_trackers: int = 64,
+                 tracker_factory: Callable[[str], HealthTracker] = HealthTracker):
+        self.accounts_db = accounts_db
+        self.tracker_factory = tracker_factory
+        self.shard_dir = shard_dir
+        self.max_open_trackers = max_open_trackers
+        self.trackers_opened = 0
+        self.evictions = 0
+        self._trackers: 'OrderedDict[int, HealthTracker]' = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(shard_dir, exist_ok=True)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Account lookups only happen on login and registration, so a short
+        # connection per call is enough here
+        conn = sqlite3.connect(self.accounts_db, timeout=HealthTracker.BUSY_TIMEOUT_SECONDS)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def init_database(self):
+        """Create the users table if needed"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL COLLATE NOCASE,
+                    password_salt BLOB NOT NULL,
+                    password_hash BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def create_user(self, username: str, password: str) -> Optional[int]:
+        """Register a user and create their shard; returns the id, or None if taken"""
+        username = username.strip()
+        if not username or not password:
+            raise ValueError("username and password are required")
+
+        salt = secrets.token_bytes(16)
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password_salt, password_hash) VALUES (?, ?, ?)',
+                    (username, salt, hash_password(password, salt)))
+            user_id = cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return None
+        finally:
+            conn.close()
+
+        # Opening the tracker creates and migrates the shard file
+        self.tracker_for(user_id)
+        return user_id
+
+    def authenticate(self, username: str, password: str) -> Optional[int]:
+        """Return the user id if the credentials match"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT id, password_salt, password_hash FROM users WHERE username = ?',
+                               (username.strip(),)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            hash_password(password, b'\0' * 16)
+            return None
+        user_id, salt, expected = row
+        return user_id if hmac.compare_digest(hash_password(password, salt), expected) else None
+
+    def get_username(self, user_id: int) -> Optional[str]:
+        """Username for an id, or None if the account no longer exists"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT username FROM users WHERE id = ?', (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def count_users(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        finally:
+            conn.close()
+
+    def shard_path(self, user_id: int) -> str:
+        """Database file holding one tenant's data"""
+        return os.path.join(self.shard_dir, f"tenant_{int(user_id)}.db")
+
+    def tracker_for(self, user_id: int) -> HealthTracker:
+        """Open (or reuse) the HealthTracker for a tenant's shard"""
+        with self._lock:
+            tracker = self._trackers.get(user_id)
+            if tracker is not None:
+                self._trackers.move_to_end(user_id)
+                return tracker
+
+        # Open outside the lock; migrating a new shard can take a moment
+        tracker = self.tracker_factory(self.shard_path(user_id))
+
+        with self._lock:
+            existing = self._trackers.get(user_id)
+            if existing is not None:
+                # Another thread opened it first; use theirs
+                self._trackers.move_to_end(user_id)
+                return existing
+            self._trackers[user_id] = tracker
+            self.trackers_opened += 1
+            while len(self._trackers) > self.max_open_trackers:
+                # Dropping the last reference closes the tracker's idle
+                # connections; requests still holding it finish normally and
+                # its leased connections close when they let go
+                self._trackers.popitem(last=False)
+                self.evictions += 1
+        return tracker
+
+    def close(self):
+        """Close every open tenant tracker"""
+        with self._lock:
+            trackers = list(self._trackers.values())
+            self._trackers.clear()
+        for tracker in trackers:
+            tracker.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'open_trackers': len(self._trackers),
+                'max_open_trackers': self.max_open_trackers,
+                'trackers_opened': self.trackers_opened,
+                'evictions': self.evictions,
+            }
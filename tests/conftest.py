@@ -0,0 +1,37 @@
+"""Shared fixtures for the test suite"""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from health_tracker import HealthTracker
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'health_tracker.db')
+
+
+@pytest.fixture
+def tracker(db_path):
+    tracker = HealthTracker(db_path)
+    yield tracker
+    tracker.close()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """app.py serving a scratch database, without the background worker.
+
+    app.py opens health_tracker.db in the working directory and pooled
+    connections reopen it by that relative path, so the scratch directory
+    stays the working directory for the rest of the session.
+    """
+    os.environ['HEALTH_TRACKER_SCHEDULER'] = '0'
+    os.chdir(tmp_path_factory.mktemp('app'))
+    import app
+    return app
@@ -0,0 +1,111 @@
+import datetime
+import os
+
+import pytest
+
+from health_tracker import HealthTracker
+from hydration import build_heatmap, build_timeline, water_pace
+import sync
+
+TODAY = datetime.date(2024, 6, 15)
+FIRST_DAY = datetime.date(2022, 11, 1)
+# Reaches from archived months into the hot ones
+START, END = '2022-11-01', '2024-06-14'
+OLD_START, OLD_END = '2023-01-01', '2023-01-31'
+
+
+def populate(tracker: HealthTracker):
+    entries = []
+    day = FIRST_DAY
+    while day < TODAY:
+        date = day.isoformat()
+        for i in range(day.toordinal() % 4 + 1):
+            entries.append((date, f"{7 + 3 * i:02d}:{(day.day * 7 + i) % 60:02d}", 200 + 50 * i,
+                            'with lunch' if i == 1 else ''))
+        if day.weekday() in (0, 2, 4):
+            tracker.log_gym_attendance(date, day.weekday() != 4, 'Cardio', 45 if day.day % 2 else None,
+                                       300 if day.day % 3 else None, 'note' if day.day % 5 == 0 else '')
+        day += datetime.timedelta(days=1)
+    # Not archivable (time is not HH:MM): stays in the hot table
+    entries.append(('2023-01-10', '9:5', 150, ''))
+    assert tracker.log_water_intake_batch(entries)
+
+
+def reads(tracker: HealthTracker):
+    return {
+        'water_entries': tracker.get_water_entries(START, END),
+        'gym_records': tracker.get_gym_attendance_data(START, END),
+        'water_export': list(tracker.export('water', 'jsonl', START, END)),
+        'gym_export': list(tracker.export('gym', 'csv', START, END)),
+        'timeline': tracker.get_water_timeline(START, END),
+        'by_hour': tracker.get_water_by_hour(START, END),
+        'by_weekday_hour': tracker.get_water_by_hour(START, END, by_weekday=True),
+        'total_until': [tracker.get_water_total_until(START, END, minute) for minute in (0, 479, 600, 1439)],
+        'heatmap': build_heatmap(tracker, OLD_START, OLD_END),
+        'timeline_page': build_timeline(tracker, OLD_START, OLD_END),
+        'pace': water_pace(tracker, '2023-01-20', 12 * 60),
+        'summary': tracker.get_range_summary(START, END),
+        'columns': tracker.get_daily_columns(START, END),
+    }
+
+
+@pytest.fixture
+def archived(tracker):
+    populate(tracker)
+    before = reads(tracker)
+    counts = tracker.archive_cold_data(12, TODAY)
+    assert counts['water'] > 0 and counts['gym'] > 0
+    return tracker, before
+
+
+def test_reads_are_unchanged_by_archiving(archived):
+    tracker, before = archived
+    after = reads(tracker)
+    for name in before:
+        assert after[name] == before[name], name
+
+
+def test_archived_entries_leave_the_hot_table(archived):
+    tracker, _ = archived
+    conn = tracker._get_connection()
+    assert conn.execute("SELECT MAX(date) FROM water_intake WHERE date < '2023-06-01'").fetchone()[0] \
+        == '2023-01-10'
+    assert conn.execute("SELECT COUNT(*) FROM gym_attendance WHERE date < '2023-06-01'").fetchone()[0] == 0
+
+
+def test_rollup_rebuild_reads_the_archive(archived):
+    tracker, before = archived
+    assert tracker.rebuild_daily_rollup()
+    assert tracker.get_daily_columns(START, END) == before['columns']
+    assert tracker.rebuild_daily_rollup('2023-01-01', '2023-03-31')
+    assert tracker.get_daily_columns(START, END) == before['columns']
+
+
+def test_reopened_tracker_reads_the_archive(archived, db_path):
+    tracker, before = archived
+    reopened = HealthTracker(db_path)
+    try:
+        assert reopened.get_water_entries(START, END) == before['water_entries']
+        assert reopened.archive_stats()['archived_entries'] == tracker.archive_stats()['archived_entries']
+    finally:
+        reopened.close()
+
+
+def test_archiving_again_is_a_no_op(archived):
+    tracker, before = archived
+    assert tracker.archive_cold_data(12, TODAY) == {'water': 0, 'gym': 0}
+    assert tracker.get_water_entries(START, END) == before['water_entries']
+    assert os.path.isdir(tracker.archive_dir)
+
+
+def test_changes_after_archiving_reach_synced_clients(tracker):
+    old = (TODAY - datetime.timedelta(days=400)).isoformat()
+    assert tracker.log_water_intake(300, TODAY.isoformat(), '08:00')
+    assert tracker.log_water_intake(250, old, '09:00')
+    first = sync.pull(tracker)
+    assert tracker.archive_cold_data(12, TODAY)['water'] == 1
+    assert tracker.log_water_intake(500, TODAY.isoformat(), '12:00')
+    second = sync.pull(tracker, first['token'])
+    assert not second['reset']
+    assert [record['amount_ml'] for record in second['records']['water']] == [500]
+    assert second['deleted']['water'] == []
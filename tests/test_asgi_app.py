@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from health_tracker import HealthTracker
+
+
+@pytest.fixture
+def asgi(tmp_path, monkeypatch):
+    # asgi_app opens health_tracker.db in the working directory at import
+    monkeypatch.chdir(tmp_path)
+    import asgi_app
+    return asgi_app
+
+
+def test_concurrent_logs_share_one_transaction(asgi, tracker):
+    async def burst():
+        writer = asgi.WaterWriteCoalescer(tracker, flush_interval=0.02)
+        totals = await asyncio.gather(*(writer.log(100 + i, '2024-01-01', '08:00') for i in range(50)))
+        await writer.stop()
+        return writer, totals
+
+    writer, totals = asyncio.run(burst())
+    assert writer.batches_flushed == 1 and writer.entries_flushed == 50
+    # Each caller gets the running total including its own entry
+    assert sorted(totals) == totals and totals[-1] == sum(100 + i for i in range(50))
+    assert tracker.get_daily_water_total('2024-01-01') == totals[-1]
+
+
+def test_retried_log_returns_the_committed_total(asgi, tracker):
+    async def retries():
+        writer = asgi.WaterWriteCoalescer(tracker)
+        first = await writer.log(300, '2024-01-01', '08:00', idempotency_key='phone-1')
+        await writer.log(200, '2024-01-01', '09:00')
+        # A retry of the first request after its response was lost
+        retried = await writer.log(300, '2024-01-01', '08:00', idempotency_key='phone-1')
+        both = await asyncio.gather(writer.log(250, '2024-01-01', '10:00', idempotency_key='watch-1'),
+                                    writer.log(250, '2024-01-01', '10:00', idempotency_key='watch-1'))
+        await writer.stop()
+        return first, retried, both
+
+    first, retried, both = asyncio.run(retries())
+    assert first == 300
+    assert retried == 500
+    assert both == [750, 750]
+    assert len(tracker.get_water_entries('2024-01-01', '2024-01-01')) == 3
+
+
+def test_totals_follow_writes_from_other_connections(asgi, tracker, db_path):
+    async def read_total(writer):
+        return await writer.daily_total('2024-01-01')
+
+    writer = asgi.WaterWriteCoalescer(tracker)
+    assert asyncio.run(read_total(writer)) == 0
+    other = HealthTracker(db_path)
+    other.log_water_intake(400, '2024-01-01', '12:00')
+    other.close()
+    assert asyncio.run(read_total(writer)) == 400
+
+
+def test_quick_water_endpoint(asgi, tracker):
+    app = asgi.QuickWaterApp(tracker)
+    sent = []
+
+    async def call(method, path, body=b'', headers=()):
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await app({'type': 'http', 'method': method, 'path': path, 'headers': list(headers)}, receive, send)
+        return sent[-2]['status'], json.loads(sent[-1]['body'])
+
+    async def session():
+        results = [await call('POST', '/api/quick-water', b'{"amount": 300}', [(b'idempotency-key', b'k1')]),
+                   await call('POST', '/api/quick-water', b'{"amount": 300}', [(b'idempotency-key', b'k1')]),
+                   await call('POST', '/api/quick-water', b'{"amount": -5}'),
+                   await call('GET', '/api/daily-water/not-a-date')]
+        await app.writer.stop()
+        return results
+
+    created, retried, negative, bad_date = asyncio.run(session())
+    assert created == (200, {'success': True, 'new_total': 300, 'amount_added': 300})
+    assert retried[1]['new_total'] == 300
+    assert negative[0] == 400 and bad_date[0] == 400
@@ -0,0 +1,89 @@
+import csv
+import datetime
+import io
+
+import pytest
+
+from batch_reports import COLUMNS, MAX_BATCH_RANGES, batch_report, period_ranges
+
+TODAY = datetime.date.today()
+FIRST = TODAY - datetime.timedelta(days=120)
+LAST = TODAY + datetime.timedelta(days=20)
+
+
+@pytest.fixture
+def logged(tracker):
+    day = FIRST
+    while day <= LAST:
+        date = day.isoformat()
+        n = day.toordinal()
+        if n % 4:
+            tracker.log_water_intake(200 + n % 7 * 50, date, '09:00')
+        if n % 3:
+            tracker.log_sleep(date, '23:00', '07:00' if n % 2 else '06:15', n % 5 + 1)
+        if n % 2:
+            tracker.log_gym_attendance(date, n % 5 != 0, 'Weights', 45, 300)
+        day += datetime.timedelta(days=1)
+        if day == TODAY:
+            # Prices change part way through, so ranges straddle two rates
+            tracker.update_setting('gym_membership_cost_monthly', '80')
+            tracker.update_setting('missed_workout_opportunity_cost', '25')
+    return tracker
+
+
+@pytest.mark.parametrize('period', ['day', 'week', 'month'])
+def test_batch_summaries_match_per_range_summaries(logged, period):
+    ranges = period_ranges(FIRST.isoformat(), LAST.isoformat(), period)
+    for (start_date, end_date), summary in zip(ranges, logged.get_range_summaries(ranges)):
+        reference = logged.get_range_summary(start_date, end_date, include_records=False)
+        for key, value in summary.items():
+            if key in reference:
+                assert value == reference[key], (start_date, end_date, key)
+
+
+def test_overlapping_and_empty_ranges(logged):
+    ranges = [(FIRST.isoformat(), LAST.isoformat()), ('2001-01-01', '2001-01-31'),
+              (TODAY.isoformat(), TODAY.isoformat()), (FIRST.isoformat(), LAST.isoformat())]
+    summaries = logged.get_range_summaries(ranges)
+    assert summaries[0] == summaries[3]
+    assert summaries[1]['total_water_ml'] == 0 and summaries[1]['gym_sessions_attended'] == 0
+    reference = logged.get_range_summary(*ranges[2], include_records=False)
+    assert summaries[2]['opportunity_loss'] == reference['opportunity_loss']
+
+
+def test_period_ranges_are_clipped_and_contiguous():
+    ranges = period_ranges('2024-01-17', '2024-04-02', 'month')
+    assert ranges == [('2024-01-17', '2024-01-31'), ('2024-02-01', '2024-02-29'),
+                      ('2024-03-01', '2024-03-31'), ('2024-04-01', '2024-04-02')]
+    weeks = period_ranges('2024-01-03', '2024-01-21', 'week')
+    assert weeks[0] == ('2024-01-03', '2024-01-07') and weeks[-1] == ('2024-01-15', '2024-01-21')
+    with pytest.raises(ValueError):
+        period_ranges('2024-02-01', '2024-01-01')
+    with pytest.raises(ValueError):
+        period_ranges('2024-01-01', '2024-02-01', 'fortnight')
+
+
+def test_batch_report_table(logged):
+    ranges = period_ranges(FIRST.isoformat(), LAST.isoformat(), 'month')
+    table = batch_report(logged, ranges)
+    assert table['columns'] == list(COLUMNS)
+    assert [tuple(row[:2]) for row in table['rows']] == ranges
+    with pytest.raises(ValueError):
+        batch_report(logged, [('2024-01-01', '2024-01-01')] * (MAX_BATCH_RANGES + 1))
+
+
+def test_batch_api(app_module):
+    app_module.default_tracker.log_water_intake(1000, '2021-03-05', '10:00')
+    client = app_module.app.test_client()
+    table = client.get('/api/reports/batch?start_date=2021-03-01&end_date=2021-04-30').get_json()
+    water = [row[table['columns'].index('total_water_ml')] for row in table['rows']]
+    assert water == [1000, 0]
+
+    rows = list(csv.reader(io.StringIO(client.get(
+        '/api/reports/batch?start_date=2021-03-01&end_date=2021-04-30&format=csv').get_data(as_text=True))))
+    assert rows[0] == list(COLUMNS) and len(rows) == 3
+
+    posted = client.post('/api/reports/batch', json={'ranges': [['2021-03-05', '2021-03-05']]}).get_json()
+    assert posted['rows'][0][table['columns'].index('total_water_ml')] == 1000
+    assert client.post('/api/reports/batch', json={'ranges': 'all'}).status_code == 400
+    assert client.get('/api/reports/batch?format=xml').status_code == 400
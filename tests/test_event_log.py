@@ -0,0 +1,131 @@
+import asyncio
+import io
+import json
+import os
+
+import event_log
+from event_log import EventLog, EventStore, iter_events, list_segments, replay
+from health_tracker import HealthTracker
+
+
+def test_compaction_keeps_every_event(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=256, fsync=False)
+    for i in range(40):
+        log.append('water', {'date': '2024-01-01', 'time_logged': '08:00', 'amount_ml': i, 'notes': ''})
+    before = list(iter_events(str(tmp_path)))
+    assert log.compact(30) >= 2
+    assert list(iter_events(str(tmp_path))) == before
+    assert any(last is not None for _, last, _ in list_segments(str(tmp_path)))
+    log.close()
+
+
+def test_compaction_syncs_the_merged_segment_before_removing_sources(tmp_path, monkeypatch):
+    log = EventLog(str(tmp_path), segment_bytes=256, fsync=False)
+    for i in range(40):
+        log.append('water', {'date': '2024-01-01', 'time_logged': '08:00', 'amount_ml': i, 'notes': ''})
+
+    calls = []
+
+    def recording(name):
+        original = getattr(os, name)
+
+        def call(*args):
+            calls.append(name)
+            return original(*args)
+        return call
+
+    for name in ('fsync', 'replace', 'remove'):
+        monkeypatch.setattr(event_log.os, name, recording(name))
+    assert log.compact(30) >= 2
+
+    replaced = calls.index('replace')
+    first_remove = calls.index('remove')
+    assert 'fsync' in calls[:replaced]                     # the gzip file
+    assert 'fsync' in calls[replaced + 1:first_remove]     # its directory entry
+    log.close()
+
+
+def test_replay_rebuilds_imported_rows(tmp_path):
+    source = HealthTracker(str(tmp_path / 'source.db'))
+    store = EventStore(source, str(tmp_path / 'events'), fsync=False)
+    lines = [json.dumps({'date': f'2024-01-{day:02d}', 'time_logged': '09:30', 'amount_ml': 250 + day})
+             for day in range(1, 11)]
+    lines.insert(3, json.dumps({'date': 'not a date', 'time_logged': '09:30', 'amount_ml': 250}))
+    result = store.bulk_import('water', io.StringIO('\n'.join(lines)), 'jsonl', chunk_size=4)
+    assert result['imported'] == 10 and result['error_count'] == 1
+    assert result['errors'][0]['line'] == 4
+    assert store.wait_applied()
+    store.close()
+
+    rebuilt = HealthTracker(str(tmp_path / 'rebuilt.db'))
+    assert replay(rebuilt, str(tmp_path / 'events')) == 10
+    assert rebuilt.get_water_entries('2024-01-01', '2024-01-31') == \
+        source.get_water_entries('2024-01-01', '2024-01-31')
+    source.close()
+    rebuilt.close()
+
+
+def test_asgi_quick_water_refuses_writes_when_the_log_owns_them(tmp_path, monkeypatch):
+    # asgi_app opens health_tracker.db in the working directory at import
+    monkeypatch.chdir(tmp_path)
+    from asgi_app import QuickWaterApp
+
+    tracker = HealthTracker(str(tmp_path / 'asgi.db'))
+    app = QuickWaterApp(tracker, accept_writes=False)
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'{"amount": 250}', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({'type': 'http', 'method': 'POST', 'path': '/api/quick-water', 'headers': []},
+                    receive, send))
+    assert sent[0]['status'] == 503
+    assert tracker._get_connection().execute('SELECT COUNT(*) FROM water_intake').fetchone()[0] == 0
+    tracker.close()
+
+
+def test_unappliable_event_is_set_aside(tmp_path):
+    tracker = HealthTracker(str(tmp_path / 'events.db'))
+    store = EventStore(tracker, str(tmp_path / 'events'), fsync=False)
+    assert store.log_water_intake(250, '2024-01-01', '08:00')
+    # Bypasses validation, as a hand-edited or corrupted line would
+    bad_seq = store.log.append('water', {'date': '2024-01-01', 'time_logged': '09:00'})
+    assert store.log_water_intake(500, '2024-01-02', '08:00')
+    assert store.wait_applied()
+
+    assert sorted(entry.amount_ml for entry in tracker.get_water_entries('2024-01-01', '2024-01-31')) == [250, 500]
+    rejected = tracker.get_rejected_events()
+    assert [(event['seq'], event['record']) for event in rejected] == \
+        [(bad_seq, {'date': '2024-01-01', 'time_logged': '09:00'})]
+    assert 'amount_ml' in rejected[0]['error']
+    status = store.status()
+    assert status['events_rejected'] == 1 and status['lag_events'] == 0
+    assert str(bad_seq) in status['last_error']
+    store.close()
+    tracker.close()
+
+
+def test_replay_rebuilds_settings_history(tmp_path):
+    source = HealthTracker(str(tmp_path / 'source.db'))
+    store = EventStore(source, str(tmp_path / 'events'), fsync=False)
+    assert store.log_gym_attendance('2024-01-03', False)
+    assert store.update_setting('missed_workout_opportunity_cost', '40')
+    assert store.update_setting('daily_water_goal_ml', '1800')
+    # Read straight after: the write waited for the materializer
+    assert source.get_setting('daily_water_goal_ml') == '1800'
+    store.close()
+
+    rebuilt = HealthTracker(str(tmp_path / 'rebuilt.db'))
+    assert replay(rebuilt, str(tmp_path / 'events')) == 3
+    assert rebuilt.get_settings() == source.get_settings()
+    for table in ('settings_history', 'missed_ledger', 'goal_state'):
+        query = f'SELECT * FROM {table} ORDER BY 1, 2'
+        assert rebuilt._get_connection().execute(query).fetchall() == \
+            source._get_connection().execute(query).fetchall(), table
+    assert rebuilt.calculate_opportunity_loss('2024-01-01', '2024-01-31') == \
+        source.calculate_opportunity_loss('2024-01-01', '2024-01-31')
+    source.close()
+    rebuilt.close()
@@ -0,0 +1,122 @@
+import datetime
+import random
+
+import pytest
+
+from health_tracker import HealthTracker
+
+
+def stored(tracker):
+    conn = tracker._get_connection()
+    return (conn.execute('SELECT * FROM goal_status ORDER BY goal, period_start').fetchall(),
+            conn.execute('SELECT * FROM goal_state ORDER BY goal').fetchall())
+
+
+def full_recompute(tracker):
+    with tracker._get_connection() as conn:
+        conn.execute('DELETE FROM goal_state')
+    tracker.refresh_goals()
+    return stored(tracker)
+
+
+def test_incremental_updates_match_a_full_recompute(tracker):
+    rnd = random.Random(3)
+    start = datetime.date(2024, 1, 1)
+    for i in range(400):
+        date = (start + datetime.timedelta(days=rnd.randrange(120))).isoformat()
+        kind = rnd.randrange(4)
+        if kind == 0:
+            tracker.log_water_intake(rnd.choice([300, 1500, 2600]), date, '10:00')
+        elif kind == 1:
+            tracker.log_sleep(date, '23:00', rnd.choice(['07:30', '05:00']), 3)
+        elif kind == 2:
+            tracker.log_gym_attendance(date, rnd.random() < 0.7)
+        else:
+            with tracker._get_connection() as conn:
+                conn.execute('DELETE FROM water_intake WHERE date = ?', (date,))
+            tracker.rebuild_daily_rollup(date, date)
+        if i % 25 == 0:
+            tracker.refresh_goals()
+            incremental = stored(tracker)
+            assert full_recompute(tracker) == incremental, i
+    tracker.refresh_goals()
+    incremental = stored(tracker)
+    assert incremental[0]
+    assert full_recompute(tracker) == incremental
+
+
+def test_daily_streaks(tracker):
+    today = datetime.date(2024, 5, 20)
+    for offset in range(1, 6):
+        tracker.log_water_intake(3000, (today - datetime.timedelta(days=offset)).isoformat(), '12:00')
+    for offset in range(10, 18):
+        tracker.log_water_intake(3000, (today - datetime.timedelta(days=offset)).isoformat(), '12:00')
+
+    water = tracker.get_goal_streaks(today.isoformat())['water']
+    # Today is not over yet, so yesterday's streak is still current
+    assert (water['current'], water['longest'], water['met_this_period']) == (5, 8, False)
+    tracker.log_water_intake(2600, today.isoformat(), '08:00')
+    water = tracker.get_goal_streaks(today.isoformat())['water']
+    assert (water['current'], water['met_this_period']) == (6, True)
+    assert tracker.get_goal_streaks((today + datetime.timedelta(days=2)).isoformat())['water']['current'] == 0
+
+    # Filling the gap joins the two runs
+    for offset in range(6, 10):
+        tracker.log_water_intake(2500, (today - datetime.timedelta(days=offset)).isoformat(), '12:00')
+    assert tracker.get_goal_streaks(today.isoformat())['water']['longest'] == 18
+
+
+def test_weekly_gym_streak(tracker):
+    monday = datetime.date(2024, 4, 1)
+    for week in range(3):
+        for day in range(4):
+            tracker.log_gym_attendance((monday + datetime.timedelta(weeks=week, days=day)).isoformat(), True)
+    gym = tracker.get_goal_streaks((monday + datetime.timedelta(weeks=3, days=2)).isoformat())['gym']
+    assert gym['period'] == 'week' and (gym['current'], gym['longest']) == (3, 3)
+    weeks = tracker.get_goal_status('2024-04-01', '2024-04-30', 'gym')
+    assert [week['period_start'] for week in weeks] == ['2024-04-01', '2024-04-08', '2024-04-15']
+    assert all(week['met'] and week['value'] == 4 for week in weeks)
+
+
+def test_changing_a_goal_reevaluates_history(tracker):
+    for day in range(1, 11):
+        tracker.log_water_intake(2000, f'2024-03-{day:02d}', '12:00')
+    assert tracker.get_goal_streaks('2024-03-10')['water']['longest'] == 0
+    assert tracker.update_setting('daily_water_goal_ml', '1800')
+    # Re-evaluated by the settings write itself
+    assert tracker.refresh_goals()['water'] == 0
+    assert tracker.get_goal_streaks('2024-03-10')['water']['longest'] == 10
+    assert full_recompute(tracker)[1] == stored(tracker)[1]
+
+
+def test_writes_evaluate_goals_and_reads_do_not_write(tracker, db_path):
+    tracker.log_water_intake(3000, '2024-03-01', '12:00')
+    tracker.log_sleep('2024-03-01', '22:30', '07:00', 4)
+    conn = tracker._get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM goal_dirty').fetchone()[0] == 0
+    data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+
+    reader = HealthTracker(db_path)
+    try:
+        streaks = reader.get_goal_streaks('2024-03-01')
+        reader.get_goal_status('2024-03-01', '2024-03-31')
+        assert reader._get_connection().total_changes == 0
+    finally:
+        reader.close()
+    assert (streaks['water']['current'], streaks['sleep']['current']) == (1, 1)
+    # A commit by the reader would have moved it and flushed this tracker's caches
+    assert conn.execute('PRAGMA data_version').fetchone()[0] == data_version
+
+
+def test_refresh_without_changes_writes_nothing(tracker):
+    tracker.log_water_intake(3000, '2024-03-01', '12:00')
+    tracker.refresh_goals()
+    conn = tracker._get_connection()
+    changes = conn.total_changes
+    assert tracker.refresh_goals() == {'water': 0, 'sleep': 0, 'gym': 0}
+    assert conn.total_changes == changes
+
+
+def test_unknown_goal_is_rejected(tracker):
+    with pytest.raises(ValueError):
+        tracker.get_goal_status('2024-01-01', '2024-01-31', 'steps')
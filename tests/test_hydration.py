@@ -0,0 +1,73 @@
+import datetime
+import random
+
+import pytest
+
+from hydration import build_heatmap, build_timeline, minute_of_day, water_pace
+
+START, END = '2024-03-01', '2024-03-28'
+
+
+@pytest.fixture
+def logged(tracker):
+    rnd = random.Random(5)
+    entries = []
+    for day in range(28):
+        date = (datetime.date(2024, 3, 1) + datetime.timedelta(days=day)).isoformat()
+        for _ in range(rnd.randrange(0, 6)):
+            entries.append((date, f'{rnd.randrange(24):02d}:{rnd.randrange(60):02d}', rnd.choice([150, 250, 400]), ''))
+    assert tracker.log_water_intake_batch(entries)
+    return tracker, [(date, minute_of_day(time), ml) for date, time, ml, _ in entries]
+
+
+def test_timeline_matches_the_entries(logged):
+    tracker, entries = logged
+    expected, running = [], {}
+    for date, minute in sorted({(date, minute) for date, minute, _ in entries}):
+        running[date] = running.get(date, 0) + sum(ml for d, m, ml in entries if (d, m) == (date, minute))
+        expected.append((date, minute, running[date]))
+    assert tracker.get_water_timeline(START, END) == expected
+
+
+def test_hour_buckets_match_the_entries(logged):
+    tracker, entries = logged
+    by_hour, by_weekday = {}, {}
+    for date, minute, ml in entries:
+        for totals, key in ((by_hour, (minute // 60,)),
+                            (by_weekday, (datetime.date.fromisoformat(date).weekday(), minute // 60))):
+            slot = totals.setdefault(key, [0, 0])
+            slot[0] += ml
+            slot[1] += 1
+    assert tracker.get_water_by_hour(START, END) == [(*key, *value) for key, value in sorted(by_hour.items())]
+    assert tracker.get_water_by_hour(START, END, by_weekday=True) == \
+        [(*key, *value) for key, value in sorted(by_weekday.items())]
+
+    heatmap = build_heatmap(tracker, START, END)
+    # 28 days: every weekday occurs four times
+    monday_nine = by_weekday.get((0, 9), [0, 0])
+    assert heatmap['average_ml'][0][9] == round(monday_nine[0] / 4, 1)
+    assert heatmap['entries'][0][9] == monday_nine[1]
+
+
+def test_total_until_and_pace(logged):
+    tracker, entries = logged
+    for minute in (0, 8 * 60, 12 * 60 + 30, 1439):
+        assert tracker.get_water_total_until(START, END, minute) == \
+            sum(ml for _, m, ml in entries if m <= minute)
+
+    date = '2024-03-28'
+    noon = water_pace(tracker, date, 12 * 60, goal_ml=3000)
+    assert noon['total_ml'] == sum(ml for d, m, ml in entries if d == date and m <= 12 * 60)
+    assert noon['pace_ml'] == 1000
+    assert noon['status'] == ('on_pace' if abs(noon['difference_ml']) <= 150
+                              else 'ahead' if noon['difference_ml'] > 0 else 'behind')
+
+
+def test_timeline_limits(tracker):
+    with pytest.raises(ValueError):
+        build_timeline(tracker, '2024-03-02', '2024-03-01')
+    with pytest.raises(ValueError):
+        build_timeline(tracker, '2024-01-01', '2024-06-30')
+    tracker.log_water_intake(500, '2024-03-01', '07:30')
+    timeline = build_timeline(tracker, '2024-03-01', '2024-03-01')
+    assert timeline['days'] == [{'date': '2024-03-01', 'total_ml': 500, 'points': [[450, 500]]}]
@@ -0,0 +1,89 @@
+import gc
+import re
+
+from instrumentation import Metrics, _labels
+
+
+def sample(text, name):
+    match = re.search(rf'^{name} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1))
+
+
+def test_connection_counter_survives_closed_trackers(tmp_path):
+    metrics = Metrics()
+    tracker = metrics.create_tracker(str(tmp_path / 'first.db'))
+    tracker.log_water_intake(250, '2024-01-01', '08:00')
+    opened = sample(metrics.render_prometheus(), 'health_tracker_connections_opened_total')
+    assert opened >= 1
+    # As when the tenant LRU evicts a shard
+    tracker.close()
+    del tracker
+    gc.collect()
+
+    text = metrics.render_prometheus()
+    assert sample(text, 'health_tracker_open_trackers') == 0
+    assert sample(text, 'health_tracker_connections_opened_total') == opened
+    second = metrics.create_tracker(str(tmp_path / 'second.db'))
+    assert sample(metrics.render_prometheus(), 'health_tracker_connections_opened_total') > opened
+    second.close()
+
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="(?:[^"\\]|\\.)*",?)*)\})? (-?[0-9.e+]+)$')
+
+
+def test_prometheus_exposition_format(tmp_path):
+    from flask import Flask
+
+    metrics = Metrics(slow_query_ms=0)
+    app = Flask(__name__)
+    metrics.instrument_app(app)
+    tracker = metrics.create_tracker(str(tmp_path / 'metrics.db'))
+
+    @app.route('/water/<note>')
+    def water(note):
+        tracker.log_water_intake(250, '2024-01-01', '08:00', note)
+        return str(tracker.get_daily_water_total('2024-01-01'))
+
+    client = app.test_client()
+    for note in ('plain', 'second'):
+        assert client.get(f'/water/{note}').status_code == 200
+    assert list(tracker.export('water', 'csv'))
+    text = metrics.render_prometheus()
+    tracker.close()
+
+    assert text.endswith('\n')
+    declared = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name not in declared
+            declared[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        samples.append(match.groups())
+        family = match.group(1)
+        for suffix in ('_bucket', '_sum', '_count'):
+            if declared.get(family[:-len(suffix)]) == 'histogram' and family.endswith(suffix):
+                family = family[:-len(suffix)]
+        # Every sample belongs to a family declared above it
+        assert family in declared, line
+
+    assert declared['health_tracker_method_duration_seconds'] == 'histogram'
+    assert 'health_tracker_method_calls_total{method="log_water_intake"} 2' in text
+    assert 'health_tracker_method_calls_total{method="export"} 1' in text
+    assert 'health_tracker_http_requests_total{endpoint="water",method="GET",status="200"} 2' in text
+    assert sample(text, 'health_tracker_slow_queries_total') > 0
+
+    # Buckets are cumulative and end with +Inf equal to the count
+    buckets = [(labels, float(value)) for name, labels, value in samples
+               if name == 'health_tracker_method_duration_seconds_bucket' and 'method="log_water_intake"' in labels]
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts) and buckets[-1][0].endswith('le="+Inf"') and counts[-1] == 2
+
+
+def test_label_values_are_escaped():
+    assert _labels(('endpoint', 'method'), ('a"b\\c\nd', 'GET')) == 'endpoint="a\\"b\\\\c\\nd",method="GET"'
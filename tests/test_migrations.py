@@ -0,0 +1,37 @@
+import sqlite3
+
+from health_tracker import SCHEMA_MIGRATIONS, SCHEMA_VERSION, HealthTracker
+
+
+def test_existing_database_is_upgraded_in_place(db_path):
+    # A database from before the migrations: base tables only, with data
+    conn = sqlite3.connect(db_path)
+    for statement in SCHEMA_MIGRATIONS[0]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO water_intake (date, time_logged, amount_ml) VALUES ('2024-01-01', '08:00', 300)")
+    conn.execute("INSERT INTO gym_attendance (date, attended) VALUES ('2024-01-01', 0)")
+    conn.commit()
+    conn.close()
+
+    tracker = HealthTracker(db_path)
+    conn = tracker._get_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_water_intake_date_amount', 'idx_gym_attendance_date_id'} <= indexes
+    assert tracker.rebuild_daily_rollup()
+    assert tracker.get_daily_water_total('2024-01-01') == 300
+    assert tracker.calculate_opportunity_loss('2024-01-01', '2024-01-01')['missed_sessions'] == 1
+    tracker.close()
+
+
+def test_opening_a_current_database_changes_nothing(db_path):
+    HealthTracker(db_path).close()
+    conn = sqlite3.connect(db_path)
+    schema = conn.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall()
+    conn.close()
+
+    HealthTracker(db_path).close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall() == schema
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    conn.close()
@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from test_rollup import random_writes, tables
+
+
+@pytest.mark.parametrize('start_date, end_date', [('2024-01-01', '2024-03-31'), ('2024-01-10', '2024-01-10'),
+                                                  ('2024-02-03', '2024-03-09'), ('2023-12-01', '2023-12-31')])
+def test_loss_matches_counting_missed_sessions(tracker, start_date, end_date):
+    random_writes(tracker)
+    missed = tracker._get_connection().execute('''
+        SELECT COUNT(*) FROM gym_attendance WHERE NOT attended AND date BETWEEN ? AND ?
+    ''', (start_date, end_date)).fetchone()[0]
+    loss = tracker.calculate_opportunity_loss(start_date, end_date)
+    assert loss['missed_sessions'] == missed
+    assert loss['opportunity_loss'] == round(missed * 15.0, 2)
+
+
+def test_cost_change_applies_from_today(tracker):
+    today = datetime.date.today()
+    yesterday = (today - datetime.timedelta(days=1)).isoformat()
+    tomorrow = (today + datetime.timedelta(days=1)).isoformat()
+    tracker.log_gym_attendance(yesterday, False)
+    assert tracker.update_setting('missed_workout_opportunity_cost', '40')
+    tracker.log_gym_attendance(tomorrow, False)
+    # Backfilling an earlier day keeps the rate in effect then
+    tracker.log_gym_attendance(yesterday, False)
+
+    assert tracker.calculate_opportunity_loss(yesterday, yesterday)['opportunity_loss'] == 30.0
+    assert tracker.calculate_opportunity_loss(tomorrow, tomorrow)['opportunity_loss'] == 40.0
+    before = tables(tracker)
+    tracker.rebuild_daily_rollup()
+    assert tables(tracker) == before
+
+
+def test_membership_is_priced_at_the_rate_of_each_day(tracker):
+    today = datetime.date.today()
+    assert tracker.update_setting('gym_membership_cost_monthly', '100')
+    before = (today - datetime.timedelta(days=10)).isoformat()
+    after = (today + datetime.timedelta(days=9)).isoformat()
+    cost = tracker.calculate_opportunity_loss(before, after)['membership_cost_for_period']
+    assert cost == round(50 / 30.44 * 10 + 100 / 30.44 * 10, 2)
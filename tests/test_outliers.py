@@ -0,0 +1,65 @@
+from outliers import MIN_SAMPLES, RollingStats, check_value
+
+
+def flags(tracker):
+    return sorted((flag['record_type'], flag['record_id'], flag['metric'], flag['reason'], flag['expected'])
+                  for flag in tracker.get_flagged_records())
+
+
+def test_check_value():
+    stats = RollingStats()
+    assert check_value('amount_ml', 5000, stats) == ('out_of_range', None)
+    assert stats.count == 0
+    # Too few samples to judge a spike
+    for value in (200, 300, 250):
+        assert check_value('amount_ml', value, stats) is None
+    assert check_value('amount_ml', 2500, stats) is None
+
+    stats = RollingStats()
+    for i in range(MIN_SAMPLES * 3):
+        assert check_value('amount_ml', 200 + 10 * (i % 5), stats) is None
+    mean = stats.mean
+    reason, expected = check_value('amount_ml', 2800, stats)
+    assert (reason, expected) == ('outlier', round(mean, 2))
+    # Clamped, so the spike barely moves the statistics
+    assert abs(stats.mean - mean) < 10
+
+
+def test_ingest_flags_outliers_and_duplicates(tracker):
+    for day in range(1, 21):
+        assert tracker.log_water_intake(200 + 10 * (day % 5), f'2024-01-{day:02d}', '09:00')
+    tracker.log_water_intake(2800, '2024-01-21', '09:00')
+    tracker.log_water_intake(9000, '2024-01-22', '09:00')
+    tracker.log_water_intake(200, '2024-01-22', '10:00', 'tea')
+    tracker.log_water_intake(200, '2024-01-22', '10:00', 'tea')
+    tracker.log_sleep('2024-01-22', '20:00', '18:00', 3)
+
+    reasons = {(flag['date'], flag['metric'], flag['reason']) for flag in tracker.get_flagged_records()}
+    assert reasons == {('2024-01-21', 'amount_ml', 'outlier'),
+                       ('2024-01-22', 'amount_ml', 'out_of_range'),
+                       ('2024-01-22', 'record', 'duplicate'),
+                       ('2024-01-22', 'sleep_duration_hours', 'out_of_range')}
+    assert [flag['reason'] for flag in tracker.get_flagged_records('2024-01-21', '2024-01-21')] == ['outlier']
+    assert {flag['record_type'] for flag in tracker.get_flagged_records(record_type='sleep')} == {'sleep'}
+
+    # A rescan in one pass flags exactly what ingest did
+    ingested = flags(tracker)
+    assert sum(tracker.scan_outliers().values()) == len(ingested)
+    assert flags(tracker) == ingested
+
+
+def test_replacing_a_night_drops_its_flags(tracker):
+    tracker.log_sleep('2024-01-22', '20:00', '18:00', 3)
+    assert tracker.get_flagged_records()
+    tracker.log_sleep('2024-01-22', '23:00', '07:00', 3)
+    assert tracker.get_flagged_records() == []
+
+
+def test_removing_duplicates_keeps_the_rollup_consistent(tracker):
+    for _ in range(3):
+        tracker.log_water_intake(250, '2024-02-01', '08:00', 'same')
+    tracker.log_water_intake(250, '2024-02-01', '09:00')
+    assert tracker.remove_duplicate_records() == 2
+    assert tracker.get_daily_water_total('2024-02-01') == 500
+    assert tracker.get_flagged_records() == []
+    assert tracker.remove_duplicate_records() == 0
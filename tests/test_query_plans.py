@@ -0,0 +1,86 @@
+"""The hot read paths must reach rows through an index, never a full table scan.
+
+Each read method runs under a trace callback; every SELECT it issued is
+then run through EXPLAIN QUERY PLAN.
+"""
+
+import re
+
+import pytest
+
+# A plan line "SCAN <name>" over a stored table is a full scan. SCAN of CTEs,
+# subqueries and constant rows is fine, and so is reading the tables that
+# hold one row per setting or goal, or the goal queue every refresh drains.
+SCAN = re.compile(r'^SCAN (\w+)')
+SMALL_TABLES = {'settings', 'goal_state', 'goal_dirty', 'event_log_state', 'sync_state'}
+
+
+@pytest.fixture
+def populated(tracker):
+    for day in range(1, 29):
+        date = f'2024-02-{day:02d}'
+        tracker.log_water_intake(250, date, '08:15')
+        tracker.log_water_intake(500, date, '13:40')
+        tracker.log_sleep(date, '23:00', '07:00', 4)
+        tracker.log_gym_attendance(date, day % 3 != 0, 'Cardio', 40, 300)
+    return tracker
+
+
+def statements(tracker, read):
+    conn = tracker._get_connection()
+    issued = []
+    conn.set_trace_callback(issued.append)
+    try:
+        read()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in issued if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+def full_scans(tracker, sql):
+    conn = tracker._get_connection()
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    scans = []
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+        match = SCAN.match(row[3])
+        if match and match.group(1) in tables - SMALL_TABLES:
+            scans.append(row[3])
+    return scans
+
+
+HOT_READS = {
+    'daily water total': lambda t: t.get_daily_water_total('2024-02-10'),
+    'water entries': lambda t: t.get_water_entries('2024-02-01', '2024-02-14'),
+    'gym records': lambda t: t.get_gym_attendance_data('2024-02-01', '2024-02-14'),
+    'sleep records': lambda t: t.get_sleep_data('2024-02-01', '2024-02-14'),
+    'opportunity loss': lambda t: t.calculate_opportunity_loss('2024-02-01', '2024-02-14'),
+    'weekly summary': lambda t: t.get_weekly_summary('2024-02-05'),
+    'range summary': lambda t: t.get_range_summary('2024-02-01', '2024-02-14'),
+    'daily aggregates': lambda t: t.get_daily_aggregates('2024-02-01', '2024-02-14'),
+    'range summaries': lambda t: t.get_range_summaries([('2024-02-01', '2024-02-07'), ('2024-02-08', '2024-02-14')]),
+    'weekly series': lambda t: t.get_series_buckets('water_ml', '2024-02-01', '2024-02-28', 'week'),
+    'water timeline': lambda t: t.get_water_timeline('2024-02-01', '2024-02-07'),
+    'water by hour': lambda t: t.get_water_by_hour('2024-02-01', '2024-02-07', by_weekday=True),
+    'water until': lambda t: t.get_water_total_until('2024-02-01', '2024-02-07', 600),
+    'goal streaks': lambda t: t.get_goal_streaks('2024-02-28'),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_READS))
+def test_hot_reads_use_indexes(populated, name):
+    populated.refresh_goals()
+    issued = statements(populated, lambda: HOT_READS[name](populated))
+    assert issued
+    for sql in issued:
+        assert full_scans(populated, sql) == [], sql
+
+
+@pytest.mark.parametrize('getter', ['get_sleep_page', 'get_gym_attendance_page'])
+def test_keyset_pages_seek_from_the_cursor(populated, getter):
+    page = getattr(populated, getter)
+    first = page('2024-02-01', '2024-02-28', 5)
+    assert len(list(first)) == 5 and first.next_cursor
+    issued = statements(populated, lambda: list(page('2024-02-01', '2024-02-28', 5, first.next_cursor)))
+    assert issued
+    for sql in issued:
+        assert full_scans(populated, sql) == [], sql
@@ -0,0 +1,61 @@
+import pytest
+
+
+@pytest.fixture
+def logged(tracker):
+    for day in range(1, 21):
+        date = f'2024-03-{day:02d}'
+        tracker.log_sleep(date, '23:00', '07:00', day % 5 + 1)
+        # Several sessions on one day share the date; the id breaks the tie
+        for session in range(day % 3 + 1):
+            tracker.log_gym_attendance(date, session != 1, f'Session {session}', 30 + session)
+    return tracker
+
+
+def all_pages(page, limit, cursor=None):
+    records = []
+    while True:
+        current = page('2024-03-01', '2024-03-31', limit, cursor)
+        records.extend(current)
+        if current.next_cursor is None:
+            return records
+        cursor = current.next_cursor
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 500])
+def test_pages_cover_the_range_once_in_order(logged, limit):
+    assert all_pages(logged.get_sleep_page, limit) == logged.get_sleep_data('2024-03-01', '2024-03-31')
+    gym = all_pages(logged.get_gym_attendance_page, limit)
+    assert gym == logged.get_gym_attendance_data('2024-03-01', '2024-03-31')
+    assert len(gym) == sum(day % 3 + 1 for day in range(1, 21))
+
+
+def test_pages_are_stable_under_inserts(logged):
+    first = logged.get_gym_attendance_page('2024-03-01', '2024-03-31', 5)
+    seen = list(first)
+    # New rows newer than the cursor must not shift the next page
+    logged.log_gym_attendance('2024-03-31', True, 'Late')
+    rest = all_pages(logged.get_gym_attendance_page, 5, first.next_cursor)
+    assert seen + rest == [record for record in logged.get_gym_attendance_data('2024-03-01', '2024-03-31')
+                           if record.workout_type != 'Late']
+
+
+def test_records_api_pages_with_limit_and_cursor(app_module):
+    tracker = app_module.default_tracker
+    for day in range(1, 8):
+        tracker.log_sleep(f'2023-05-{day:02d}', '22:30', '06:30', 3)
+    client = app_module.app.test_client()
+    dates, cursor = [], None
+    while True:
+        query = '/api/records/sleep?start_date=2023-05-01&end_date=2023-05-31&limit=3'
+        body = client.get(query + (f'&cursor={cursor}' if cursor else '')).get_json()
+        dates.extend(record['date'] for record in body['records'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert dates == [f'2023-05-{day:02d}' for day in range(7, 0, -1)]
+
+
+@pytest.mark.parametrize('query', ['/api/records/sleep?cursor=not-a-cursor', '/api/records/water'])
+def test_records_api_rejects_bad_requests(app_module, query):
+    assert app_module.app.test_client().get(query).status_code == 400
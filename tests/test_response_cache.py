@@ -0,0 +1,44 @@
+import datetime
+import sqlite3
+
+from health_tracker import HealthTracker
+from records import RecordPage
+
+
+def test_unchanged_dashboard_revalidates(app_module):
+    client = app_module.app.test_client()
+    etag = client.get('/').headers['ETag']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_write_from_another_tracker_invalidates_dashboard(app_module):
+    client = app_module.app.test_client()
+    first = client.get('/')
+    etag = first.headers['ETag']
+
+    # Stands in for another process: asgi_app.py, the CLI or another worker
+    other = HealthTracker(app_module.default_tracker.db_path)
+    other.log_water_intake(1234, datetime.date.today().isoformat(), '08:00')
+    other.close()
+
+    second = client.get('/', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert second.get_data() != first.get_data()
+
+
+def test_reports_read_failure_renders_the_error_page(app_module, monkeypatch):
+    tracker = app_module.default_tracker
+
+    def failing_page(start_date, end_date, limit=None, cursor=None):
+        def rows():
+            raise sqlite3.OperationalError('disk I/O error')
+            yield
+        return RecordPage(rows(), limit, 1, lambda row: row)
+
+    monkeypatch.setattr(tracker, 'get_sleep_page', failing_page)
+    response = app_module.app.test_client().get('/reports?start_date=2024-01-01&end_date=2024-01-31')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'Error generating reports: disk I/O error' in body
+    assert body.rstrip().endswith('</html>')
@@ -0,0 +1,75 @@
+import datetime
+import io
+import json
+import random
+
+
+def tables(tracker):
+    conn = tracker._get_connection()
+    return (conn.execute('SELECT * FROM daily_rollup ORDER BY date').fetchall(),
+            conn.execute('SELECT * FROM missed_ledger ORDER BY date').fetchall())
+
+
+def random_writes(tracker, count=300, seed=7):
+    rnd = random.Random(seed)
+    day = lambda: (datetime.date(2024, 1, 1) + datetime.timedelta(days=rnd.randrange(90))).isoformat()
+    for _ in range(count):
+        kind = rnd.randrange(6)
+        if kind == 0:
+            tracker.log_water_intake(rnd.choice([150, 250, 500]), day(), f'{rnd.randrange(6, 23):02d}:30')
+        elif kind == 1:
+            tracker.log_water_intake_batch([(day(), '10:00', 200, '') for _ in range(rnd.randrange(1, 5))])
+        elif kind == 2:
+            # Re-logging a night replaces it
+            tracker.log_sleep(day(), '23:00', rnd.choice(['06:00', '07:30']), rnd.randrange(1, 6))
+        elif kind == 3:
+            tracker.log_gym_attendance(day(), rnd.random() < 0.6, 'Weights', rnd.choice([None, 30, 60]),
+                                       rnd.choice([None, 250]))
+        elif kind == 4:
+            lines = [json.dumps({'date': day(), 'attended': rnd.random() < 0.5}) for _ in range(3)]
+            tracker.bulk_import('gym', io.StringIO('\n'.join(lines)), 'jsonl')
+        else:
+            tracker.log_records([('water', {'date': day(), 'time_logged': '12:00', 'amount_ml': 330})])
+
+
+def test_incremental_rollup_and_ledger_match_a_rebuild(tracker):
+    random_writes(tracker)
+    incremental = tables(tracker)
+    assert incremental[0] and incremental[1]
+    tracker.rebuild_daily_rollup()
+    assert tables(tracker) == incremental
+
+
+def test_partial_rebuild_keeps_other_days(tracker):
+    random_writes(tracker)
+    before = tables(tracker)
+    tracker.rebuild_daily_rollup('2024-02-01', '2024-02-15')
+    assert tables(tracker) == before
+
+
+def test_unsorted_bulk_import_adds_to_the_rollup(tracker):
+    random_writes(tracker, count=100)
+    rnd = random.Random(11)
+    day = lambda: (datetime.date(2023, 1, 1) + datetime.timedelta(days=rnd.randrange(500))).isoformat()
+    imports = {
+        'water': [{'date': day(), 'time_logged': '09:15', 'amount_ml': rnd.choice([200, 450])}
+                  for _ in range(400)],
+        'gym': [{'date': day(), 'attended': rnd.random() < 0.5, 'duration_minutes': 40} for _ in range(300)],
+        # Repeated nights replace each other, within a chunk and across chunks
+        'sleep': [{'date': day()[:8] + '1' + str(rnd.randrange(10)), 'bedtime': '23:00',
+                   'wake_time': rnd.choice(['06:00', '07:45']), 'sleep_quality': rnd.randrange(1, 6)}
+                  for _ in range(300)],
+    }
+    statements = []
+    tracker._get_connection().set_trace_callback(statements.append)
+    for record_type, records in imports.items():
+        lines = '\n'.join(json.dumps(record) for record in records)
+        result = tracker.bulk_import(record_type, io.StringIO(lines), 'jsonl', chunk_size=50)
+        assert result['imported'] == len(records) and result['error_count'] == 0
+    tracker._get_connection().set_trace_callback(None)
+    # Chunks never rebuild rollup ranges from the raw tables
+    assert not any('DELETE FROM daily_rollup' in statement for statement in statements)
+
+    incremental = tables(tracker)
+    tracker.rebuild_daily_rollup()
+    assert tables(tracker) == incremental
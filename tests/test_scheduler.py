@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+
+IMPORT_THEN_SERVE = '''
+import sys, threading
+import app
+print('numpy' in sys.modules, any(t.name == 'summary-scheduler' for t in threading.enumerate()))
+app.app.test_client().get('/api/jobs')
+print(app.scheduler.running, any(t.name == 'summary-scheduler' for t in threading.enumerate()))
+'''
+
+
+def test_scheduler_starts_with_the_first_request_not_the_import(tmp_path):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, HEALTH_TRACKER_SCHEDULER='1')
+    env.pop('HEALTH_TRACKER_EVENT_LOG', None)
+    env.pop('HEALTH_TRACKER_MULTI_USER', None)
+    output = subprocess.run([sys.executable, '-c', IMPORT_THEN_SERVE], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True).stdout.split('\n')
+    assert output[0] == 'False False'
+    assert output[1] == 'True True'
@@ -0,0 +1,65 @@
+import datetime
+import math
+
+import pytest
+
+from series import build_series, choose_bucket, lttb
+
+
+def daily_points(values, start=datetime.date(2024, 1, 1)):
+    return [((start + datetime.timedelta(days=i)).isoformat(), value) for i, value in enumerate(values)]
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    values = [math.sin(i / 15) * 100 for i in range(1000)]
+    values[437] = 900      # a spike averaging would flatten
+    values[700] = -900
+    points = daily_points(values)
+    sampled = lttb(points, 50)
+
+    assert len(sampled) == 50
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert points[437] in sampled and points[700] in sampled
+    # A subset of the input, still in date order
+    assert [point[0] for point in sampled] == sorted(point[0] for point in sampled)
+    assert set(sampled) <= set(points)
+
+
+def test_lttb_leaves_short_series_alone():
+    points = daily_points([1, 5, 2, 8])
+    assert lttb(points, 4) == points
+    assert lttb(points, 10) == points
+    assert lttb(points, 2) == points
+
+
+def test_choose_bucket():
+    start = datetime.date(2020, 1, 1)
+    assert choose_bucket(start, start + datetime.timedelta(days=399)) == 'day'
+    assert choose_bucket(start, start + datetime.timedelta(days=400)) == 'week'
+    assert choose_bucket(start, start + datetime.timedelta(days=7 * 400 + 7)) == 'month'
+
+
+def test_build_series(tracker):
+    tracker.log_water_intake(1400, '2024-01-01', '08:00')
+    tracker.log_water_intake(700, '2024-01-03', '08:00')
+    tracker.log_sleep('2024-01-02', '23:00', '07:00', 4)
+
+    water = build_series(tracker, 'water_ml', '2024-01-01', '2024-01-07', 'week')
+    # Averaged over the bucket's days, zero-filled days included
+    assert water['points'] == [('2024-01-01', 300.0)]
+    daily = build_series(tracker, 'water_ml', '2024-01-01', '2024-01-04')
+    assert daily['bucket'] == 'day'
+    assert daily['points'] == [('2024-01-01', 1400), ('2024-01-02', 0), ('2024-01-03', 700), ('2024-01-04', 0)]
+    # Sleep has no zero fill: nights without data are gaps
+    assert build_series(tracker, 'sleep_hours', '2024-01-01', '2024-01-04')['points'] == [('2024-01-02', 8.0)]
+
+    reduced = build_series(tracker, 'water_ml', '2024-01-01', '2024-03-31', max_points=10)
+    assert reduced['bucketed_points'] == 91 and len(reduced['points']) == 10
+    assert reduced['points'][0] == ('2024-01-01', 1400)
+
+    with pytest.raises(ValueError):
+        build_series(tracker, 'steps', '2024-01-01', '2024-01-31')
+    with pytest.raises(ValueError):
+        build_series(tracker, 'water_ml', '2024-01-31', '2024-01-01')
+    with pytest.raises(ValueError):
+        build_series(tracker, 'water_ml', '2024-01-01', '2024-01-31', 'hour')
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+from health_tracker import HealthTracker, _PooledConnection
+
+statements = []
+
+
+class TracedConnection(_PooledConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(statements.append)
+
+
+def test_current_database_skips_schema_work(db_path):
+    HealthTracker(db_path).close()
+    statements.clear()
+    tracker = HealthTracker(db_path, connection_factory=TracedConnection)
+    tracker.close()
+
+    work = [sql for sql in statements if not sql.startswith('PRAGMA')]
+    assert work == []
+    assert 'PRAGMA user_version' in statements
+
+
+def test_outdated_database_is_migrated_once(db_path):
+    statements.clear()
+    HealthTracker(db_path, connection_factory=TracedConnection).close()
+    assert any(sql.lstrip().startswith('CREATE TABLE') for sql in statements)
+
+
+def test_imports_stay_light(tmp_path):
+    code = ('import sys, health_tracker, app; '
+            'print(sorted({"numpy", "analytics", "tenants", "instrumentation", "event_log"} & set(sys.modules)))')
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, HEALTH_TRACKER_SCHEDULER='1')
+    for name in ('HEALTH_TRACKER_EVENT_LOG', 'HEALTH_TRACKER_MULTI_USER', 'HEALTH_TRACKER_METRICS'):
+        env.pop(name, None)
+    output = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
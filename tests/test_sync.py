@@ -0,0 +1,100 @@
+import gzip
+import json
+
+import pytest
+
+import sync
+from health_tracker import HealthTracker
+
+
+def water(entry_id, amount=250, date='2024-04-01'):
+    return {'id': entry_id, 'type': 'water', 'record': {'date': date, 'time_logged': '09:00', 'amount_ml': amount}}
+
+
+def count(tracker, table):
+    return tracker._get_connection().execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def test_retried_push_stores_nothing_twice(tracker):
+    entries = [water('a'), water('b', 500), {'id': 'c', 'type': 'water', 'record': {'date': 'soon'}},
+               {'id': 'd', 'type': 'steps', 'record': {}}]
+    first = sync.push(tracker, 'phone', entries)
+    assert [result['status'] for result in first] == ['created', 'created', 'invalid', 'invalid']
+
+    retried = sync.push(tracker, 'phone', entries)
+    assert [result['status'] for result in retried[:2]] == ['duplicate', 'duplicate']
+    assert [result['record_id'] for result in retried[:2]] == [result['record_id'] for result in first[:2]]
+    assert count(tracker, 'water_intake') == 2
+    assert tracker.get_daily_water_total('2024-04-01') == 750
+
+
+def test_client_ids_are_scoped_to_the_client(tracker):
+    sync.push(tracker, 'phone', [water('a')])
+    assert sync.push(tracker, 'watch', [water('a')])[0]['status'] == 'created'
+    assert count(tracker, 'water_intake') == 2
+
+
+def test_pull_returns_changes_after_the_token(tracker):
+    sync.push(tracker, 'phone', [water(str(i), date=f'2024-04-{i + 1:02d}') for i in range(5)])
+    first = sync.pull(tracker)
+    assert len(first['records']['water']) == 5 and not first['has_more'] and not first['reset']
+
+    assert sync.pull(tracker, first['token'])['records']['water'] == []
+    tracker.log_gym_attendance('2024-04-03', True, 'Run')
+    later = sync.pull(tracker, first['token'])
+    assert [record['workout_type'] for record in later['records']['gym']] == ['Run']
+    assert later['records']['water'] == []
+
+
+def test_pull_pages_with_limit(tracker):
+    sync.push(tracker, 'phone', [water(str(i), amount=100 + i) for i in range(7)])
+    amounts, token = [], None
+    while True:
+        page = sync.pull(tracker, token, limit=3)
+        amounts.extend(record['amount_ml'] for record in page['records']['water'])
+        token = page['token']
+        if not page['has_more']:
+            break
+    assert amounts == [100 + i for i in range(7)]
+
+
+def test_replaced_and_deleted_records_come_back_as_tombstones(tracker):
+    tracker.log_sleep('2024-04-01', '23:00', '07:00', 3)
+    tracker.log_water_intake(250, '2024-04-01', '09:00')
+    token = sync.pull(tracker)['token']
+    old_sleep = tracker._get_connection().execute('SELECT id FROM sleep_records').fetchone()[0]
+    water_id = tracker._get_connection().execute('SELECT id FROM water_intake').fetchone()[0]
+
+    tracker.log_sleep('2024-04-01', '22:00', '06:00', 5)
+    with tracker._get_connection() as conn:
+        conn.execute('DELETE FROM water_intake WHERE id = ?', (water_id,))
+
+    changes = sync.pull(tracker, token)
+    assert changes['deleted']['sleep'] == [old_sleep]
+    assert changes['deleted']['water'] == [water_id]
+    assert [record['bedtime'] for record in changes['records']['sleep']] == ['22:00']
+
+
+def test_token_from_another_database_starts_over(tracker, tmp_path):
+    tracker.log_water_intake(250, '2024-04-01', '09:00')
+    other = HealthTracker(str(tmp_path / 'other.db'))
+    foreign = sync.pull(other)['token']
+    other.close()
+
+    pulled = sync.pull(tracker, foreign)
+    assert pulled['reset'] and len(pulled['records']['water']) == 1
+    with pytest.raises(ValueError):
+        sync.pull(tracker, 'garbage')
+
+
+def test_push_api_accepts_gzip_and_pulls_in_the_same_round_trip(app_module):
+    client = app_module.app.test_client()
+    token = client.get('/api/sync/pull').get_json()['token']
+    body = gzip.compress(json.dumps({'client_id': 'tablet', 'token': token,
+                                     'entries': [water('x', 321, '2022-02-02')]}).encode('utf-8'))
+    response = client.post('/api/sync/push', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'gzip'})
+    payload = response.get_json()
+    assert response.status_code == 200
+    assert payload['results'][0]['status'] == 'created'
+    assert [record['amount_ml'] for record in payload['records']['water']] == [321]
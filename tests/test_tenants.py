@@ -0,0 +1,51 @@
+import os
+import stat
+
+import pytest
+
+from tenants import TenantRegistry, load_secret_key
+
+
+def test_secret_key_is_random_private_and_stable(tmp_path):
+    path = str(tmp_path / 'accounts.db.key')
+    key = load_secret_key(path)
+    assert len(key) == 32
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert load_secret_key(path) == key
+    assert load_secret_key(str(tmp_path / 'other.key')) != key
+    assert sorted(os.listdir(tmp_path)) == ['accounts.db.key', 'other.key']
+
+
+def test_short_secret_key_file_is_rejected(tmp_path):
+    path = tmp_path / 'accounts.db.key'
+    path.write_bytes(b'guessable')
+    with pytest.raises(ValueError):
+        load_secret_key(str(path))
+
+
+def test_tenants_get_separate_shards(tmp_path):
+    registry = TenantRegistry(str(tmp_path / 'accounts.db'), str(tmp_path / 'tenants'))
+    try:
+        alice = registry.create_user('alice', 'correct horse')
+        bob = registry.create_user('bob', 'battery staple')
+        assert registry.create_user('ALICE', 'other') is None
+        assert registry.authenticate('alice', 'correct horse') == alice
+        assert registry.authenticate('alice', 'battery staple') is None
+        assert registry.tracker_for(alice).log_water_intake(500, '2024-01-01', '08:00')
+        assert registry.tracker_for(bob).get_water_entries('2024-01-01', '2024-01-01') == []
+    finally:
+        registry.close()
+
+
+@pytest.mark.parametrize('url, local', [
+    ('/reports?start=2024-01-01', True),
+    ('/', True),
+    ('', False),
+    ('reports', False),
+    ('//evil.com', False),
+    ('/\\evil.com', False),
+    ('/\t/evil.com', False),
+    ('https://evil.com/', False),
+])
+def test_login_only_follows_local_urls(app_module, url, local):
+    assert app_module.is_local_url(url) is local